@@ -0,0 +1,90 @@
+"""Benchmark the junk scanner on a synthetic SD tree.
+
+Usage: python -m benchmarks.bench_cleaner [--files 200000] [--keep DIR]
+
+Builds a tree shaped like a used SD card (Nintendo/Contents with many small
+files, a handful of ._* / .DS_Store files and __MACOSX/ folders), then times
+a dry-run scan with the legacy os.walk approach and with scan_junk at
+several worker counts. Scans are dry runs, so the same tree is reused.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from switch_up.cleaner import scan_junk
+
+
+def build_tree(root: Path, files: int, per_dir: int = 100) -> int:
+    """Create about `files` files under root; return how many are junk."""
+    junk = 0
+    for i in range(files // per_dir):
+        d = root / "Nintendo" / "Contents" / f"{i // 64:04x}" / f"{i:08x}"
+        d.mkdir(parents=True)
+        for j in range(per_dir):
+            (d / f"{j:08x}.nca").touch()
+        if i % 10 == 0:
+            (d / ".DS_Store").touch()
+            (d / f"._{0:08x}.nca").touch()
+            junk += 2
+        if i % 500 == 0:
+            macosx = d / "__MACOSX"
+            macosx.mkdir()
+            for j in range(50):
+                (macosx / f"._{j}").touch()
+            junk += 1
+    return junk
+
+
+def legacy_scan(path: Path) -> int:
+    """The original os.walk + Path based traversal, without deleting."""
+    found = []
+    for root, dirs, files in os.walk(path, topdown=False):
+        root_path = Path(root)
+        for fname in files:
+            if fname.startswith("._") or fname == ".DS_Store":
+                found.append(root_path / fname)
+        for dname in dirs:
+            if dname == "__MACOSX":
+                found.append(root_path / dname)
+    return len(found)
+
+
+def timed(label: str, fn: Callable[[], int]) -> None:
+    started = time.perf_counter()
+    found = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {elapsed:8.3f}s  {found:>7} junk items")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--keep", type=Path, help="Build the tree here and keep it.")
+    args = parser.parse_args()
+
+    root = args.keep or Path(tempfile.mkdtemp(prefix="switch_up_bench_"))
+    try:
+        if not (root / "Nintendo").is_dir():
+            started = time.perf_counter()
+            expected = build_tree(root, args.files)
+            print(f"Built {args.files} files ({expected} junk) in "
+                  f"{time.perf_counter() - started:.1f}s at {root}\n")
+
+        timed("legacy os.walk", lambda: legacy_scan(root))
+        for workers in (1, 4, 8, 16):
+            timed(
+                f"scan_junk workers={workers}",
+                lambda: scan_junk(root, remove=False, workers=workers).count,
+            )
+    finally:
+        if args.keep is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
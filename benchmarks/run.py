@@ -0,0 +1,323 @@
+"""Benchmark the hot paths of switch-up on synthetic data.
+
+Usage: python -m benchmarks.run [--files 10000] [--members 2000]
+       [--repeat 3] [--only NAME,...] [--out results.json]
+       [--compare baseline.json] [--keep DIR]
+
+Builds an Atmosphere-shaped SD tree (--files, 10k to 500k is realistic)
+and a release ZIP with many small members, starts a local stand-in for
+the GitHub API and asset downloads, then times each benchmark --repeat
+times. Only the operation itself is timed; fresh cards, junk and xattrs
+are set up before every repeat. ~/.switch-up is never touched: backups,
+the state index and the download cache live in the work directory.
+
+Results are written as JSON; pass an earlier file to --compare to print
+how each benchmark changed.
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+from rich.console import Console
+from typer.testing import CliRunner
+
+from benchmarks.synthetic import (
+    build_release_zip,
+    build_sd_tree,
+    inject_junk,
+    inject_xattrs,
+)
+from switch_up import __version__
+from switch_up.cleaner import clean_macos_junk, remove_xattrs
+from switch_up.cli import app
+from switch_up.core import install_zip, smart_merge, stream_merge
+from switch_up.utils import extract_zip, zip_payload_size
+from tests.release_server import ReleaseServer
+
+
+@dataclass
+class Workspace:
+    """Data shared by the benchmarks of one run."""
+
+    root: Path
+    tree: Path
+    zip_path: Path
+    hekate_zip: Path
+    extracted: Optional[Path] = None
+    _cards: int = 0
+
+    def fresh_card(self) -> Path:
+        """An empty SD card with the Switch markers."""
+        self._cards += 1
+        card = self.root / "cards" / f"card{self._cards}"
+        build_sd_tree(card, 0)
+        return card
+
+
+@dataclass
+class Result:
+    """Timings of one benchmark, plus how much work each repeat did."""
+
+    seconds: List[float] = field(default_factory=list)
+    files: int = 0
+    bytes: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "min": min(self.seconds),
+            "median": statistics.median(self.seconds),
+            "files": self.files,
+            "bytes": self.bytes,
+        }
+
+
+# A benchmark sets up (untimed) and returns a function doing the timed
+# work, which reports (files, bytes) handled
+Benchmark = Callable[[Workspace], Callable[[], Tuple[int, int]]]
+
+
+def bench_extract_zip(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    def run() -> Tuple[int, int]:
+        extracted = extract_zip(ws.zip_path)
+        files = sum(1 for p in extracted.rglob("*") if p.is_file())
+        shutil.rmtree(extracted)
+        return files, zip_payload_size(ws.zip_path)
+
+    return run
+
+
+def bench_smart_merge(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    if ws.extracted is None:
+        ws.extracted = extract_zip(ws.zip_path)
+    card = ws.fresh_card()
+    source = ws.extracted
+
+    def run() -> Tuple[int, int]:
+        result = smart_merge(source, card)
+        return result.files_written, result.bytes_written
+
+    return run
+
+
+def bench_stream_merge(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    card = ws.fresh_card()
+
+    def run() -> Tuple[int, int]:
+        result = stream_merge(ws.zip_path, card)
+        return result.files_written, result.bytes_written
+
+    return run
+
+
+def bench_stream_merge_unchanged(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    """Re-installing the same release: every member is already on the card."""
+    card = ws.fresh_card()
+    stream_merge(ws.zip_path, card)
+
+    def run() -> Tuple[int, int]:
+        result = stream_merge(ws.zip_path, card)
+        return result.files_skipped, result.bytes_skipped
+
+    return run
+
+
+def bench_clean_macos_junk(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    inject_junk(ws.tree)
+
+    def run() -> Tuple[int, int]:
+        return clean_macos_junk(ws.tree), 0
+
+    return run
+
+
+def bench_remove_xattrs(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    inject_xattrs(ws.tree)
+
+    def run() -> Tuple[int, int]:
+        report = remove_xattrs(ws.tree)
+        return report.files_scanned, 0
+
+    return run
+
+
+def bench_install_zip(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    card = ws.fresh_card()
+
+    def run() -> Tuple[int, int]:
+        result = install_zip(ws.zip_path, card, Console(quiet=True))
+        return result.files_written, result.bytes_written
+
+    return run
+
+
+def bench_update(ws: Workspace) -> Callable[[], Tuple[int, int]]:
+    """switch-up update end to end, downloading from the local server."""
+    card = ws.fresh_card()
+    args = ["update", "--latest", "--sd-path", str(card), "--no-cache"]
+
+    def run() -> Tuple[int, int]:
+        result = CliRunner().invoke(app, args)
+        if result.exit_code != 0:
+            raise RuntimeError(f"update failed:\n{result.output}")
+        size = ws.zip_path.stat().st_size + ws.hekate_zip.stat().st_size
+        return 2, size
+
+    return run
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "extract_zip": bench_extract_zip,
+    "smart_merge": bench_smart_merge,
+    "stream_merge": bench_stream_merge,
+    "stream_merge_unchanged": bench_stream_merge_unchanged,
+    "clean_macos_junk": bench_clean_macos_junk,
+    "remove_xattrs": bench_remove_xattrs,
+    "install_zip": bench_install_zip,
+    "update": bench_update,
+}
+
+
+@contextlib.contextmanager
+def isolated_home(root: Path, server: ReleaseServer) -> Iterator[None]:
+    """Keep backups, state and cache in root, and use the local server."""
+    with patch("switch_up.backup.BACKUP_DIR", root / "backups"), patch(
+        "switch_up.state.STATE_DB", root / "state.db"
+    ), patch("switch_up.cache.CACHE_DIR", root / "cache"), patch(
+        "switch_up.network.GITHUB_API", server.url
+    ):
+        yield
+
+
+def serve_releases(server: ReleaseServer, ams_zip: Path, hekate_zip: Path) -> None:
+    """Publish both ZIPs as the latest Atmosphere and Hekate releases."""
+    for repo, zip_path, tag in (
+        ("Atmosphere-NX/Atmosphere", ams_zip, "1.8.0"),
+        ("CTCaer/hekate", hekate_zip, "v6.2.0"),
+    ):
+        url = server.add_file(f"/download/{zip_path.name}", zip_path.read_bytes())
+        server.add_release(
+            repo,
+            {
+                "tag_name": tag,
+                "assets": [{"name": zip_path.name, "browser_download_url": url}],
+            },
+        )
+
+
+def run_benchmarks(
+    ws: Workspace, names: List[str], repeat: int, log: Callable[[str], None] = print
+) -> Dict[str, Result]:
+    results: Dict[str, Result] = {}
+    for name in names:
+        result = Result()
+        for _ in range(repeat):
+            timed = BENCHMARKS[name](ws)
+            started = time.perf_counter()
+            result.files, result.bytes = timed()
+            result.seconds.append(time.perf_counter() - started)
+        results[name] = result
+        log(
+            f"{name:<24} min {min(result.seconds):8.3f}s  "
+            f"median {statistics.median(result.seconds):8.3f}s  "
+            f"{result.files:>8} files"
+        )
+    return results
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """Lines describing the change of each benchmark's median time."""
+    lines = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            lines.append(f"{name:<24} (new)")
+            continue
+        change = (result["median"] - before["median"]) / before["median"] * 100
+        lines.append(
+            f"{name:<24} {before['median']:8.3f}s -> {result['median']:8.3f}s  "
+            f"{change:+6.1f}%"
+        )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--members", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="Comma-separated benchmark names.")
+    parser.add_argument("--out", type=Path, help="Where to write the JSON results.")
+    parser.add_argument("--compare", type=Path, help="Earlier results to compare.")
+    parser.add_argument("--keep", type=Path, help="Work here and keep the data.")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    root = args.keep or Path(tempfile.mkdtemp(prefix="switch_up_bench_"))
+    root.mkdir(parents=True, exist_ok=True)
+    server = ReleaseServer().start()
+    try:
+        started = time.perf_counter()
+        tree = root / "tree"
+        if not tree.is_dir():
+            build_sd_tree(tree, args.files)
+        zip_path = root / "atmosphere-bench.zip"
+        if not zip_path.is_file():
+            build_release_zip(zip_path, args.members)
+        hekate_zip = root / "hekate_ctcaer_bench.zip"
+        if not hekate_zip.is_file():
+            build_release_zip(hekate_zip, 50, large_members=1, seed=1)
+        serve_releases(server, zip_path, hekate_zip)
+        print(f"Prepared data in {time.perf_counter() - started:.1f}s at {root}\n")
+
+        ws = Workspace(root, tree, zip_path, hekate_zip)
+        with isolated_home(root, server):
+            results = run_benchmarks(ws, names, args.repeat)
+    finally:
+        server.stop()
+        if args.keep is None:
+            shutil.rmtree(root, ignore_errors=True)
+        elif (root / "cards").is_dir():
+            shutil.rmtree(root / "cards", ignore_errors=True)
+
+    report = {
+        "meta": {
+            "version": __version__,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "files": args.files,
+            "members": args.members,
+            "repeat": args.repeat,
+        },
+        "results": {name: r.as_dict() for name, r in results.items()},
+    }
+    out = args.out or Path(f"bench-{datetime.now():%Y%m%d_%H%M%S}.json")
+    out.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {out}")
+
+    if args.compare is not None:
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(report, json.loads(args.compare.read_text())):
+            print(line)
+    return report
+
+
+if __name__ == "__main__":
+    main()
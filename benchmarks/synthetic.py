@@ -0,0 +1,178 @@
+"""Generators for synthetic SD card trees and release ZIPs.
+
+Everything is derived from a seed, so two benchmark runs with the same
+parameters work on identical data.
+"""
+
+import os
+import random
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+# Title ids look like 0100000000001000; homebrew/sysmodules use 0100...ff
+_TITLE_PREFIX = "01000000000"
+
+# A user's card: installed games, sysmodules, homebrew and their settings
+_SD_LAYOUT = (
+    ("Nintendo/Contents/registered", ".nca", 0.55),
+    ("atmosphere/contents", ".bin", 0.15),
+    ("switch", ".nro", 0.1),
+    ("switch", ".json", 0.05),
+    ("emuMMC/RAW1/Nintendo/Contents", ".nca", 0.15),
+)
+
+# What an Atmosphere release contains, by share of its members
+_ZIP_LAYOUT = (
+    ("atmosphere/contents", "exefs.nsp", 0.35),
+    ("atmosphere/contents", "flags/boot2.flag", 0.15),
+    ("atmosphere/config_templates", ".ini", 0.1),
+    ("atmosphere/fatal_errors", ".log", 0.1),
+    ("switch", ".nro", 0.15),
+    ("bootloader/payloads", ".bin", 0.05),
+    ("bootloader/res", ".bmp", 0.1),
+)
+
+
+@dataclass
+class TreeStats:
+    """What build_sd_tree created."""
+
+    files: int = 0
+    dirs: int = 0
+    bytes: int = 0
+
+
+def build_sd_tree(
+    root: Path,
+    files: int,
+    per_dir: int = 64,
+    file_size: int = 0,
+    seed: int = 0,
+) -> TreeStats:
+    """Create an Atmosphere-shaped SD card with about `files` files under root.
+
+    Files are spread over the areas of _SD_LAYOUT, per_dir to a directory.
+    They are empty unless file_size is given (most tree benchmarks only
+    care about the number of entries).
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    stats = TreeStats()
+    for marker in ("Nintendo", "bootloader", "atmosphere/config"):
+        (root / marker).mkdir(parents=True, exist_ok=True)
+    (root / "hekate_ipl.ini").write_text("[config]\nautoboot=0\n")
+    (root / "atmosphere" / "config" / "system_settings.ini").write_text(
+        "[atmosphere]\ndmnt_cheats_enabled_by_default = u8!0x1\n"
+    )
+
+    payload = b"\0" * file_size
+    for area, suffix, share in _SD_LAYOUT:
+        count = int(files * share)
+        for i in range(0, count, per_dir):
+            directory = root / area / _title_id(rng) / f"{i // per_dir:04x}"
+            directory.mkdir(parents=True, exist_ok=True)
+            stats.dirs += 1
+            for j in range(min(per_dir, count - i)):
+                (directory / f"{j:08x}{suffix}").write_bytes(payload)
+                stats.files += 1
+                stats.bytes += file_size
+    return stats
+
+
+def inject_junk(root: Path, every: int = 10) -> int:
+    """Add macOS junk to one directory in `every` under root.
+
+    Each chosen directory gets a .DS_Store and a ._ file per regular file;
+    one in 50 also gets a __MACOSX/ folder. Idempotent, so the same junk
+    can be put back before every timed clean. Returns the junk created.
+    """
+    created = 0
+    for i, (directory, _, names) in enumerate(sorted(os.walk(root))):
+        if i % every or "__MACOSX" in directory:
+            continue
+        base = Path(directory)
+        (base / ".DS_Store").write_bytes(b"\0\0\0\1Bud1")
+        created += 1
+        for name in names:
+            if not name.startswith(".") and not name.startswith("._"):
+                (base / f"._{name}").write_bytes(b"\0\5\26\7")
+                created += 1
+        if i % (every * 50) == 0:
+            macosx = base / "__MACOSX"
+            macosx.mkdir(exist_ok=True)
+            (macosx / "._placeholder").write_bytes(b"\0")
+            created += 1
+    return created
+
+
+def inject_xattrs(root: Path, every: int = 5) -> int:
+    """Set a quarantine xattr on one file in `every` under root.
+
+    Returns how many were set: 0 where the platform or filesystem has no
+    user extended attributes.
+    """
+    if not hasattr(os, "setxattr"):
+        return 0
+    tagged = 0
+    for i, path in enumerate(p for p in sorted(Path(root).rglob("*")) if p.is_file()):
+        if i % every:
+            continue
+        try:
+            os.setxattr(path, "user.com.apple.quarantine", b"0081;00000000;Safari;")
+        except OSError:
+            return tagged
+        tagged += 1
+    return tagged
+
+
+def build_release_zip(
+    path: Path,
+    members: int,
+    mean_size: int = 16 * 1024,
+    large_members: int = 4,
+    large_size: int = 4 * 1024 * 1024,
+    seed: int = 0,
+) -> Path:
+    """Write an Atmosphere-shaped release ZIP with many small members.
+
+    Member sizes vary around mean_size, plus a few large_size members
+    (package3, payloads). Content is half random, half zeros, so it
+    compresses about as well as a real release.
+    """
+    rng = random.Random(seed)
+    names = _release_names(rng, members)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, name in enumerate(names):
+            if i < large_members:
+                size = large_size
+            else:
+                size = max(1, int(rng.expovariate(1 / mean_size)))
+            zf.writestr(name, _content(rng, size))
+    return Path(path)
+
+
+def _release_names(rng: random.Random, members: int) -> List[str]:
+    names = ["atmosphere/package3", "atmosphere/stratosphere.romfs"]
+    names += [f"bootloader/payloads/payload{i}.bin" for i in range(2)]
+    for area, suffix, share in _ZIP_LAYOUT:
+        for i in range(int(members * share)):
+            if area == "atmosphere/contents":
+                names.append(f"{area}/{_title_id(rng)}/{suffix}")
+            else:
+                names.append(f"{area}/{i:05d}{suffix}")
+    names = list(dict.fromkeys(names))
+    while len(names) < members:
+        names.append(f"switch/extra/{len(names):05d}.nro")
+    return names[:members]
+
+
+def _title_id(rng: random.Random) -> str:
+    return f"{_TITLE_PREFIX}{rng.getrandbits(20):05x}"
+
+
+def _content(rng: random.Random, size: int) -> bytes:
+    half = size // 2
+    random_part = rng.getrandbits(8 * half).to_bytes(half, "little") if half else b""
+    return random_part + b"\0" * (size - half)
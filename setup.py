@@ -1,6 +1,10 @@
+import re
+
 from setuptools import setup, find_packages
 
-from switch_up import __version__
+# Read the version without importing the package (and its dependencies)
+with open("switch_up/__init__.py", encoding="utf-8") as f:
+    version = re.search(r'^__version__ = "([^"]+)"', f.read(), re.M).group(1)
 
 with open("README.md", encoding="utf-8") as f:
     long_description = f.read()
@@ -10,7 +14,7 @@ with open("requirements.txt", encoding="utf-8") as f:
 
 setup(
     name="switch-up",
-    version=__version__,
+    version=version,
     description="Actualizador seguro de Nintendo Switch para macOS",
     long_description=long_description,
     long_description_content_type="text/markdown",
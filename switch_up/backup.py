@@ -0,0 +1,340 @@
+"""Deduplicated backup store for SD card configuration files."""
+
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from switch_up.cache import file_sha256
+from switch_up.cleaner import is_junk_name
+from switch_up.state import read_card_id
+
+BACKUP_DIR = Path.home() / ".switch-up" / "backups"
+
+# Critical files that are backed up before any operation
+BACKUP_FILES = [
+    "hekate_ipl.ini",
+    "exosphere.ini",
+    "bootloader/hekate_ipl.ini",
+    "atmosphere/config/system_settings.ini",
+]
+
+# Directories whose settings files are backed up too, and what counts as one
+BACKUP_DIRS = ["atmosphere/config", "bootloader", "switch"]
+BACKUP_SUFFIXES = (
+    ".ini",
+    ".json",
+    ".txt",
+    ".cfg",
+    ".conf",
+    ".config",
+    ".toml",
+    ".yml",
+    ".yaml",
+    ".xml",
+)
+# Larger files are not settings (payloads, homebrew data) and are skipped
+BACKUP_MAX_FILE_SIZE = 1024 * 1024
+
+# Retention applied automatically after every backup, per card
+DEFAULT_KEEP_LAST = 20
+DEFAULT_MAX_AGE_DAYS = 90
+
+# Objects this recent are never collected, so a backup running in another
+# thread or process can still link the blobs it just stored
+OBJECT_GRACE_SECONDS = 3600
+
+
+@dataclass
+class BackupEntry:
+    """One file in a snapshot, as it was on the SD."""
+
+    sha256: str
+    size: int
+    mtime_ns: int
+
+
+@dataclass
+class Snapshot:
+    """A point-in-time copy of the configuration files of a card."""
+
+    snapshot_id: str
+    created: float
+    sd_path: str
+    card: Optional[str] = None
+    files: Dict[str, BackupEntry] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return sum(e.size for e in self.files.values())
+
+
+def backup_candidates(sd_path: Path) -> Iterator[str]:
+    """Yield the relative paths of the files on the SD worth backing up."""
+    sd_path = Path(sd_path)
+    seen = set()
+    for relpath in BACKUP_FILES:
+        if (sd_path / relpath).is_file():
+            seen.add(relpath)
+            yield relpath
+    for directory in BACKUP_DIRS:
+        for root, dirs, files in os.walk(sd_path / directory):
+            dirs[:] = [d for d in dirs if not is_junk_name(d)]
+            for name in files:
+                if is_junk_name(name) or not name.lower().endswith(BACKUP_SUFFIXES):
+                    continue
+                relpath = (Path(root) / name).relative_to(sd_path).as_posix()
+                if relpath not in seen:
+                    seen.add(relpath)
+                    yield relpath
+
+
+class BackupStore:
+    """Content-addressed store of configuration snapshots.
+
+    Layout under root:
+    - objects/<sha256[:2]>/<sha256>: file contents, stored once per digest
+    - snapshots/<id>.json: the manifest of a snapshot (path -> digest,
+      size and mtime of every file)
+    - snapshots/<id>/: the snapshot as a tree of hard links into objects,
+      so it can be browsed and copied like a plain directory
+
+    A snapshot of files that did not change since the previous snapshot of
+    the same card costs a stat and a hard link per file: their digests are
+    taken from the previous manifest and nothing is read or copied.
+    """
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        self.root = Path(root) if root is not None else BACKUP_DIR
+        self.objects = self.root / "objects"
+        self.snapshots_dir = self.root / "snapshots"
+
+    def create(self, sd_path: Path) -> Snapshot:
+        """Snapshot the configuration files of the SD."""
+        sd_path = Path(sd_path)
+        card = read_card_id(sd_path)
+        previous = self.latest(card, sd_path)
+        known = previous.files if previous is not None else {}
+        snapshot_id, tree = self._reserve_id()
+        snapshot = Snapshot(
+            snapshot_id=snapshot_id,
+            created=time.time(),
+            sd_path=str(sd_path),
+            card=card,
+        )
+
+        for relpath in backup_candidates(sd_path):
+            source = sd_path / relpath
+            try:
+                st = source.stat()
+            except OSError:
+                continue
+            if st.st_size > BACKUP_MAX_FILE_SIZE and relpath not in BACKUP_FILES:
+                continue
+            entry = known.get(relpath)
+            if (
+                entry is None
+                or entry.size != st.st_size
+                or entry.mtime_ns != st.st_mtime_ns
+            ):
+                entry = BackupEntry(file_sha256(source), st.st_size, st.st_mtime_ns)
+            self._link(source, entry.sha256, tree / relpath)
+            snapshot.files[relpath] = entry
+
+        self._write_manifest(snapshot)
+        return snapshot
+
+    def snapshots(self) -> List[Snapshot]:
+        """List complete snapshots, newest first."""
+        if not self.snapshots_dir.is_dir():
+            return []
+        found = []
+        for manifest in self.snapshots_dir.glob("*.json"):
+            snapshot = self._read_manifest(manifest.stem)
+            if snapshot is not None:
+                found.append(snapshot)
+        found.sort(key=lambda s: s.created, reverse=True)
+        return found
+
+    def get(self, snapshot_id: str) -> Optional[Snapshot]:
+        """Return the snapshot with this id, or None."""
+        return self._read_manifest(snapshot_id)
+
+    def latest(self, card: Optional[str], sd_path: Path) -> Optional[Snapshot]:
+        """Newest snapshot of a card (by card id, else by mount path)."""
+        for snapshot in self.snapshots():
+            if card is not None and snapshot.card == card:
+                return snapshot
+            if card is None and snapshot.sd_path == str(sd_path):
+                return snapshot
+        return None
+
+    def tree(self, snapshot_id: str) -> Path:
+        """Directory holding the files of a snapshot."""
+        return self.snapshots_dir / snapshot_id
+
+    def restore(self, snapshot_id: str, sd_path: Path) -> int:
+        """Copy every file of a snapshot back onto the SD.
+
+        Modification times are restored too. Files on the SD that are not
+        in the snapshot are left alone. Returns the number of files restored.
+        """
+        snapshot = self.get(snapshot_id)
+        if snapshot is None:
+            raise KeyError(f"No such backup: {snapshot_id}")
+        sd_path = Path(sd_path)
+        for relpath, entry in snapshot.files.items():
+            dest = sd_path / relpath
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            blob = self._object_path(entry.sha256)
+            if not blob.is_file():
+                blob = self.tree(snapshot_id) / relpath
+            shutil.copyfile(blob, dest)
+            os.utime(dest, ns=(entry.mtime_ns, entry.mtime_ns))
+        return len(snapshot.files)
+
+    def prune(
+        self,
+        keep_last: Optional[int] = DEFAULT_KEEP_LAST,
+        max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS,
+        card: Optional[str] = None,
+    ) -> List[Snapshot]:
+        """Delete old snapshots, then the objects no snapshot uses anymore.
+
+        Per card, snapshots beyond the newest keep_last and those older
+        than max_age_days are deleted; the newest snapshot of a card is
+        always kept. With card (a card id, or the mount path of a card
+        without one), only that card's snapshots are pruned. Several prunes
+        may run at once (fleet installs): files another one deleted first
+        are skipped. Returns the deleted snapshots.
+        """
+        now = time.time()
+        cutoff = None if max_age_days is None else now - max_age_days * 86400
+        kept: Dict[str, int] = {}
+        deleted: List[Snapshot] = []
+        for snapshot in self.snapshots():
+            key = snapshot.card or snapshot.sd_path
+            if card is not None and key != card:
+                continue
+            rank = kept.get(key, 0)
+            too_many = keep_last is not None and rank >= keep_last
+            too_old = cutoff is not None and snapshot.created < cutoff
+            if rank > 0 and (too_many or too_old):
+                deleted.append(snapshot)
+                continue
+            kept[key] = rank + 1
+
+        for snapshot in deleted:
+            (self.snapshots_dir / f"{snapshot.snapshot_id}.json").unlink(
+                missing_ok=True
+            )
+            shutil.rmtree(self.tree(snapshot.snapshot_id), ignore_errors=True)
+        self._collect(now)
+        return deleted
+
+    def _reserve_id(self) -> Tuple[str, Path]:
+        """Pick a new snapshot id and create its (empty) tree."""
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        snapshot_id = timestamp
+        # Several cards can be backed up in the same second (fleet mode)
+        suffix = 1
+        while True:
+            try:
+                (self.snapshots_dir / snapshot_id).mkdir()
+                return snapshot_id, self.snapshots_dir / snapshot_id
+            except FileExistsError:
+                suffix += 1
+                snapshot_id = f"{timestamp}_{suffix}"
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects / sha256[:2] / sha256
+
+    def _link(self, source: Path, sha256: str, dest: Path) -> None:
+        """Put source in the object store (if new) and link it at dest."""
+        blob = self._object_path(sha256)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(2):
+            if not blob.is_file():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                tmp = blob.with_name(f"{blob.name}.{os.getpid()}.{id(dest)}.tmp")
+                shutil.copyfile(source, tmp)
+                os.replace(tmp, blob)
+            try:
+                os.link(blob, dest)
+                return
+            except FileNotFoundError:
+                continue  # collected in the meantime; store it again
+            except OSError:
+                # No hard links on this filesystem: fall back to a copy
+                shutil.copyfile(blob, dest)
+                return
+        shutil.copyfile(source, dest)
+
+    def _collect(self, now: float) -> None:
+        """Remove objects that no snapshot references or links to."""
+        if not self.objects.is_dir():
+            return
+        live = {e.sha256 for s in self.snapshots() for e in s.files.values()}
+        for blob in self.objects.glob("*/*"):
+            if blob.name in live:
+                continue
+            try:
+                st = blob.stat()
+                if st.st_nlink > 1 or st.st_mtime > now - OBJECT_GRACE_SECONDS:
+                    continue
+                blob.unlink()
+            except OSError:
+                continue
+
+    def _read_manifest(self, snapshot_id: str) -> Optional[Snapshot]:
+        manifest = self.snapshots_dir / f"{snapshot_id}.json"
+        try:
+            data = json.loads(manifest.read_text())
+        except (OSError, ValueError):
+            return None
+        return Snapshot(
+            snapshot_id=snapshot_id,
+            created=data["created"],
+            sd_path=data["sd_path"],
+            card=data.get("card"),
+            files={
+                relpath: BackupEntry(**entry)
+                for relpath, entry in data["files"].items()
+            },
+        )
+
+    def _write_manifest(self, snapshot: Snapshot) -> None:
+        manifest = self.snapshots_dir / f"{snapshot.snapshot_id}.json"
+        tmp = manifest.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "created": snapshot.created,
+                    "sd_path": snapshot.sd_path,
+                    "card": snapshot.card,
+                    "files": {
+                        relpath: {
+                            "sha256": e.sha256,
+                            "size": e.size,
+                            "mtime_ns": e.mtime_ns,
+                        }
+                        for relpath, e in snapshot.files.items()
+                    },
+                }
+            )
+        )
+        os.replace(tmp, manifest)
+
+
+def resolve_snapshot(store: BackupStore, backup: Union[str, Path]) -> Optional[str]:
+    """Map a snapshot id or snapshot directory to a snapshot id, if known."""
+    path = Path(backup)
+    if path.parent == store.snapshots_dir or len(path.parts) == 1:
+        if store.get(path.name) is not None:
+            return path.name
+    return None
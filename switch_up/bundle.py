@@ -0,0 +1,206 @@
+"""Install bundles: a set of packages merged ahead of time into one file.
+
+A bundle is an uncompressed ZIP holding the files of several packages
+exactly as they go on the SD card: prefixes applied, overlaps resolved
+(the later package wins) and macOS junk left out. Members are stored in
+install order, each package's files grouped by directory, so applying a
+bundle reads it front to back once. A manifest, stored first, lists the
+packages with their versions and every file with its size, CRC32 and
+package.
+
+Applying a bundle needs no network and no extraction: it is a single
+streamed, transactional install of its members (see install_packages).
+"""
+
+import json
+import os
+import zipfile
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rich.console import Console
+
+from switch_up import __version__
+from switch_up.cache import file_sha256
+from switch_up.cleaner import is_junk_name
+from switch_up.copier import copy_stream
+from switch_up.core import MergeResult, Source, install_packages
+from switch_up.utils import member_path, validate_zip
+
+# Name of the manifest member inside a bundle
+BUNDLE_MANIFEST = ".switch-up-bundle.json"
+
+# Bumped when the manifest changes incompatibly
+BUNDLE_FORMAT = 1
+
+
+@dataclass
+class BundleFile:
+    """A file (or directory, ending in /) of a bundle, as it goes on the SD."""
+
+    path: str
+    size: int
+    crc: int
+    package: str
+
+
+@dataclass
+class BundlePackage:
+    """A package merged into a bundle, and the release ZIP it came from."""
+
+    name: str
+    version: Optional[str]
+    zip: str
+    sha256: str
+
+
+@dataclass
+class BundleManifest:
+    """What a bundle contains."""
+
+    created: str
+    packages: List[BundlePackage] = field(default_factory=list)
+    files: List[BundleFile] = field(default_factory=list)
+    switch_up: str = __version__
+    format: int = BUNDLE_FORMAT
+
+    @property
+    def size(self) -> int:
+        return sum(f.size for f in self.files)
+
+    def names(self, package: str) -> List[str]:
+        """The member names of one package's files."""
+        return [f.path for f in self.files if f.package == package]
+
+
+def build_bundle(sources: List[Source], out: Path) -> BundleManifest:
+    """Merge the ZIPs of sources, in install order, into a bundle at out.
+
+    Each source's members are placed under its prefix; where two sources
+    ship the same path, the later one's file is kept. Junk (.DS_Store,
+    ._ files, __MACOSX...) is dropped. Returns the bundle's manifest.
+    """
+    out = Path(out)
+    # Bundle path -> (source index, member), in install order
+    plan: Dict[str, Tuple[int, zipfile.ZipInfo]] = {}
+    with ExitStack() as stack:
+        archives = [
+            stack.enter_context(zipfile.ZipFile(validate_zip(s.zip_path), "r"))
+            for s in sources
+        ]
+        for i, (source, zf) in enumerate(zip(sources, archives)):
+            root = source.root(Path("."))
+            for info in zf.infolist():
+                path = member_path(root, info.filename).as_posix()
+                if any(is_junk_name(part) for part in PurePosixPath(path).parts):
+                    continue
+                if info.is_dir():
+                    path += "/"
+                plan.pop(path, None)  # the last copy wins
+                plan[path] = (i, info)
+
+        order = sorted(plan.items(), key=lambda item: (item[1][0], _dir_order(item[0])))
+        names = [s.package or s.zip_path.stem for s in sources]
+        manifest = BundleManifest(
+            created=datetime.now().isoformat(timespec="seconds"),
+            packages=[
+                BundlePackage(name, s.version, s.zip_path.name, file_sha256(s.zip_path))
+                for name, s in zip(names, sources)
+            ],
+            files=[
+                BundleFile(path, info.file_size, info.CRC, names[i])
+                for path, (i, info) in order
+            ],
+        )
+
+        tmp = out.with_name(out.name + ".tmp")
+        try:
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_STORED) as bundle:
+                bundle.writestr(BUNDLE_MANIFEST, json.dumps(asdict(manifest)))
+                for path, (i, info) in order:
+                    member = zipfile.ZipInfo(path, date_time=info.date_time)
+                    if info.is_dir():
+                        bundle.writestr(member, b"")
+                        continue
+                    member.file_size = info.file_size
+                    with archives[i].open(info) as src:
+                        with bundle.open(member, "w") as dst:
+                            copy_stream(src, dst, size=info.file_size)
+            os.replace(tmp, out)
+        except BaseException:
+            if tmp.exists():
+                tmp.unlink()
+            raise
+    return manifest
+
+
+def read_manifest(bundle: Path) -> BundleManifest:
+    """Read a bundle's manifest and check it against the bundle's members.
+
+    Raises ValueError if bundle is not a switch-up bundle, was built by an
+    incompatible version, or does not hold the files its manifest lists.
+    """
+    bundle = validate_zip(bundle)
+    with zipfile.ZipFile(bundle, "r") as zf:
+        try:
+            data = json.loads(zf.read(BUNDLE_MANIFEST))
+        except KeyError:
+            raise ValueError(f"Not a switch-up bundle: {bundle}") from None
+        infos = {info.filename: info for info in zf.infolist()}
+
+    if data.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {data.get('format')}: {bundle}")
+    manifest = BundleManifest(
+        created=data["created"],
+        packages=[BundlePackage(**p) for p in data["packages"]],
+        files=[BundleFile(**f) for f in data["files"]],
+        switch_up=data["switch_up"],
+    )
+    for f in manifest.files:
+        info = infos.get(f.path)
+        if info is None or (info.file_size, info.CRC) != (f.size, f.crc):
+            raise ValueError(f"Bundle does not match its manifest: {f.path}")
+    return manifest
+
+
+def apply_bundle(
+    bundle: Path,
+    sd_path: Path,
+    console: Console,
+    differential: bool = True,
+    on_progress: Optional[Callable[[int], None]] = None,
+    verify: bool = False,
+) -> MergeResult:
+    """Install a bundle to the SD card, recording each of its packages.
+
+    Same guarantees as install_packages: one backup, one transaction, and
+    files already identical on the card are skipped.
+    """
+    bundle = Path(bundle)
+    manifest = read_manifest(bundle)
+    sources = [
+        Source(
+            bundle,
+            package=package.name,
+            version=package.version,
+            names=frozenset(manifest.names(package.name)),
+        )
+        for package in manifest.packages
+    ]
+    return install_packages(
+        sources,
+        sd_path,
+        console,
+        differential=differential,
+        on_progress=on_progress,
+        verify=verify,
+    )
+
+
+def _dir_order(path: str) -> Tuple[Tuple[str, ...], str]:
+    """Sort key keeping the entries of each directory together."""
+    parts = PurePosixPath(path).parts
+    return parts[:-1], parts[-1]
@@ -0,0 +1,201 @@
+"""Local cache of downloaded release assets, keyed by asset id and SHA-256."""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+CACHE_DIR = Path.home() / ".switch-up" / "cache"
+
+# Eviction limits applied automatically after every store
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_AGE_DAYS = 90
+
+_lock = threading.Lock()
+
+
+@dataclass
+class CacheEntry:
+    """A cached asset: where it came from, its digest, and when it was used."""
+
+    asset_id: str
+    sha256: str
+    name: str
+    size: int
+    last_used: float
+    path: Path
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the hex SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AssetCache:
+    """Content-addressed store for release ZIPs.
+
+    Layout under root:
+    - objects/<sha256>/<filename>: the asset content, stored once per digest
+    - assets/<asset_id>.json: which digest an asset id maps to, and when it
+      was last used (drives LRU eviction)
+    - partial/<asset_id>/<filename>: downloads in progress
+    """
+
+    def __init__(self, root: Optional[Path] = None) -> None:
+        self.root = Path(root) if root is not None else CACHE_DIR
+        self.objects = self.root / "objects"
+        self.assets = self.root / "assets"
+        self.partial = self.root / "partial"
+
+    def partial_path(self, asset_id: object, name: str) -> Path:
+        """Where an asset is downloaded to before being stored.
+
+        Lives inside the cache so that an interrupted download survives
+        until the next run and can be resumed.
+        """
+        return self.partial / str(asset_id) / name
+
+    def lookup(self, asset_id: object, sha256: Optional[str] = None) -> Optional[Path]:
+        """Return the cached file for an asset, or None on a miss.
+
+        If sha256 is given (e.g. the digest published in the release), an
+        entry with a different digest is treated as a miss.
+        """
+        with _lock:
+            entry = self._read_entry(str(asset_id))
+            if entry is None or not entry.path.is_file():
+                return None
+            if sha256 is not None and entry.sha256 != sha256.lower():
+                return None
+            if entry.path.stat().st_size != entry.size:
+                return None
+            entry.last_used = time.time()
+            self._write_entry(entry)
+            return entry.path
+
+    def store(
+        self, asset_id: object, path: Path, sha256: Optional[str] = None
+    ) -> Path:
+        """Move a downloaded file into the cache and return its new path.
+
+        sha256 may be passed if the caller already hashed the file.
+        """
+        path = Path(path)
+        if sha256 is None:
+            sha256 = file_sha256(path)
+        target = self.objects / sha256 / path.name
+        with _lock:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.is_file():
+                path.unlink()
+            else:
+                shutil.move(str(path), str(target))
+            if path.parent.parent == self.partial:
+                shutil.rmtree(path.parent, ignore_errors=True)
+            self._write_entry(
+                CacheEntry(
+                    asset_id=str(asset_id),
+                    sha256=sha256,
+                    name=path.name,
+                    size=target.stat().st_size,
+                    last_used=time.time(),
+                    path=target,
+                )
+            )
+        return target
+
+    def entries(self) -> List[CacheEntry]:
+        """List cached assets, most recently used first."""
+        if not self.assets.is_dir():
+            return []
+        found = []
+        for meta in self.assets.glob("*.json"):
+            entry = self._read_entry(meta.stem)
+            if entry is not None:
+                found.append(entry)
+        found.sort(key=lambda e: e.last_used, reverse=True)
+        return found
+
+    def prune(
+        self,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS,
+    ) -> List[CacheEntry]:
+        """Evict entries older than max_age_days, then least recently used
+        ones until the cache fits in max_bytes.
+
+        Returns the evicted entries.
+        """
+        with _lock:
+            keep = self.entries()
+            evicted: List[CacheEntry] = []
+
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                evicted += [e for e in keep if e.last_used < cutoff]
+                keep = [e for e in keep if e.last_used >= cutoff]
+                self._prune_partial(cutoff)
+
+            if max_bytes is not None:
+                while keep and self._total_size(keep) > max_bytes:
+                    evicted.append(keep.pop())
+
+            for entry in evicted:
+                (self.assets / f"{entry.asset_id}.json").unlink()
+            # Objects can be shared between asset ids; drop only orphans
+            live = {e.sha256 for e in keep}
+            for entry in evicted:
+                if entry.sha256 not in live:
+                    shutil.rmtree(self.objects / entry.sha256, ignore_errors=True)
+            return evicted
+
+    def _prune_partial(self, cutoff: float) -> None:
+        """Drop abandoned downloads not touched since cutoff."""
+        if not self.partial.is_dir():
+            return
+        for entry in self.partial.iterdir():
+            if entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def _total_size(self, entries: List[CacheEntry]) -> int:
+        return sum({e.sha256: e.size for e in entries}.values())
+
+    def _read_entry(self, asset_id: str) -> Optional[CacheEntry]:
+        meta = self.assets / f"{asset_id}.json"
+        try:
+            data = json.loads(meta.read_text())
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(
+            asset_id=asset_id,
+            sha256=data["sha256"],
+            name=data["name"],
+            size=data["size"],
+            last_used=data["last_used"],
+            path=self.objects / data["sha256"] / data["name"],
+        )
+
+    def _write_entry(self, entry: CacheEntry) -> None:
+        self.assets.mkdir(parents=True, exist_ok=True)
+        meta = self.assets / f"{entry.asset_id}.json"
+        tmp = meta.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "sha256": entry.sha256,
+                    "name": entry.name,
+                    "size": entry.size,
+                    "last_used": entry.last_used,
+                }
+            )
+        )
+        os.replace(tmp, meta)
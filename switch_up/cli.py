@@ -1,31 +1,57 @@
-"""CLI entry point. Defines commands with Typer and orchestrates modules."""
+"""CLI entry point. Defines commands with Typer and orchestrates modules.
+
+Only Typer, the Rich console and the standard library are imported at
+startup. Each command imports the modules it needs (requests, Rich
+progress and tables, the install stack) when it runs, so `--version`,
+`--help` and the offline commands start fast.
+"""
 
 import shutil
 import tempfile
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple, Union
 
 import typer
 from rich.console import Console
 
 from switch_up import __version__
-from switch_up.cleaner import clean_macos_junk, remove_xattrs
-from switch_up.core import install_zip
-from switch_up.network import (
-    download_asset,
-    find_zip_asset,
-    get_atmosphere_latest,
-    get_hekate_latest,
+from switch_up.utils import (
+    format_bytes,
+    format_duration,
+    resolve_sd_path,
+    resolve_sd_paths,
 )
-from switch_up.utils import resolve_sd_path
+
+if TYPE_CHECKING:
+    from rich.progress import Progress
+    from rich.table import Table
+
+    from switch_up.copier import IOTuning
+    from switch_up.core import Source
+    from switch_up.planner import InstallPlan
+    from switch_up.profiling import Profiler
+    from switch_up.registry import Package
+    from switch_up.zipstream import RemoteZip
 
 app = typer.Typer(
     name="switch-up",
     help="A secure Nintendo Switch updater for macOS.",
     add_completion=False,
 )
+cache_app = typer.Typer(help="Manage the local cache of downloaded releases.")
+app.add_typer(cache_app, name="cache")
+backup_app = typer.Typer(help="List, restore and prune configuration backups.")
+app.add_typer(backup_app, name="backup")
+bundle_app = typer.Typer(help="Build and apply offline install bundles.")
+app.add_typer(bundle_app, name="bundle")
 console = Console()
 
+# Packages resolved and downloaded at once
+DOWNLOAD_WORKERS = 4
+
 
 def version_callback(value: bool) -> None:
     if value:
@@ -47,6 +73,133 @@ def main(
     """switch-up: A secure Nintendo Switch updater for macOS."""
 
 
+def _fetch_package(
+    package: "Package",
+    dest: Path,
+    console: Console,
+    progress: "Progress",
+    use_cache: bool = True,
+    direct: bool = False,
+) -> Tuple[dict, Union[Path, "RemoteZip", None]]:
+    """Resolve a package's latest release and download its ZIP.
+
+    Runs in a worker thread, as a row of progress. Returns the release
+    info and the downloaded (or cached) ZIP, or None if no asset of the
+    release matches the package's pattern.
+
+    With direct=True, a ZIP that is not cached is not downloaded: only
+    its central directory is fetched, and a RemoteZip is returned to
+    install it while it downloads. If the server does not allow that,
+    the ZIP is downloaded as usual.
+    """
+    from switch_up.cache import AssetCache
+    from switch_up.network import (
+        asset_sha256,
+        download_asset,
+        find_zip_entry,
+        get_latest_release,
+        remote_zip,
+    )
+
+    release = get_latest_release(package.repo)
+    asset = find_zip_entry(release, package.asset)
+    if asset is None:
+        return release, None
+    cached = None
+    if direct and use_cache and asset.get("id") is not None:
+        cached = AssetCache().lookup(asset["id"], asset_sha256(asset))
+    if direct and cached is None:
+        remote = remote_zip(asset)
+        try:
+            remote.infolist()
+            return release, remote
+        except ValueError as e:
+            console.print(f"[yellow]{e}; downloading it first.[/]")
+    zip_file = download_asset(
+        asset["browser_download_url"],
+        dest,
+        console,
+        progress,
+        asset_id=asset.get("id"),
+        sha256=asset_sha256(asset),
+        use_cache=use_cache,
+        size=asset.get("size"),
+    )
+    return release, zip_file
+
+
+def _release_packages(ams_only: bool) -> List["Package"]:
+    """The packages of the registry to install, in install order."""
+    from switch_up.registry import load_registry
+
+    try:
+        packages = load_registry()
+    except (OSError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+    if ams_only:
+        packages = [p for p in packages if p.name == "Atmosphere"]
+    if not packages:
+        console.print("[bold red]Error:[/] No packages to install.")
+        raise typer.Exit(1)
+    return packages
+
+
+@contextmanager
+def _profiling(profile: Optional[Path], stats: bool) -> Iterator[None]:
+    """Record phases while the block runs, if --profile or --stats was given.
+
+    The trace and table are produced even when the block fails.
+    """
+    if profile is None and not stats:
+        yield
+        return
+    from switch_up import profiling
+
+    profiler = profiling.enable()
+    try:
+        yield
+    finally:
+        profiling.disable()
+        if stats:
+            console.print(_stats_table(profiler))
+        if profile is not None:
+            profiler.write_trace(profile)
+            console.print(
+                f"Trace written to {profile} (open it in chrome://tracing "
+                "or https://ui.perfetto.dev)."
+            )
+
+
+def _stats_table(profiler: "Profiler") -> "Table":
+    """Per-phase time, share of the total, files, bytes and throughput."""
+    from rich.table import Table
+
+    total = profiler.seconds
+    table = Table(title=f"Phases ({total:.2f}s total)")
+    table.add_column("Phase")
+    table.add_column("Calls", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Share", justify="right")
+    table.add_column("Files", justify="right")
+    table.add_column("Bytes", justify="right")
+    table.add_column("Rate", justify="right")
+    for s in profiler.summary():
+        rate = ""
+        if s.bytes and s.seconds:
+            rate = f"{format_bytes(s.bytes / s.seconds)}/s"
+        table.add_row(
+            s.name,
+            str(s.calls),
+            f"{s.seconds:.3f}s",
+            f"{s.seconds / total:.0%}" if total else "",
+            str(s.files) if s.files else "",
+            format_bytes(s.bytes) if s.bytes else "",
+            rate,
+        )
+    return table
+
+
 @app.command()
 def update(
     sd_path: Optional[Path] = typer.Option(
@@ -56,68 +209,121 @@ def update(
         False, "--latest", "-l", help="Download and install the latest version."
     ),
     ams_only: bool = typer.Option(
-        False, "--ams-only", help="Only update Atmosphere (skip Hekate)."
+        False, "--ams-only", help="Only update Atmosphere (skip other packages)."
+    ),
+    stream: bool = typer.Option(
+        True,
+        "--stream/--no-stream",
+        help="Write ZIP members straight to the SD instead of extracting first.",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Rewrite every file, even if already identical."
+    ),
+    verify: bool = typer.Option(
+        False, "--verify", help="Read written files back and check them."
+    ),
+    use_cache: bool = typer.Option(
+        True, "--cache/--no-cache", help="Reuse previously downloaded releases."
+    ),
+    profile: Optional[Path] = typer.Option(
+        None, "--profile", help="Write a Chrome trace of each phase to this file."
+    ),
+    stats: bool = typer.Option(False, "--stats", help="Print time spent per phase."),
+    direct: bool = typer.Option(
+        False,
+        "--direct",
+        help="Install while downloading, without storing the ZIPs.",
+    ),
+    writers: Optional[int] = typer.Option(
+        None,
+        "--writers",
+        min=1,
+        help="Threads writing small files (default: from the card's probe).",
+    ),
+    small_files: Optional[int] = typer.Option(
+        None,
+        "--small-files",
+        min=0,
+        help="KiB up to which files are written by those threads (default: 1024).",
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Show what would change on the card, and stop."
     ),
 ) -> None:
-    """Download and install the latest versions of Atmosphere and Hekate."""
+    """Download and install the latest release of every registry package."""
+    from switch_up.core import Source, install_packages
+    from switch_up.planner import plan_install
+    from switch_up.zipstream import RemoteZip
+
     try:
         sd = resolve_sd_path(sd_path)
     except (FileNotFoundError, ValueError) as e:
         console.print(f"[bold red]Error:[/] {e}")
         raise typer.Exit(1)
+    if direct and (verify or not stream):
+        console.print("[bold red]Error:[/] --direct needs --stream and no --verify.")
+        raise typer.Exit(1)
 
-    console.print(f"[bold]SD detected:[/] {sd}\n")
-    tmp_dir = Path(tempfile.mkdtemp(prefix="switch_up_dl_"))
-
-    try:
-        # Atmosphere
-        console.print("[bold cyan]== Atmosphere ==[/]")
-        ams_release = get_atmosphere_latest()
-        ams_version = ams_release.get("tag_name", "unknown")
-        console.print(f"Latest version: {ams_version}")
-
-        ams_url = find_zip_asset(ams_release)
-        if not ams_url:
-            console.print("[bold red]x[/] No .zip found in the release.")
-            raise typer.Exit(1)
-
-        ams_zip = download_asset(ams_url, tmp_dir, console)
-        install_zip(ams_zip, sd, console)
-        console.print()
-
-        # Hekate
-        if not ams_only:
-            console.print("[bold cyan]== Hekate ==[/]")
-            hek_release = get_hekate_latest()
-            hek_version = hek_release.get("tag_name", "unknown")
-            console.print(f"Latest version: {hek_version}")
-
-            hek_url = find_zip_asset(hek_release)
-            if not hek_url:
-                console.print("[bold red]x[/] No .zip found in the release.")
+    packages = _release_packages(ams_only)
+    with _profiling(profile, stats):
+        console.print(f"[bold]SD detected:[/] {sd}\n")
+        tmp_dir = Path(tempfile.mkdtemp(prefix="switch_up_dl_"))
+        try:
+            # Resolved and downloaded concurrently, installed in one pass
+            downloads = _download_all(packages, tmp_dir, use_cache, direct)
+            console.print()
+            sources = []
+            for package, version, zip_file in downloads:
+                remote = zip_file if isinstance(zip_file, RemoteZip) else None
+                sources.append(
+                    Source(
+                        Path(zip_file.name) if remote else zip_file,
+                        package.prefix,
+                        package.name,
+                        version,
+                        remote=remote,
+                    )
+                )
+            plan = None
+            if stream or dry_run:
+                plan = plan_install(sources, sd, differential=stream and not force)
+                _print_plan(plan, details=dry_run)
+            if dry_run:
+                console.print("\n[bold]Dry run:[/] nothing was changed.")
+                return
+            with _direct_progress(sources) as on_progress:
+                install_packages(
+                    sources,
+                    sd,
+                    console,
+                    stream=stream,
+                    differential=not force,
+                    on_progress=on_progress,
+                    verify=verify,
+                    plan=plan if stream else None,
+                    tuning=_tuning(sd, writers, small_files),
+                )
+        except Exception as e:
+            if not isinstance(e, typer.Exit):
+                console.print(f"[bold red]Unexpected error:[/] {e}")
                 raise typer.Exit(1)
+            raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
-            hek_zip = download_asset(hek_url, tmp_dir, console)
-            install_zip(hek_zip, sd, console)
-
-    except Exception as e:
-        if not isinstance(e, typer.Exit):
-            console.print(f"[bold red]Unexpected error:[/] {e}")
-            raise typer.Exit(1)
-        raise
-    finally:
-        shutil.rmtree(tmp_dir, ignore_errors=True)
-
-    console.print("\n[bold green]Update completed![/]")
+        console.print("\n[bold green]Update completed![/]")
 
 
 @app.command(name="fix-archive-bit")
 def fix_archive_bit(
-    sd_path: Optional[Path] = typer.Argument(
-        None, help="Path to the Switch SD card."
+    sd_path: Optional[Path] = typer.Argument(None, help="Path to the Switch SD card."),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", "-n", help="List the junk that would be removed."
     ),
 ) -> None:
     """Clean macOS junk files without updating anything."""
+    from switch_up.cleaner import remove_xattrs, scan_junk
+
     try:
         sd = resolve_sd_path(sd_path)
     except (FileNotFoundError, ValueError) as e:
@@ -125,16 +331,36 @@ def fix_archive_bit(
         raise typer.Exit(1)
 
     console.print(f"[bold]SD detected:[/] {sd}\n")
+
+    if dry_run:
+        report = scan_junk(sd, remove=False)
+        for path in report.dirs:
+            console.print(f"  {path.relative_to(sd)}/")
+        for path in report.files:
+            console.print(f"  {path.relative_to(sd)}")
+        console.print(f"\n{report.count} junk files/folders would be removed.")
+        return
+
     console.print("[bold blue]>[/] Cleaning macOS junk files...")
 
-    removed = clean_macos_junk(sd)
-    xattr_rc = remove_xattrs(sd)
+    junk = scan_junk(sd)
+    xattrs = remove_xattrs(sd)
 
-    console.print(f"  Removed {removed} junk files/folders.")
-    if xattr_rc == 0:
-        console.print("  Extended attributes cleaned successfully.")
+    console.print(f"  Removed {junk.count} junk files/folders.")
+    if junk.errors:
+        console.print(f"[yellow]  Warning: could not remove {len(junk.errors)} items.[/]")
+    if xattrs.ok:
+        console.print(
+            f"  Extended attributes cleaned successfully "
+            f"({xattrs.attrs_removed} removed from {len(xattrs.cleaned)} files)."
+        )
     else:
-        console.print("[yellow]  Warning: could not clean some xattrs.[/]")
+        console.print(
+            f"[yellow]  Warning: could not clean xattrs on "
+            f"{len(xattrs.errors)} paths.[/]"
+        )
+        for path, error in list(xattrs.errors.items())[:10]:
+            console.print(f"[yellow]    {path}: {error}[/]")
 
     console.print("\n[bold green]Cleanup completed![/]")
 
@@ -145,8 +371,41 @@ def install(
     sd_path: Optional[Path] = typer.Option(
         None, "--sd-path", "-s", help="Path to the Switch SD card."
     ),
+    stream: bool = typer.Option(
+        True,
+        "--stream/--no-stream",
+        help="Write ZIP members straight to the SD instead of extracting first.",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Rewrite every file, even if already identical."
+    ),
+    verify: bool = typer.Option(
+        False, "--verify", help="Read written files back and check them."
+    ),
+    profile: Optional[Path] = typer.Option(
+        None, "--profile", help="Write a Chrome trace of each phase to this file."
+    ),
+    stats: bool = typer.Option(False, "--stats", help="Print time spent per phase."),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Show what would change on the card, and stop."
+    ),
+    writers: Optional[int] = typer.Option(
+        None,
+        "--writers",
+        min=1,
+        help="Threads writing small files (default: from the card's probe).",
+    ),
+    small_files: Optional[int] = typer.Option(
+        None,
+        "--small-files",
+        min=0,
+        help="KiB up to which files are written by those threads (default: 1024).",
+    ),
 ) -> None:
     """Install a local ZIP file to the Switch SD card."""
+    from switch_up.core import Source, install_packages
+    from switch_up.planner import plan_install
+
     try:
         sd = resolve_sd_path(sd_path)
     except (FileNotFoundError, ValueError) as e:
@@ -160,8 +419,799 @@ def install(
     console.print(f"[bold]SD detected:[/] {sd}")
     console.print(f"[bold]ZIP:[/] {zip_path}\n")
 
-    install_zip(zip_path, sd, console)
-    console.print("\n[bold green]Installation completed![/]")
+    with _profiling(profile, stats):
+        sources = [Source(zip_path)]
+        plan = None
+        if stream or dry_run:
+            plan = plan_install(sources, sd, differential=stream and not force)
+            _print_plan(plan, details=dry_run)
+        if dry_run:
+            console.print("\n[bold]Dry run:[/] nothing was changed.")
+            return
+        install_packages(
+            sources,
+            sd,
+            console,
+            stream=stream,
+            differential=not force,
+            verify=verify,
+            plan=plan if stream else None,
+            tuning=_tuning(sd, writers, small_files),
+        )
+        console.print("\n[bold green]Installation completed![/]")
+
+
+@app.command(name="verify")
+def verify_command(
+    zip_path: Path = typer.Argument(..., help="Path to the installed .zip file."),
+    sd_path: Optional[Path] = typer.Option(
+        None, "--sd-path", "-s", help="Path to the Switch SD card."
+    ),
+    repair: bool = typer.Option(
+        False, "--repair", help="Rewrite the files that do not match."
+    ),
+) -> None:
+    """Check every file of a ZIP on the SD card against its CRC32."""
+    from switch_up.verify import rewrite_members, verify_members
+
+    try:
+        sd = resolve_sd_path(sd_path)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    if not zip_path.is_file():
+        console.print(f"[bold red]Error:[/] File not found: {zip_path}")
+        raise typer.Exit(1)
+
+    console.print(f"[bold blue]>[/] Verifying {zip_path.name} on {sd}...")
+    report = verify_members(zip_path, sd)
+    console.print(
+        f"  Checked {report.files_checked} files "
+        f"({format_bytes(report.bytes_checked)})."
+    )
+    if report.ok:
+        console.print("\n[bold green]All files match the ZIP.[/]")
+        return
+
+    for relpath, problem in sorted(report.mismatches.items()):
+        console.print(f"[red]  {relpath}: {problem}[/]")
+    if not repair:
+        console.print(f"\n[bold red]{len(report.mismatches)} files do not match.[/]")
+        raise typer.Exit(1)
+
+    rewrite_members(zip_path, sd, report.mismatches)
+    second = verify_members(zip_path, sd, list(report.mismatches))
+    if not second.ok:
+        console.print(
+            f"\n[bold red]{len(second.mismatches)} files still do not match.[/]"
+        )
+        raise typer.Exit(1)
+    console.print(
+        f"\n[bold green]Rewrote {len(report.mismatches)} files; all match now.[/]"
+    )
+
+
+@app.command()
+def fleet(
+    sd_paths: Optional[List[Path]] = typer.Argument(
+        None, help="SD card paths. Defaults to every detected card."
+    ),
+    zip_paths: Optional[List[Path]] = typer.Option(
+        None, "--zip", "-z", help="Install local ZIPs instead of the latest releases."
+    ),
+    ams_only: bool = typer.Option(
+        False, "--ams-only", help="Only install Atmosphere (skip other packages)."
+    ),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-j", help="Cards written at once (default: up to 8)."
+    ),
+    stream: bool = typer.Option(
+        True,
+        "--stream/--no-stream",
+        help="Write ZIP members straight to the SD instead of extracting first.",
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Rewrite every file, even if already identical."
+    ),
+    verify: bool = typer.Option(
+        False, "--verify", help="Read written files back and check them."
+    ),
+    use_cache: bool = typer.Option(
+        True, "--cache/--no-cache", help="Reuse previously downloaded releases."
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", help="Show what would change on the card, and stop."
+    ),
+) -> None:
+    """Install to many SD cards in parallel from a single download."""
+    from switch_up.fleet import install_fleet, plan_fleet, plan_table, summary_table
+
+    try:
+        cards = resolve_sd_paths(sd_paths)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    console.print(f"[bold]SD cards:[/] {len(cards)}")
+    for card in cards:
+        console.print(f"  {card}")
+    console.print()
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="switch_up_dl_"))
+    try:
+        if zip_paths:
+            for zip_path in zip_paths:
+                if not zip_path.is_file():
+                    console.print(f"[bold red]Error:[/] File not found: {zip_path}")
+                    raise typer.Exit(1)
+            zips = list(zip_paths)
+            labels = None
+            prefixes = None
+        else:
+            downloads = _download_all(_release_packages(ams_only), tmp_dir, use_cache)
+            zips = [zip_file for _, _, zip_file in downloads]
+            labels = [(package.name, version) for package, version, _ in downloads]
+            prefixes = [package.prefix for package, _, _ in downloads]
+            console.print()
+
+        if dry_run:
+            plans = plan_fleet(
+                zips,
+                cards,
+                workers=workers,
+                differential=stream and not force,
+                prefixes=prefixes,
+            )
+            console.print(plan_table(plans))
+            console.print("\n[bold]Dry run:[/] nothing was changed.")
+            return
+
+        results = install_fleet(
+            zips,
+            cards,
+            console,
+            workers=workers,
+            stream=stream,
+            differential=not force,
+            labels=labels,
+            verify=verify,
+            prefixes=prefixes,
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    console.print()
+    console.print(summary_table(results))
+    failed = [r for r in results if not r.ok]
+    if failed:
+        console.print(f"\n[bold red]{len(failed)} of {len(results)} cards failed.[/]")
+        raise typer.Exit(1)
+    console.print(f"\n[bold green]All {len(results)} cards completed![/]")
+
+
+@app.command()
+def watch(
+    root: Optional[Path] = typer.Option(
+        None,
+        "--root",
+        "-r",
+        help="Directory volumes are mounted in (default: /Volumes on macOS, "
+        "/run/media/<user> or /media/<user> on Linux).",
+    ),
+    workers: int = typer.Option(
+        4, "--workers", "-j", min=1, help="Cards written at once."
+    ),
+    ams_only: bool = typer.Option(
+        False, "--ams-only", help="Only install Atmosphere (skip other packages)."
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Rewrite every file, even if already identical."
+    ),
+    verify: bool = typer.Option(
+        False, "--verify", help="Read written files back and check them."
+    ),
+    interval: float = typer.Option(
+        2.0, "--interval", min=0.1, help="Seconds between scans for new cards."
+    ),
+    refresh: float = typer.Option(
+        30, "--refresh", min=1, help="Minutes between checks for new releases."
+    ),
+) -> None:
+    """Install the latest releases to every SD card as soon as it is mounted."""
+    import threading
+
+    from rich.live import Live
+
+    from switch_up.utils import default_mount_root
+    from switch_up.watch import DONE, FAILED, MountWatcher, ReleaseKeeper, Station
+
+    mount_root = root or default_mount_root()
+    if not mount_root.is_dir():
+        console.print(f"[bold red]Error:[/] Path does not exist: {mount_root}")
+        raise typer.Exit(1)
+
+    packages = _release_packages(ams_only)
+    tmp_dir = Path(tempfile.mkdtemp(prefix="switch_up_dl_"))
+    keeper = ReleaseKeeper(_prepare_releases(packages, tmp_dir), refresh * 60)
+    station = Station(keeper, workers, differential=not force, verify=verify)
+    try:
+        with MountWatcher(mount_root, interval) as watcher:
+            how = (
+                "kernel events"
+                if watcher.event_driven
+                else f"a scan every {interval:g}s"
+            )
+            console.print(f"[bold]Watching:[/] {mount_root} ({how})")
+            console.print("Insert SD cards to update them; press Ctrl+C to stop.\n")
+            keeper.start()
+            with Live(get_renderable=station.table, console=console):
+                try:
+                    station.run(watcher, threading.Event())
+                except KeyboardInterrupt:
+                    pass
+                # Installs under way finish; cards still waiting for the
+                # first releases fail
+                keeper.stop()
+                station.join()
+    finally:
+        keeper.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    done = sum(1 for s in station.statuses if s.state == DONE)
+    failed = sum(1 for s in station.statuses if s.state == FAILED)
+    console.print(f"\nUpdated {done} cards, {failed} failed.")
+    if failed:
+        raise typer.Exit(1)
+
+
+def _download_all(
+    packages: List["Package"], dest: Path, use_cache: bool, direct: bool = False
+) -> List[Tuple["Package", Optional[str], Union[Path, "RemoteZip"]]]:
+    """Resolve and download every package concurrently.
+
+    Returns (package, version, ZIP) in package order; exits if a release
+    has no matching asset. Release lookups are throttled to GitHub's rate
+    limits by the network module. With direct=True, ZIPs that can be
+    installed while they download are returned as RemoteZip instead (see
+    _fetch_package).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from switch_up.network import download_progress
+
+    workers = min(len(packages), DOWNLOAD_WORKERS)
+    with download_progress(console) as progress, ThreadPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(
+                _fetch_package, package, dest, console, progress, use_cache, direct
+            )
+            for package in packages
+        ]
+        try:
+            zips = []
+            for package, future in zip(packages, futures):
+                release, zip_file = future.result()
+                console.print(f"{package.name}: {release.get('tag_name', 'unknown')}")
+                if zip_file is None:
+                    console.print(
+                        f"[bold red]x[/] No asset matching {package.asset} "
+                        f"in the {package.name} release."
+                    )
+                    raise typer.Exit(1)
+                zips.append((package, release.get("tag_name"), zip_file))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return zips
+
+
+def _prepare_releases(
+    packages: List["Package"], dest: Path
+) -> Callable[[], List["Source"]]:
+    """Resolve and download the latest release of each package, silently.
+
+    For watch, whose status table is the only thing on screen: the
+    downloads report to a progress display that is never shown. ZIPs go
+    through the cache, so a release is downloaded only once.
+    """
+
+    def prepare() -> List["Source"]:
+        from rich.progress import Progress
+
+        from switch_up.core import Source
+
+        quiet = Console(quiet=True)
+        sources = []
+        for package in packages:
+            release, zip_file = _fetch_package(
+                package, dest, quiet, Progress(console=quiet)
+            )
+            if zip_file is None:
+                raise ValueError(
+                    f"No asset matching {package.asset} in the {package.name} release"
+                )
+            assert isinstance(zip_file, Path)
+            sources.append(
+                Source(zip_file, package.prefix, package.name, release.get("tag_name"))
+            )
+        return sources
+
+    return prepare
+
+
+def _tuning(
+    sd: Path, writers: Optional[int], small_files: Optional[int]
+) -> Optional["IOTuning"]:
+    """The card's IOTuning with the --writers and --small-files overrides.
+
+    None without overrides, so the install looks the card's tuning up.
+    """
+    if writers is None and small_files is None:
+        return None
+    from switch_up.probe import card_tuning
+
+    tuning = card_tuning(sd)
+    if writers is not None:
+        tuning = replace(tuning, writers=writers)
+    if small_files is not None:
+        tuning = replace(tuning, small_file_limit=small_files * 1024)
+    return tuning
+
+
+def _print_plan(plan: "InstallPlan", details: bool = False) -> None:
+    """Print what an install will do to the card and how long it should take.
+
+    With details, every file to create (+), overwrite (~) or delete (-)
+    is listed first.
+    """
+    from switch_up.planner import CREATE, OVERWRITE, SKIP, card_throughput
+
+    if details:
+        marks = {CREATE: "+", OVERWRITE: "~"}
+        for planned in plan.writes:
+            path = planned.target.relative_to(plan.dst).as_posix()
+            console.print(f"  {marks[planned.action]} {path}", markup=False)
+        for junk in plan.junk:
+            path = junk.relative_to(plan.dst).as_posix()
+            console.print(f"  - {path}", markup=False)
+    console.print(f"[bold blue]>[/] Plan for {plan.dst}:")
+    for label, action in (("Create", CREATE), ("Overwrite", OVERWRITE)):
+        console.print(
+            f"  {label:<10}{plan.count(action):>7} files "
+            f"({format_bytes(plan.bytes(action))})"
+        )
+    console.print(
+        f"  {'Skip':<10}{plan.count(SKIP):>7} files "
+        f"({format_bytes(plan.bytes(SKIP))}, unchanged)"
+    )
+    console.print(f"  {'Delete':<10}{len(plan.junk):>7} junk files")
+    throughput = card_throughput(plan.dst)
+    basis = "measured on this card" if throughput.measured_at else "not measured yet"
+    console.print(
+        f"  Estimated time: {format_duration(plan.estimate(throughput))} ({basis})"
+    )
+
+
+@contextmanager
+def _direct_progress(
+    sources: List["Source"],
+) -> Iterator[Optional[Callable[[int], None]]]:
+    """A progress bar for an install that downloads as it goes, if it does.
+
+    Yields the on_progress callback to pass to the install, or None when
+    every source is already on disk.
+    """
+    if all(source.remote is None for source in sources):
+        yield None
+        return
+
+    from switch_up.network import download_progress
+    from switch_up.utils import zip_payload_size
+
+    total = 0
+    for source in sources:
+        if source.remote is None:
+            total += zip_payload_size(source.zip_path)
+        else:
+            total += sum(
+                i.file_size for i in source.remote.infolist() if not i.is_dir()
+            )
+    with download_progress(console) as progress:
+        task = progress.add_task("Installing", total=total)
+        yield lambda size: progress.update(task, advance=size)
+
+
+@app.command(name="packages")
+def packages_command() -> None:
+    """List the packages update and fleet install, from the registry."""
+    from rich.table import Table
+
+    from switch_up.registry import REGISTRY_FILE
+
+    packages = _release_packages(ams_only=False)
+    table = Table()
+    table.add_column("Package")
+    table.add_column("Repository")
+    table.add_column("Asset")
+    table.add_column("Installed to")
+    for package in packages:
+        table.add_row(package.name, package.repo, package.asset, f"/{package.prefix}")
+    console.print(table)
+    if not REGISTRY_FILE.is_file():
+        console.print(f"Built-in defaults; create {REGISTRY_FILE} to change them.")
+
+
+@app.command()
+def status(
+    sd_path: Optional[Path] = typer.Argument(None, help="Path to the Switch SD card."),
+    deep: bool = typer.Option(
+        False, "--deep", help="Also re-read every file and check its CRC32."
+    ),
+) -> None:
+    """Show what switch-up installed on a card and whether it is intact."""
+    from rich.table import Table
+
+    from switch_up.state import StateIndex, is_intact, read_card_id
+    from switch_up.utils import file_crc32
+
+    try:
+        sd = resolve_sd_path(sd_path)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    card = read_card_id(sd)
+    if card is None:
+        console.print(f"No switch-up installs recorded for {sd}.")
+        return
+
+    with StateIndex() as index:
+        packages = index.packages(card)
+        files = index.files(card)
+
+    damaged = []
+    for record in files.values():
+        intact = is_intact(record, sd)
+        if intact and deep:
+            intact = file_crc32(sd / record.path) == record.crc
+        if not intact:
+            damaged.append(record)
+
+    console.print(f"[bold]SD:[/] {sd}")
+    console.print(f"[bold]Card ID:[/] {card}\n")
+    table = Table()
+    table.add_column("Package")
+    table.add_column("Version")
+    table.add_column("Installed")
+    table.add_column("Files", justify="right")
+    table.add_column("Intact", justify="right")
+    for pkg in packages:
+        total = sum(1 for r in files.values() if r.package == pkg.package)
+        bad = sum(1 for r in damaged if r.package == pkg.package)
+        table.add_row(
+            pkg.package,
+            pkg.version or "-",
+            datetime.fromtimestamp(pkg.installed_at).strftime("%Y-%m-%d %H:%M"),
+            str(total),
+            f"[green]{total}[/]" if not bad else f"[red]{total - bad}[/]",
+        )
+    console.print(table)
+
+    if damaged:
+        console.print(f"\n[bold red]{len(damaged)} files missing or modified:[/]")
+        for record in sorted(damaged, key=lambda r: r.path)[:20]:
+            console.print(f"  {record.path}")
+        raise typer.Exit(1)
+    console.print("\n[bold green]All installed files are intact.[/]")
+
+
+@app.command()
+def probe(
+    sd_path: Optional[Path] = typer.Argument(None, help="Path to the Switch SD card."),
+    force: bool = typer.Option(
+        False, "--force", "-f", help="Measure again even if the card was probed."
+    ),
+    size: int = typer.Option(
+        32, "--size", min=1, help="MiB written with each buffer size tried."
+    ),
+) -> None:
+    """Measure the card's write speeds and tune installs to it."""
+    from switch_up.copier import SYNC_ALL_NEVER
+    from switch_up.probe import BUFFER_SIZES, WRITER_COUNTS, card_probe, probe_card
+    from switch_up.state import StateIndex, card_id
+
+    try:
+        sd = resolve_sd_path(sd_path)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    console.print(f"[bold]SD detected:[/] {sd}\n")
+    result = None if force else card_probe(sd)
+    if result is None:
+        total = size * len(BUFFER_SIZES)
+        console.print(
+            f"[bold blue]>[/] Probing the card (writes {total} MiB and "
+            f"{len(WRITER_COUNTS)} batches of small files to a scratch directory)..."
+        )
+        try:
+            result = probe_card(sd, size=size * 1024 * 1024)
+        except OSError as e:
+            console.print(f"[bold red]Error:[/] Probe failed: {e}")
+            raise typer.Exit(1)
+        with StateIndex() as index:
+            index.record_probe(card_id(sd), result)
+    else:
+        assert result.measured_at is not None
+        measured = datetime.fromtimestamp(result.measured_at)
+        console.print(
+            f"[bold blue]>[/] Probed on {measured:%Y-%m-%d %H:%M} "
+            "(--force to measure again):"
+        )
+
+    tuning = result.tuning
+    console.print(
+        f"  Sequential write  {format_bytes(result.sequential_write)}/s "
+        f"({format_bytes(tuning.buffer_size)} writes)"
+    )
+    console.print(
+        f"  Small files       {result.small_files:.0f} files/s "
+        f"({tuning.writers} writers)"
+    )
+    console.print(f"  Read back         {format_bytes(result.read_back)}/s")
+    if tuning.sync_all_threshold >= SYNC_ALL_NEVER:
+        console.print("  Sync batching     fsync per file (sync() does not wait here)")
+    else:
+        console.print(
+            f"  Sync batching     one sync() from {tuning.sync_all_threshold} files on"
+        )
+    console.print("\n[bold green]Installs on this card will use these settings.[/]")
+
+
+@cache_app.command(name="ls")
+def cache_ls() -> None:
+    """List cached release assets, most recently used first."""
+    from rich.table import Table
+
+    from switch_up.cache import AssetCache
+
+    entries = AssetCache().entries()
+    if not entries:
+        console.print("Cache is empty.")
+        return
+
+    table = Table()
+    table.add_column("Asset ID")
+    table.add_column("File")
+    table.add_column("Size", justify="right")
+    table.add_column("Last used")
+    table.add_column("SHA-256")
+    for entry in entries:
+        table.add_row(
+            entry.asset_id,
+            entry.name,
+            format_bytes(entry.size),
+            datetime.fromtimestamp(entry.last_used).strftime("%Y-%m-%d %H:%M"),
+            entry.sha256[:12],
+        )
+    console.print(table)
+    total = sum(e.size for e in entries)
+    console.print(f"{len(entries)} assets, {format_bytes(total)} total.")
+
+
+@cache_app.command(name="prune")
+def cache_prune(
+    max_size_mb: Optional[int] = typer.Option(
+        None, "--max-size-mb", help="Evict least recently used assets above this size."
+    ),
+    max_age_days: Optional[int] = typer.Option(
+        None, "--max-age-days", help="Evict assets not used for this many days."
+    ),
+    clear: bool = typer.Option(False, "--all", help="Evict every cached asset."),
+) -> None:
+    """Evict cached release assets by size, age, or all of them."""
+    from switch_up.cache import AssetCache
+
+    if clear:
+        max_size_mb, max_age_days = 0, 0
+    elif max_size_mb is None and max_age_days is None:
+        console.print("[bold red]Error:[/] Use --max-size-mb, --max-age-days or --all.")
+        raise typer.Exit(1)
+
+    evicted = AssetCache().prune(
+        max_bytes=None if max_size_mb is None else max_size_mb * 1024 * 1024,
+        max_age_days=max_age_days,
+    )
+    freed = sum(e.size for e in evicted)
+    console.print(f"Evicted {len(evicted)} assets ({format_bytes(freed)}).")
+
+
+@backup_app.command(name="ls")
+def backup_ls() -> None:
+    """List configuration backups, newest first."""
+    from rich.table import Table
+
+    from switch_up.backup import BackupStore
+
+    snapshots = BackupStore().snapshots()
+    if not snapshots:
+        console.print("No backups yet.")
+        return
+
+    table = Table()
+    table.add_column("Backup ID")
+    table.add_column("Created")
+    table.add_column("SD card")
+    table.add_column("Files", justify="right")
+    table.add_column("Size", justify="right")
+    for snapshot in snapshots:
+        table.add_row(
+            snapshot.snapshot_id,
+            datetime.fromtimestamp(snapshot.created).strftime("%Y-%m-%d %H:%M"),
+            snapshot.sd_path,
+            str(len(snapshot.files)),
+            format_bytes(snapshot.size),
+        )
+    console.print(table)
+
+
+@backup_app.command(name="restore")
+def backup_restore(
+    backup_id: str = typer.Argument(..., help="Backup ID, as shown by backup ls."),
+    sd_path: Optional[Path] = typer.Option(
+        None, "--sd-path", "-s", help="Path to the Switch SD card."
+    ),
+) -> None:
+    """Restore the configuration files of a backup onto the SD card."""
+    from switch_up.backup import BackupStore
+    from switch_up.core import restore_backup
+
+    try:
+        sd = resolve_sd_path(sd_path)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    if BackupStore().get(backup_id) is None:
+        console.print(f"[bold red]Error:[/] No such backup: {backup_id}")
+        raise typer.Exit(1)
+
+    restored = restore_backup(backup_id, sd)
+    console.print(f"[bold green]v[/] Restored {restored} files to {sd}.")
+
+
+@backup_app.command(name="prune")
+def backup_prune(
+    keep_last: Optional[int] = typer.Option(
+        None, "--keep-last", help="Keep this many backups per SD card."
+    ),
+    max_age_days: Optional[int] = typer.Option(
+        None, "--max-age-days", help="Delete backups older than this many days."
+    ),
+) -> None:
+    """Delete old backups (the newest of each card is always kept)."""
+    from switch_up.backup import BackupStore
+
+    if keep_last is None and max_age_days is None:
+        console.print("[bold red]Error:[/] Use --keep-last or --max-age-days.")
+        raise typer.Exit(1)
+
+    deleted = BackupStore().prune(keep_last=keep_last, max_age_days=max_age_days)
+    console.print(f"Deleted {len(deleted)} backups.")
+
+
+@bundle_app.command(name="build")
+def bundle_build(
+    output: Optional[Path] = typer.Option(
+        None, "--output", "-o", help="Bundle file (default: switch-up-bundle-DATE.zip)."
+    ),
+    package_names: Optional[List[str]] = typer.Option(
+        None, "--package", "-p", help="Package to include (default: all of them)."
+    ),
+    use_cache: bool = typer.Option(
+        True, "--cache/--no-cache", help="Reuse previously downloaded releases."
+    ),
+) -> None:
+    """Download packages and merge them into one pre-cleaned bundle."""
+    from switch_up.bundle import build_bundle
+    from switch_up.core import Source
+
+    packages = _release_packages(ams_only=False)
+    if package_names:
+        known = {p.name for p in packages}
+        unknown = [name for name in package_names if name not in known]
+        if unknown:
+            console.print(f"[bold red]Error:[/] Unknown packages: {', '.join(unknown)}")
+            raise typer.Exit(1)
+        packages = [p for p in packages if p.name in package_names]
+    output = output or Path(f"switch-up-bundle-{datetime.now():%Y%m%d}.zip")
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="switch_up_dl_"))
+    try:
+        downloads = _download_all(packages, tmp_dir, use_cache)
+        console.print(f"\n[bold blue]>[/] Building {output}...")
+        manifest = build_bundle(
+            [
+                Source(zip_file, package.prefix, package.name, version)
+                for package, version, zip_file in downloads
+            ],
+            output,
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    console.print(
+        f"[bold green]v[/] Bundled {len(manifest.files)} files "
+        f"({format_bytes(manifest.size)}) from {len(manifest.packages)} packages."
+    )
+
+
+@bundle_app.command(name="apply")
+def bundle_apply(
+    bundle: Path = typer.Argument(..., help="Bundle built by bundle build."),
+    sd_path: Optional[Path] = typer.Option(
+        None, "--sd-path", "-s", help="Path to the Switch SD card."
+    ),
+    force: bool = typer.Option(
+        False, "--force", help="Rewrite every file, even if already identical."
+    ),
+    verify: bool = typer.Option(
+        False, "--verify", help="Read written files back and check them."
+    ),
+) -> None:
+    """Install a bundle to the SD card, without network access."""
+    from switch_up.bundle import apply_bundle, read_manifest
+
+    try:
+        sd = resolve_sd_path(sd_path)
+        manifest = read_manifest(bundle)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    console.print(f"[bold]SD detected:[/] {sd}")
+    console.print(f"[bold]Bundle:[/] {bundle} (built {manifest.created})")
+    for package in manifest.packages:
+        console.print(f"  {package.name} {package.version or ''}")
+    console.print()
+
+    apply_bundle(bundle, sd, console, differential=not force, verify=verify)
+    console.print("\n[bold green]Bundle applied![/]")
+
+
+@bundle_app.command(name="show")
+def bundle_show(
+    bundle: Path = typer.Argument(..., help="Bundle built by bundle build."),
+) -> None:
+    """List the packages of a bundle."""
+    from rich.table import Table
+
+    from switch_up.bundle import read_manifest
+
+    try:
+        manifest = read_manifest(bundle)
+    except (FileNotFoundError, ValueError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(1)
+
+    table = Table(title=f"{bundle.name} (built {manifest.created})")
+    table.add_column("Package")
+    table.add_column("Version")
+    table.add_column("From")
+    table.add_column("Files", justify="right")
+    table.add_column("Size", justify="right")
+    for package in manifest.packages:
+        files = [f for f in manifest.files if f.package == package.name]
+        table.add_row(
+            package.name,
+            package.version or "-",
+            package.zip,
+            str(len(files)),
+            format_bytes(sum(f.size for f in files)),
+        )
+    console.print(table)
 
 
 if __name__ == "__main__":
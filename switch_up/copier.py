@@ -0,0 +1,338 @@
+"""Copy engine for SD card targets (FAT32/exFAT).
+
+Files are copied in the kernel where possible (copy_file_range, then
+sendfile) and otherwise with large user-space buffers. Only the
+modification time is carried over: FAT cannot store permissions, owners
+or extended attributes, and trying to copy them is wasted work (or makes
+macOS write ._ files). Nothing is fsync'ed per file; written files and
+their directories are collected in a SyncBatch and made durable together.
+Small files are written by a FileWriter's threads, so the card reader
+always has several of them queued. The buffer size, writer threads and
+when to sync everything at once are the defaults below unless an
+IOTuning for the card says otherwise (see probe).
+"""
+
+import errno
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterable, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+# Size of each write to the card. SD cards write fastest in large,
+# allocation-unit sized chunks (typically 4 MiB)
+BUFFER_SIZE = 4 * 1024 * 1024
+
+# Threads issuing fsync calls when a batch is flushed
+SYNC_WORKERS = 8
+
+# From this many files on, one sync() of everything beats an fsync per file
+SYNC_ALL_THRESHOLD = 256
+
+# A sync_all_threshold no batch reaches: every file is fsync'ed
+SYNC_ALL_NEVER = 2**31 - 1
+
+# Files up to this size are written by a FileWriter's threads; larger ones
+# already keep the card busy on their own
+SMALL_FILE_LIMIT = 1024 * 1024
+
+
+@dataclass
+class IOTuning:
+    """How to write to a particular card: chunk size, threads, sync batching."""
+
+    # Size of each write
+    buffer_size: int = BUFFER_SIZE
+    # Threads writing (and fsync'ing) files concurrently
+    writers: int = SYNC_WORKERS
+    # From this many files on, SyncBatch.flush uses one sync()
+    sync_all_threshold: int = SYNC_ALL_THRESHOLD
+    # Files up to this size go through FileWriter's thread pool
+    small_file_limit: int = SMALL_FILE_LIMIT
+
+
+DEFAULT_TUNING = IOTuning()
+
+# The kernel copy is not possible between these files; copy in user space
+_NO_KERNEL_COPY = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EBADF,
+    errno.ENOTSUP,
+    getattr(errno, "EOPNOTSUPP", errno.ENOTSUP),
+}
+
+
+def copy_file(src: Path, dst: Path, buffer_size: int = BUFFER_SIZE) -> int:
+    """Copy the content and modification time of src to dst.
+
+    Returns the number of bytes copied.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb", buffering=0) as fdst:
+        st = os.fstat(fsrc.fileno())
+        copied = _kernel_copy(fsrc.fileno(), fdst.fileno(), st.st_size, buffer_size)
+        if copied is None:
+            copied = copy_stream(fsrc, fdst, buffer_size, st.st_size)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return copied
+
+
+def copy_stream(
+    source: BinaryIO,
+    out: BinaryIO,
+    buffer_size: int = BUFFER_SIZE,
+    size: Optional[int] = None,
+) -> int:
+    """Copy a stream (e.g. a ZIP member) in buffer_size writes.
+
+    The buffer is reused for every read, and out should be unbuffered
+    (buffering=0) so each chunk reaches the card as one write. size, if
+    known, keeps the buffer small for small files. Returns the number of
+    bytes copied.
+    """
+    if size is not None:
+        buffer_size = max(1, min(buffer_size, size))
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    copied = 0
+    while True:
+        n = source.readinto(buffer)  # type: ignore[attr-defined]
+        if not n:
+            return copied
+        chunk = view[:n]
+        while chunk:
+            written = out.write(chunk)
+            chunk = chunk[written:]
+        copied += n
+
+
+def write_file(path: Path, data: bytes) -> int:
+    """Write data (a small file's whole content) to path in one go."""
+    with open(path, "wb", buffering=0) as out:
+        view = memoryview(data)
+        while view:
+            view = view[out.write(view) :]
+    return len(data)
+
+
+def make_skeleton(dirs: Iterable[Path]) -> None:
+    """Create directories in order, parents first, before files go in them."""
+    for directory in sorted(set(map(Path, dirs))):
+        directory.mkdir(parents=True, exist_ok=True)
+
+
+def _kernel_copy(
+    src_fd: int, dst_fd: int, size: int, buffer_size: int
+) -> Optional[int]:
+    """Copy with copy_file_range or sendfile; None if neither works here."""
+    for copy in _kernel_copiers():
+        copied = 0
+        try:
+            while copied < size:
+                n = copy(src_fd, dst_fd, min(buffer_size, size - copied))
+                if n == 0:
+                    break
+                copied += n
+        except OSError as e:
+            if copied == 0 and e.errno in _NO_KERNEL_COPY:
+                continue
+            raise
+        return copied
+    return None
+
+
+def _kernel_copiers() -> List:
+    copiers = []
+    if hasattr(os, "copy_file_range"):
+        copiers.append(lambda src, dst, n: os.copy_file_range(src, dst, n))
+    # sendfile only accepts regular files as input and output on Linux
+    if sys.platform.startswith("linux") and hasattr(os, "sendfile"):
+        copiers.append(lambda src, dst, n: os.sendfile(dst, src, None, n))
+    return copiers
+
+
+class FileWriter:
+    """Write files through a bounded thread pool, large ones inline.
+
+    Creating a small file costs the card several round trips (directory
+    entry, FAT, data), so writing one at a time leaves the reader's command
+    queue mostly idle. Files up to tuning.small_file_limit are handed to
+    tuning.writers threads instead, with at most twice that many waiting,
+    which bounds the memory held by write(). Larger files are written on
+    the calling thread, meanwhile.
+
+    Use as a context manager: leaving it waits for every write, and raises
+    the first one that failed. A failure also stops copy() and write()
+    from accepting more files.
+    """
+
+    def __init__(self, tuning: IOTuning = DEFAULT_TUNING) -> None:
+        self.tuning = tuning
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if tuning.writers > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=tuning.writers, thread_name_prefix="switch-up-writer"
+            )
+        self._slots = threading.BoundedSemaphore(2 * max(1, tuning.writers))
+        self._error: Optional[BaseException] = None
+
+    def __enter__(self) -> "FileWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: object) -> None:
+        self.close()
+        if exc_type is None:
+            self._raise_error()
+
+    def is_small(self, size: int) -> bool:
+        return size <= self.tuning.small_file_limit
+
+    def copy(self, src: Path, dst: Path, size: int) -> None:
+        """Copy src to dst (see copy_file); size decides where."""
+        if self.is_small(size):
+            self._submit(copy_file, src, dst, self.tuning.buffer_size)
+        else:
+            self._raise_error()
+            copy_file(src, dst, self.tuning.buffer_size)
+
+    def write(self, path: Path, data: bytes) -> None:
+        """Write the content of a small file to path (see write_file)."""
+        self._submit(write_file, path, data)
+
+    def close(self) -> None:
+        """Wait for every queued write."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        self._raise_error()
+        if self._pool is None:
+            fn(*args)
+            return
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+
+    def _done(self, future: "Future[Any]") -> None:
+        self._slots.release()
+        error = future.exception()
+        if error is not None and self._error is None:
+            self._error = error
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+
+class SyncBatch:
+    """Written files and directories, made durable together by flush.
+
+    Instead of an fsync after every file, flush syncs all the files at
+    once (in parallel, or with a single sync() for large batches) and then
+    each directory exactly once, so renames and new entries are durable
+    too. tuning sets the threads and the size of a large batch.
+    """
+
+    def __init__(self, tuning: IOTuning = DEFAULT_TUNING) -> None:
+        self.files: List[Path] = []
+        self.dirs: Set[Path] = set()
+        self.tuning = tuning
+
+    def add(self, path: Path) -> None:
+        """Add a written file (and its directory)."""
+        path = Path(path)
+        self.files.append(path)
+        self.dirs.add(path.parent)
+
+    def add_dir(self, path: Path) -> None:
+        """Add a directory whose entries changed (files created or renamed)."""
+        self.dirs.add(Path(path))
+
+    def flush(self, workers: Optional[int] = None) -> None:
+        """Make every added file and directory durable, then empty the batch.
+
+        The single sync() is only used where it waits for the data to be
+        written (see sync_all_waits); elsewhere every file is fsync'ed.
+        """
+        if workers is None:
+            workers = self.tuning.writers
+        if len(self.files) >= self.tuning.sync_all_threshold and sync_all_waits():
+            os.sync()
+        elif self.files:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(fsync_path, self.files))
+        for directory in sorted(self.dirs):
+            fsync_path(directory)
+        self.files = []
+        self.dirs = set()
+
+
+def sync_all_waits() -> bool:
+    """Whether sync() returns only once everything is on the device.
+
+    Linux waits for the writeback; macOS (and the BSDs) merely schedule it,
+    and would skip the F_FULLFSYNC of fsync_fd besides.
+    """
+    return sys.platform.startswith("linux") and hasattr(os, "sync")
+
+
+def fsync_path(path: Path) -> None:
+    """fsync a file or directory by path.
+
+    Paths that are gone, and directories on platforms that cannot open
+    them (Windows), are ignored.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except (FileNotFoundError, IsADirectoryError, PermissionError):
+        return
+    try:
+        fsync_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_fd(fd: int) -> None:
+    """Flush a file to the device.
+
+    On macOS, fsync only reaches the drive's cache; F_FULLFSYNC is used to
+    get the data onto the card itself.
+    """
+    if fcntl is not None and hasattr(fcntl, "F_FULLFSYNC"):
+        try:
+            fcntl.fcntl(fd, fcntl.F_FULLFSYNC)
+            return
+        except OSError:
+            pass
+    os.fsync(fd)
+
+
+def drop_cache(fd: int) -> None:
+    """Best effort to make the next reads come from the card, not RAM.
+
+    Just-written data is usually still in the page cache, which would hide
+    a bad write (or make the card look fast). On Linux the file is flushed
+    and its cached pages dropped; on macOS caching is disabled for this
+    descriptor.
+    """
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        elif fcntl is not None and hasattr(fcntl, "F_NOCACHE"):
+            fcntl.fcntl(fd, fcntl.F_NOCACHE, 1)
+    except OSError:
+        pass
@@ -1,92 +1,531 @@
 """Core logic: config backup, Smart Merge, and restoration."""
 
+import os
 import shutil
-from datetime import datetime
+import time
+import zipfile
+from contextlib import ExitStack
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from rich.console import Console
 
-from switch_up.cleaner import clean_macos_junk, remove_xattrs
-from switch_up.utils import extract_zip
+from switch_up.backup import BACKUP_FILES, BackupStore, resolve_snapshot
+from switch_up.cleaner import clean_paths, remove_xattrs_paths
+from switch_up.copier import (
+    DEFAULT_TUNING,
+    FileWriter,
+    IOTuning,
+    SyncBatch,
+    copy_stream,
+    make_skeleton,
+)
+from switch_up.planner import SKIP, InstallPlan, measure_throughput, plan_merge
+from switch_up.probe import card_tuning
+from switch_up.profiling import phase
+from switch_up.state import FileRecord, StateIndex, card_id
+from switch_up.transaction import COMMITTED, Transaction, recover
+from switch_up.utils import (
+    extract_zip,
+    format_bytes,
+    member_path,
+    validate_zip,
+)
+from switch_up.verify import VerifyReport, verify_and_repair
+from switch_up.zipstream import RemoteZip
 
-# Critical files that are backed up before any operation
-BACKUP_FILES = [
-    "hekate_ipl.ini",
-    "exosphere.ini",
-    "bootloader/hekate_ipl.ini",
-    "atmosphere/config/system_settings.ini",
-]
 
+@dataclass
+class MergeResult:
+    """What a merge wrote to the SD and what it left untouched."""
 
-BACKUP_DIR = Path.home() / ".switch-up" / "backups"
+    files_written: int = 0
+    files_skipped: int = 0
+    bytes_written: int = 0
+    bytes_skipped: int = 0
+    # Files written and the directories they were written into
+    files: List[Path] = field(default_factory=list)
+    dirs: Set[Path] = field(default_factory=set)
+    # (relative path, size, CRC32) of every file merged from a ZIP,
+    # written or skipped; used to update the state index
+    members: List[Tuple[str, int, int]] = field(default_factory=list)
+    # (size, seconds) of each file written, its share of the commit
+    # included; used to measure the card's throughput
+    write_times: List[Tuple[int, float]] = field(default_factory=list)
+
+    @property
+    def touched(self) -> List[Path]:
+        """Every path the merge wrote, directories first."""
+        return sorted(self.dirs) + self.files
+
+    def record_file(self, path: Path, size: int, root: Path) -> None:
+        """Account for a file written under root."""
+        self.files_written += 1
+        self.bytes_written += size
+        self.files.append(path)
+        self.record_dir(path.parent, root)
+
+    def record_dir(self, path: Path, root: Path) -> None:
+        """Account for a directory under root, and its parents up to root."""
+        while path != root and path not in self.dirs:
+            self.dirs.add(path)
+            path = path.parent
+
+    def add(self, other: "MergeResult") -> None:
+        """Add what another merge wrote and skipped to this result."""
+        self.files_written += other.files_written
+        self.files_skipped += other.files_skipped
+        self.bytes_written += other.bytes_written
+        self.bytes_skipped += other.bytes_skipped
+        self.files.extend(other.files)
+        self.dirs |= other.dirs
+        self.members.extend(other.members)
+        self.write_times.extend(other.write_times)
+
+
+@dataclass
+class Source:
+    """A ZIP to install: where its members go and what it is recorded as."""
+
+    zip_path: Path
+    # Directory under the SD root the members are merged into
+    prefix: str = ""
+    package: Optional[str] = None
+    version: Optional[str] = None
+    # Names of the members to install, if not all (streamed merges only)
+    names: Optional[FrozenSet[str]] = None
+    # Read while it downloads instead of from zip_path, which then only
+    # names it (streamed merges only, see zipstream)
+    remote: Optional[RemoteZip] = None
+
+    def root(self, sd_path: Path) -> Path:
+        """The directory of sd_path the ZIP's members are merged into."""
+        if not self.prefix:
+            return Path(sd_path)
+        return member_path(Path(sd_path), self.prefix)
 
 
 def create_backup(sd_path: Path) -> Path:
-    """Create a backup of critical configuration files.
+    """Snapshot the configuration files of the SD card.
 
-    Backups are saved to ~/.switch-up/backups/ with a timestamp.
-    Returns the path of the backup directory.
+    Snapshots go to the deduplicated store in ~/.switch-up/backups/, which
+    is then pruned according to its retention policy (for this card only,
+    as other cards may be backed up at the same time). Besides the critical
+    BACKUP_FILES, settings under atmosphere/config/, bootloader/ and
+    switch/ are included; unchanged files cost a hard link, not a copy.
+    Returns the directory of the new snapshot, named after its id.
     """
-    sd_path = Path(sd_path)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_dir = BACKUP_DIR / timestamp
-    backup_dir.mkdir(parents=True, exist_ok=True)
+    store = BackupStore()
+    snapshot = store.create(sd_path)
+    store.prune(card=snapshot.card or snapshot.sd_path)
+    return store.tree(snapshot.snapshot_id)
 
-    for relpath in BACKUP_FILES:
-        source = sd_path / relpath
-        if source.is_file():
-            dest = backup_dir / relpath
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(source, dest)
 
-    return backup_dir
+def restore_backup(backup: Union[str, Path], sd_path: Path) -> int:
+    """Restore configuration files from a backup.
 
+    backup is a snapshot id or the directory returned by create_backup.
+    Plain backup directories from older versions are also accepted.
+    Returns the number of files restored.
+    """
+    store = BackupStore()
+    snapshot_id = resolve_snapshot(store, backup)
+    if snapshot_id is not None:
+        return store.restore(snapshot_id, sd_path)
 
-def restore_backup(backup_dir: Path, sd_path: Path) -> None:
-    """Restore configuration files from a backup."""
-    backup_dir = Path(backup_dir)
+    backup_dir = Path(backup)
+    if not backup_dir.is_dir():
+        raise FileNotFoundError(f"No such backup: {backup}")
     sd_path = Path(sd_path)
-
+    restored = 0
     for relpath in BACKUP_FILES:
         source = backup_dir / relpath
         if source.is_file():
             dest = sd_path / relpath
             dest.parent.mkdir(parents=True, exist_ok=True)
             shutil.copy2(source, dest)
+            restored += 1
+    return restored
 
 
-def smart_merge(src: Path, dst: Path) -> None:
+def smart_merge(src: Path, dst: Path, tuning: IOTuning = DEFAULT_TUNING) -> MergeResult:
     """Merge the contents of src into dst without deleting existing files.
 
-    Uses shutil.copytree with dirs_exist_ok=True so that files from
-    the ZIP update those on the SD, but files not in the ZIP are
-    preserved intact (mods, cheats, user configs).
+    Files from the ZIP update those on the SD, but files not in the ZIP
+    are preserved intact (mods, cheats, user configs). The directory
+    skeleton is created first; files are then written with the SD copy
+    engine, small ones by several threads (see FileWriter), tuned for the
+    card by tuning, and made durable in one batch at the end. Returns what
+    was written, including the paths touched.
     """
-    shutil.copytree(src, dst, dirs_exist_ok=True)
+    src = Path(src)
+    dst = Path(dst)
+    result = MergeResult()
+    batch = SyncBatch(tuning)
+
+    walked = [(Path(root), files) for root, _, files in os.walk(src)]
+    target_dirs = [dst / root.relative_to(src) for root, _ in walked]
+    make_skeleton(target_dirs)
+    with FileWriter(tuning) as writer:
+        for (root, files), target_dir in zip(walked, target_dirs):
+            result.record_dir(target_dir, dst)
+            for name in files:
+                target = target_dir / name
+                size = (root / name).stat().st_size
+                writer.copy(root / name, target, size)
+                batch.add(target)
+                result.record_file(target, size, dst)
+
+    batch.flush()
+    return result
 
 
-def install_zip(zip_path: Path, sd_path: Path, console: Console) -> None:
-    """Full installation process: backup -> extract -> merge -> clean.
+def stream_merge(
+    zip_path: Path,
+    dst: Path,
+    differential: bool = True,
+    on_progress: Optional[Callable[[int], None]] = None,
+    known: Optional[Dict[str, FileRecord]] = None,
+    transactional: bool = True,
+) -> MergeResult:
+    """Merge the members of a ZIP into dst without extracting it first.
 
-    Orchestrates the entire ZIP installation flow to the SD card.
-    If anything fails during the merge, the backup is automatically restored.
+    Each member is read from the archive and written straight to dst in
+    large fixed-size chunks, so memory use stays bounded regardless of
+    member size. Same semantics as smart_merge: files from the ZIP replace
+    those on the SD, nothing else is deleted.
+
+    With differential=True, members already identical on the SD (same size
+    and CRC32) are skipped instead of being rewritten. known maps relative
+    paths to their state index records, which lets unchanged files be
+    recognized without reading them. If on_progress is given, it is called
+    with the size of each file once it is handled.
+
+    With transactional=True the files are staged next to their targets and
+    committed together (see Transaction): if anything fails, the card is
+    left exactly as it was.
+    """
+    (result,) = stream_merge_sources(
+        [Source(zip_path)], dst, differential, on_progress, known, transactional
+    )
+    return result
+
+
+def stream_merge_sources(
+    sources: List[Source],
+    dst: Path,
+    differential: bool = True,
+    on_progress: Optional[Callable[[int], None]] = None,
+    known: Optional[Dict[str, FileRecord]] = None,
+    transactional: bool = True,
+    plan: Optional[InstallPlan] = None,
+    tuning: IOTuning = DEFAULT_TUNING,
+) -> List[MergeResult]:
+    """Merge several ZIPs into dst in one pass, like stream_merge.
+
+    Each source's members go under its prefix. Where two sources ship the
+    same file, the later one wins and the earlier one's copy is never
+    written. All the writes share one transaction, so either every
+    package is installed or none is. Returns one result per source, in
+    order. Their members are relative to dst (prefix included), while
+    files and dirs hold the full paths written on the card.
+
+    Remote sources are planned from their central directory and only
+    downloaded if one of their members has to be written; the download
+    is checked in full before the transaction is committed.
+
+    The merge carries out plan if given (its sources replace sources),
+    instead of comparing the card with the ZIPs first (see plan_merge).
+    Files are written and synced as tuning says (see probe).
+    """
+    dst = Path(dst)
+    if plan is None:
+        plan = plan_merge(sources, dst, differential, known)
+    sources = plan.sources
+    results = [MergeResult() for _ in sources]
+    writes: List[Tuple[int, zipfile.ZipInfo, Path]] = []
+    for planned in plan.files:
+        info = planned.info
+        result = results[planned.source]
+        relpath = planned.target.relative_to(dst).as_posix()
+        result.members.append((relpath, info.file_size, info.CRC))
+        if planned.action == SKIP:
+            result.files_skipped += 1
+            result.bytes_skipped += info.file_size
+            if on_progress is not None:
+                on_progress(info.file_size)
+        else:
+            writes.append((planned.source, info, planned.target))
+    dirs = plan.dirs
+
+    with ExitStack() as stack:
+        archives: List[Union[zipfile.ZipFile, RemoteZip]] = [
+            (
+                s.remote
+                if s.remote is not None
+                else stack.enter_context(zipfile.ZipFile(validate_zip(s.zip_path), "r"))
+            )
+            for s in sources
+        ]
+        transaction = None
+        if transactional and writes:
+            transaction = Transaction(
+                dst, [t for _, _, t in writes], [t for _, t in dirs]
+            )
+            transaction.begin()
+        try:
+            make_skeleton([t for _, t in dirs] + [t.parent for _, _, t in writes])
+            for i, target in dirs:
+                results[i].record_dir(target, dst)
+            batch = SyncBatch(tuning)
+            with phase("write") as p, FileWriter(tuning) as writer:
+                for i, archive in enumerate(archives):
+                    targets = {
+                        info.header_offset: target
+                        for j, info, target in writes
+                        if j == i
+                    }
+                    if not targets:
+                        continue
+                    wanted = [info for j, info, _ in writes if j == i]
+                    started = time.perf_counter()
+                    for info, source in _open_members(archive, wanted):
+                        target = targets[info.header_offset]
+                        out_path = transaction.staged(target) if transaction else target
+                        if writer.is_small(info.file_size):
+                            writer.write(out_path, source.read())
+                        else:
+                            with open(out_path, "wb", buffering=0) as out:
+                                copy_stream(
+                                    source, out, tuning.buffer_size, info.file_size
+                                )
+                        batch.add(out_path)
+                        results[i].record_file(target, info.file_size, dst)
+                        finished = time.perf_counter()
+                        results[i].write_times.append(
+                            (info.file_size, finished - started)
+                        )
+                        started = finished
+                        p.add(bytes=info.file_size, files=1)
+                        if on_progress is not None:
+                            on_progress(info.file_size)
+                # Waiting for the last small files is part of their cost
+                started = time.perf_counter()
+                writer.close()
+            with phase("commit") as p:
+                p.add(files=len(writes))
+                if transaction is not None:
+                    transaction.commit(batch)
+                else:
+                    batch.flush()
+                share = (time.perf_counter() - started) / max(1, len(writes))
+            for result in results:
+                result.write_times = [(n, t + share) for n, t in result.write_times]
+        except BaseException:
+            if transaction is not None:
+                transaction.rollback()
+            raise
+
+    return results
+
+
+def _open_members(
+    archive: Union[zipfile.ZipFile, RemoteZip], infos: List[zipfile.ZipInfo]
+) -> Iterator[Tuple[zipfile.ZipInfo, IO[bytes]]]:
+    """Yield each member of infos with a file to read its content from."""
+    if isinstance(archive, RemoteZip):
+        yield from archive.members(infos)
+        return
+    for info in infos:
+        with archive.open(info) as source:
+            yield info, source
+
+
+def install_zip(
+    zip_path: Path,
+    sd_path: Path,
+    console: Console,
+    stream: bool = True,
+    differential: bool = True,
+    on_progress: Optional[Callable[[int], None]] = None,
+    package: Optional[str] = None,
+    version: Optional[str] = None,
+    use_index: bool = True,
+    verify: bool = False,
+) -> MergeResult:
+    """Install one ZIP to the root of the SD card; see install_packages.
+
+    package (default: the ZIP name) and version are recorded in the card's
+    state index. Returns the merge statistics.
+    """
+    source = Source(Path(zip_path), package=package, version=version)
+    return install_packages(
+        [source],
+        sd_path,
+        console,
+        stream=stream,
+        differential=differential,
+        on_progress=on_progress,
+        use_index=use_index,
+        verify=verify,
+    )
+
+
+def install_packages(
+    sources: List[Source],
+    sd_path: Path,
+    console: Console,
+    stream: bool = True,
+    differential: bool = True,
+    on_progress: Optional[Callable[[int], None]] = None,
+    use_index: bool = True,
+    verify: bool = False,
+    plan: Optional[InstallPlan] = None,
+    tuning: Optional[IOTuning] = None,
+    extracted: Optional[List[Path]] = None,
+) -> MergeResult:
+    """Full installation process: backup -> merge -> clean.
+
+    Orchestrates the installation of one or more ZIPs to the SD card, in
+    a single pass: one backup, one merge, one clean and one state index
+    update, however many packages there are. Later sources win where two
+    ship the same file.
+
+    With stream=True the members are written directly from the ZIPs onto
+    the SD, skipping those already identical when differential=True;
+    otherwise each ZIP is extracted to a temporary directory and merged
+    from there. extracted may give those directories, one per source,
+    when the caller already extracted the ZIPs (and removes them itself).
+    If anything fails during the merge, the backup is automatically
+    restored. on_progress is passed on to the merge.
+
+    Streamed installs are transactional: files are staged on the card and
+    committed by renaming, so a failed merge leaves no file changed, and an
+    install interrupted by a crash or unplugged card is recovered the next
+    time one is run on that card.
+
+    Junk cleaning only looks at the paths the merge wrote and their
+    siblings, not the whole card; see fix-archive-bit for a full sweep.
+
+    In streaming mode with use_index=True, the card's state index is used
+    to skip unchanged files without reading them, and is updated with the
+    installed files of each source under its package (default: the ZIP
+    name) and version.
+
+    With verify=True every written file is read back and checked against
+    its ZIP; files that fail are rewritten once, and VerificationError is
+    raised if they still fail.
+
+    Sources with a remote archive are installed while they download (see
+    zipstream); that needs stream=True and cannot be combined with
+    verify=True, as there is no ZIP to repair from.
+
+    plan, from plan_install for the same sources and card, is carried out
+    instead of comparing the card with the ZIPs again (streaming only). It
+    is made afresh if an interrupted install had to be recovered first.
+    Streamed installs also measure the card's write throughput, which
+    later plans are estimated with. Writes use tuning, by default the
+    buffer size, writer threads and sync batching chosen by the card's
+    last probe (or the defaults if it was never probed).
+    Returns the merge statistics of all sources together.
     """
     sd_path = Path(sd_path)
-    zip_path = Path(zip_path)
+    if any(s.remote is not None for s in sources) and (verify or not stream):
+        raise ValueError("Installing while downloading needs streaming, not verify")
+    if plan is not None and not stream:
+        raise ValueError("An install plan can only be carried out by streaming")
+    if extracted is not None and (stream or len(extracted) != len(sources)):
+        raise ValueError("Extracted directories need stream=False, one per source")
+    sources = [
+        s if s.remote is not None else replace(s, zip_path=validate_zip(s.zip_path))
+        for s in sources
+    ]
+    for source in sources:
+        source.root(sd_path)  # reject unsafe prefixes before any write
+
+    # Finish or undo an install that was interrupted on this card
+    interrupted = recover(sd_path)
+    if interrupted is not None:
+        outcome = "finished" if interrupted.state == COMMITTED else "rolled back"
+        console.print(
+            f"[bold yellow]>[/] An interrupted install was {outcome} "
+            f"({len(interrupted.files)} files)."
+        )
+        plan = None  # made before the card changed
 
     # 1. Backup
     console.print("[bold blue]>[/] Backing up configuration...")
-    backup_dir = create_backup(sd_path)
+    with phase("backup"):
+        backup_dir = create_backup(sd_path)
     console.print(f"  Backup saved to: {backup_dir}")
 
-    # 2. Extract
-    console.print("[bold blue]>[/] Extracting ZIP...")
-    extracted = extract_zip(zip_path)
+    # What switch-up already installed on this card
+    card = None
+    known = None
+    if stream and use_index:
+        card = card_id(sd_path)
+        with StateIndex() as index:
+            known = index.files(card)
+
+    if tuning is None:
+        tuning = card_tuning(sd_path)
+
+    # 2. Extract (only when not streaming, unless the caller did)
+    temporary: List[Path] = []
+    if not stream and extracted is None:
+        console.print("[bold blue]>[/] Extracting ZIP...")
+        extracted = temporary = [extract_zip(source.zip_path) for source in sources]
 
     # 3. Smart Merge
+    zips = ", ".join(dict.fromkeys(source.zip_path.name for source in sources))
     try:
-        console.print("[bold blue]>[/] Merging files (Smart Merge)...")
-        smart_merge(extracted, sd_path)
+        with phase("merge", zip=zips) as p:
+            if stream:
+                origin = (
+                    "the download"
+                    if any(s.remote is not None for s in sources)
+                    else "ZIP"
+                )
+                console.print(
+                    f"[bold blue]>[/] Merging files (streaming from {origin})..."
+                )
+                merges = stream_merge_sources(
+                    sources,
+                    sd_path,
+                    differential=differential,
+                    on_progress=on_progress,
+                    known=known,
+                    plan=plan,
+                    tuning=tuning,
+                )
+            else:
+                console.print("[bold blue]>[/] Merging files (Smart Merge)...")
+                merges = [
+                    smart_merge(directory, source.root(sd_path), tuning)
+                    for source, directory in zip(sources, extracted or [])
+                ]
+            result = MergeResult()
+            for merge in merges:
+                result.add(merge)
+            p.add(bytes=result.bytes_written, files=result.files_written)
+        console.print(
+            f"  Wrote {result.files_written} files "
+            f"({format_bytes(result.bytes_written)}), "
+            f"skipped {result.files_skipped} unchanged "
+            f"({format_bytes(result.bytes_skipped)})."
+        )
     except Exception as e:
         console.print(f"[bold red]x[/] Error during merge: {e}")
         console.print("[bold yellow]>[/] Restoring backup...")
@@ -94,13 +533,81 @@ def install_zip(zip_path: Path, sd_path: Path, console: Console) -> None:
         console.print("[bold green]v[/] Backup restored successfully.")
         raise
 
-    # 4. Clean macOS junk
+    # 4. Clean macOS junk, only where the merge wrote
     console.print("[bold blue]>[/] Cleaning macOS junk files...")
-    removed = clean_macos_junk(sd_path)
-    remove_xattrs(sd_path)
+    touched = result.touched
+    with phase("clean"):
+        removed = clean_paths(touched)
+        xattrs = remove_xattrs_paths([t for t in touched if os.path.lexists(t)])
     console.print(f"  Removed {removed} junk files/folders.")
+    if not xattrs.ok:
+        console.print(
+            f"[yellow]  Warning: could not clean xattrs on "
+            f"{len(xattrs.errors)} paths.[/]"
+        )
+
+    # 5. Verify what reached the card
+    if verify:
+        written = sum(1 for p in result.files if os.path.lexists(p))
+        console.print(f"[bold blue]>[/] Verifying {written} written files...")
+        with phase("verify") as p:
+            report = _verify_sources(sources, merges, sd_path)
+            p.add(bytes=report.bytes_checked, files=report.files_checked)
+        if report.ok:
+            console.print(
+                f"  All {report.files_checked} files match the ZIP "
+                f"({format_bytes(report.bytes_checked)} read back)."
+            )
+        else:
+            console.print(
+                f"[yellow]  {len(report.mismatches)} files did not match "
+                f"and were rewritten:[/]"
+            )
+            for relpath, problem in sorted(report.mismatches.items())[:10]:
+                console.print(f"[yellow]    {relpath}: {problem}[/]")
 
-    # 5. Temp cleanup
-    shutil.rmtree(extracted, ignore_errors=True)
+    # 6. Update the card's state index
+    if card is not None:
+        with phase("state index"), StateIndex() as index:
+            for source, merge in zip(sources, merges):
+                index.record_install(
+                    card,
+                    sd_path,
+                    source.package or source.zip_path.stem,
+                    source.version,
+                    merge.members,
+                )
+            # Downloads would be measured along, not the card
+            if all(source.remote is None for source in sources):
+                measured = measure_throughput(
+                    result.write_times, index.throughput(card)
+                )
+                if measured is not None:
+                    index.record_throughput(card, measured)
+
+    # 7. Temp cleanup
+    for directory in temporary:
+        shutil.rmtree(directory, ignore_errors=True)
 
     console.print("[bold green]v[/] Installation completed successfully.")
+    return result
+
+
+def _verify_sources(
+    sources: List[Source], merges: List[MergeResult], sd_path: Path
+) -> VerifyReport:
+    """Verify and repair the files each source wrote; one combined report."""
+    combined = VerifyReport()
+    for source, merge in zip(sources, merges):
+        root = source.root(sd_path)
+        written = [
+            p.relative_to(root).as_posix() for p in merge.files if os.path.lexists(p)
+        ]
+        if not written:
+            continue
+        report = verify_and_repair(source.zip_path, root, written)
+        combined.files_checked += report.files_checked
+        combined.bytes_checked += report.bytes_checked
+        for relpath, problem in report.mismatches.items():
+            combined.mismatches[(Path(source.prefix) / relpath).as_posix()] = problem
+    return combined
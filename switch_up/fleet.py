@@ -0,0 +1,257 @@
+"""Fleet mode: install the same ZIPs to many SD cards in parallel."""
+
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from rich.console import Console
+from rich.progress import (
+    BarColumn,
+    DownloadColumn,
+    Progress,
+    TaskID,
+    TextColumn,
+    TimeElapsedColumn,
+)
+from rich.table import Table
+
+from switch_up.core import MergeResult, Source, install_packages
+from switch_up.planner import (
+    CREATE,
+    OVERWRITE,
+    SKIP,
+    InstallPlan,
+    card_throughput,
+    plan_install,
+)
+from switch_up.utils import (
+    extract_zip,
+    format_bytes,
+    format_duration,
+    zip_payload_size,
+)
+
+# Upper bound on cards written at once when no worker count is given
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class CardResult:
+    """Outcome of installing to one SD card."""
+
+    sd_path: Path
+    ok: bool = False
+    error: Optional[str] = None
+    seconds: float = 0.0
+    merges: List[MergeResult] = field(default_factory=list)
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(m.bytes_written for m in self.merges)
+
+    @property
+    def bytes_skipped(self) -> int:
+        return sum(m.bytes_skipped for m in self.merges)
+
+
+def fleet_progress(console: Console) -> Progress:
+    """Build the Rich progress display with one row per card."""
+    return Progress(
+        TextColumn("[bold]{task.description}"),
+        BarColumn(),
+        DownloadColumn(),
+        TextColumn("{task.fields[status]}"),
+        TimeElapsedColumn(),
+        console=console,
+    )
+
+
+def install_card(
+    sources: List[Source],
+    sd_path: Path,
+    progress: Progress,
+    task: TaskID,
+    stream: bool = True,
+    differential: bool = True,
+    verify: bool = False,
+    extracted: Optional[List[Path]] = None,
+) -> CardResult:
+    """Install every ZIP to one card in a single pass and report the outcome.
+
+    extracted is passed on to install_packages (stream=False only). Never
+    raises: errors are captured in the returned CardResult so that a
+    failing card does not abort the others.
+    """
+    result = CardResult(sd_path=sd_path)
+    # Per-card messages would interleave; the progress row replaces them
+    quiet = Console(quiet=True)
+    started = time.monotonic()
+
+    def advance(size: int) -> None:
+        progress.update(task, advance=size)
+
+    try:
+        progress.update(task, status="installing")
+        merge = install_packages(
+            sources,
+            sd_path,
+            quiet,
+            stream=stream,
+            differential=differential,
+            on_progress=advance,
+            verify=verify,
+            extracted=extracted,
+        )
+        result.merges.append(merge)
+        result.ok = True
+        progress.update(task, status="[green]done")
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+        progress.update(task, status="[red]failed")
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def install_fleet(
+    zip_paths: List[Path],
+    sd_paths: List[Path],
+    console: Console,
+    workers: Optional[int] = None,
+    stream: bool = True,
+    differential: bool = True,
+    labels: Optional[List[Tuple[str, Optional[str]]]] = None,
+    verify: bool = False,
+    prefixes: Optional[List[str]] = None,
+) -> List[CardResult]:
+    """Install the same ZIPs to every card concurrently.
+
+    labels optionally gives the (package, version) of each ZIP for the
+    card's state index, and prefixes the SD directory each is installed
+    into. Each card gets its own progress row. Without streaming, the ZIPs
+    are extracted once and every card is merged from the same directories.
+    Results are returned in the order of sd_paths, whether the card
+    succeeded or not.
+    """
+    zip_paths = [Path(p) for p in zip_paths]
+    sources = _sources(zip_paths, labels, prefixes)
+    total = sum(zip_payload_size(p) for p in zip_paths)
+    workers = workers or min(len(sd_paths), DEFAULT_WORKERS)
+
+    extracted: Optional[List[Path]] = None
+    try:
+        if not stream:
+            console.print("[bold blue]>[/] Extracting ZIPs...")
+            extracted = []
+            for zip_path in zip_paths:
+                extracted.append(extract_zip(zip_path))
+
+        with fleet_progress(console) as progress, ThreadPoolExecutor(workers) as pool:
+            futures = []
+            for sd_path in sd_paths:
+                task = progress.add_task(str(sd_path), total=total, status="waiting")
+                futures.append(
+                    pool.submit(
+                        install_card,
+                        sources,
+                        Path(sd_path),
+                        progress,
+                        task,
+                        stream,
+                        differential,
+                        verify,
+                        extracted,
+                    )
+                )
+            return [future.result() for future in futures]
+    finally:
+        for directory in extracted or []:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def plan_fleet(
+    zip_paths: List[Path],
+    sd_paths: List[Path],
+    workers: Optional[int] = None,
+    differential: bool = True,
+    prefixes: Optional[List[str]] = None,
+) -> List[Tuple[Path, Union[InstallPlan, Exception]]]:
+    """Plan installing the ZIPs to every card, concurrently; change nothing.
+
+    Returns (card, plan) in the order of sd_paths, with the error instead
+    of a plan for cards that could not be compared.
+    """
+    sources = _sources([Path(p) for p in zip_paths], None, prefixes)
+    workers = workers or min(len(sd_paths), DEFAULT_WORKERS)
+
+    def plan_card(sd_path: Path) -> Union[InstallPlan, Exception]:
+        try:
+            return plan_install(sources, sd_path, differential=differential)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(workers) as pool:
+        plans = list(pool.map(plan_card, [Path(p) for p in sd_paths]))
+    return list(zip([Path(p) for p in sd_paths], plans))
+
+
+def plan_table(plans: List[Tuple[Path, Union[InstallPlan, Exception]]]) -> Table:
+    """Per-card work of a fleet install, with estimated durations."""
+    table = Table(title="Fleet plan")
+    table.add_column("Card")
+    table.add_column("Create", justify="right")
+    table.add_column("Overwrite", justify="right")
+    table.add_column("Skip", justify="right")
+    table.add_column("Junk", justify="right")
+    table.add_column("To write", justify="right")
+    table.add_column("Est. time", justify="right")
+    for sd_path, plan in plans:
+        if isinstance(plan, Exception):
+            table.add_row(str(sd_path), f"[red]{plan}[/]", "", "", "", "", "")
+            continue
+        table.add_row(
+            str(sd_path),
+            str(plan.count(CREATE)),
+            str(plan.count(OVERWRITE)),
+            str(plan.count(SKIP)),
+            str(len(plan.junk)),
+            format_bytes(plan.bytes(CREATE) + plan.bytes(OVERWRITE)),
+            format_duration(plan.estimate(card_throughput(sd_path))),
+        )
+    return table
+
+
+def summary_table(results: List[CardResult]) -> Table:
+    """Per-card success/failure summary."""
+    table = Table(title="Fleet summary")
+    table.add_column("Card")
+    table.add_column("Result")
+    table.add_column("Written", justify="right")
+    table.add_column("Skipped", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Error")
+    for r in results:
+        table.add_row(
+            str(r.sd_path),
+            "[green]OK[/]" if r.ok else "[red]FAILED[/]",
+            format_bytes(r.bytes_written),
+            format_bytes(r.bytes_skipped),
+            f"{r.seconds:.1f}s",
+            r.error or "",
+        )
+    return table
+
+
+def _sources(
+    zip_paths: List[Path],
+    labels: Optional[List[Tuple[str, Optional[str]]]],
+    prefixes: Optional[List[str]],
+) -> List[Source]:
+    sources = []
+    for i, zip_path in enumerate(zip_paths):
+        package, version = labels[i] if labels else (None, None)
+        prefix = prefixes[i] if prefixes else ""
+        sources.append(Source(zip_path, prefix, package, version))
+    return sources
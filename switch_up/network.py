@@ -1,23 +1,175 @@
 """GitHub API client: query and download releases for Atmosphere and Hekate."""
 
+import fnmatch
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 from rich.console import Console
 from rich.progress import Progress, BarColumn, DownloadColumn, TransferSpeedColumn
+from urllib3.util.retry import Retry
+
+from switch_up import __version__
+from switch_up.cache import AssetCache, file_sha256
+from switch_up.profiling import phase
+from switch_up.zipstream import RemoteZip
 
 ATMOSPHERE_REPO = "Atmosphere-NX/Atmosphere"
 HEKATE_REPO = "CTCaer/hekate"
 GITHUB_API = "https://api.github.com"
 
+# Download chunks grow or shrink between these bounds so that each read
+# takes roughly TARGET_CHUNK_SECONDS at the observed throughput
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 0.25
+
+# How many times an interrupted download (or segment) is resumed before
+# giving up
+MAX_RESUMES = 5
+
+# Assets of known size are fetched as up to SEGMENTS parallel Range
+# requests of at least MIN_SEGMENT_SIZE each; a single CDN connection is
+# usually far slower than the link
+SEGMENTS = 4
+MIN_SEGMENT_SIZE = 2 * 1024 * 1024
+
+# A segmented download is assembled in this file next to its target
+SEGMENTED_SUFFIX = ".segments"
+
+# GitHub API calls in flight at once, whatever the number of packages
+API_CONCURRENCY = 4
+
+# Longest pause for a rate limit to reset before failing instead
+MAX_RATE_LIMIT_WAIT = 60.0
+
+# Errors after which a download is resumed from its .part file
+_RESUMABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.HTTPError,
+)
+
+
+class _RangesUnsupported(Exception):
+    """The server answered a Range request with something else."""
+
+
+class RateLimitError(Exception):
+    """The GitHub API rate limit is exhausted for longer than we wait."""
+
+
+class RateLimiter:
+    """Throttle API calls made from many threads to GitHub's rate limits.
+
+    At most `concurrency` calls run at once. When a response says the
+    limit is exhausted (X-RateLimit-Remaining: 0, or a Retry-After), every
+    thread holds off until the reset time the response gives.
+    """
+
+    def __init__(self, concurrency: int = API_CONCURRENCY) -> None:
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._resume_at = 0.0  # time.monotonic() before which no call starts
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Wait for a free slot and the end of any pause, then run the call."""
+        with self._slots:
+            with self._lock:
+                wait = self._resume_at - time.monotonic()
+            if wait > MAX_RATE_LIMIT_WAIT:
+                raise RateLimitError(_rate_limit_message(wait))
+            if wait > 0:
+                time.sleep(wait)
+            yield
+
+    def observe(self, response: requests.Response) -> Optional[float]:
+        """Record the limits a response reports.
+
+        Returns how long calls are paused for, if the limit is exhausted.
+        """
+        headers = response.headers
+        retry_after = headers.get("retry-after", "")
+        reset = headers.get("x-ratelimit-reset", "")
+        if retry_after.isdigit():
+            delay = float(retry_after)
+        elif headers.get("x-ratelimit-remaining") == "0" and reset.isdigit():
+            delay = max(0.0, int(reset) - time.time())
+        else:
+            return None
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        return delay
+
+
+_rate_limiter = RateLimiter()
+
+
+def _rate_limit_message(delay: float) -> str:
+    return f"GitHub API rate limit reached; it resets in {delay / 60:.0f} minutes"
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session, creating it on first use.
+
+    The session keeps connections alive across API calls and downloads,
+    and retries failed connections and 5xx responses with backoff. Rate
+    limit responses (403/429, whatever their Retry-After) are returned as
+    they are: the wait can be an hour, and get_latest_release leaves it to
+    the RateLimiter, which caps it at MAX_RATE_LIMIT_WAIT.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                respect_retry_after_header=False,
+                allowed_methods=frozenset({"GET", "HEAD"}),
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = f"switch-up/{__version__}"
+            _session = session
+        return _session
+
 
 def get_latest_release(repo: str) -> dict:
-    """Fetch the latest release info from a GitHub repository."""
+    """Fetch the latest release info from a GitHub repository.
+
+    Safe to call from many threads at once: calls are throttled by the
+    shared RateLimiter, and a call refused by the rate limit is retried
+    once the limit resets, unless that is more than MAX_RATE_LIMIT_WAIT
+    away (then RateLimitError is raised).
+    """
     url = f"{GITHUB_API}/repos/{repo}/releases/latest"
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
-    return response.json()
+    with phase("release lookup", repo=repo):
+        while True:
+            with _rate_limiter.slot():
+                response = get_session().get(url, timeout=30)
+            delay = _rate_limiter.observe(response)
+            if response.status_code in (403, 429) and delay is not None:
+                if delay > MAX_RATE_LIMIT_WAIT:
+                    raise RateLimitError(_rate_limit_message(delay))
+                continue
+            response.raise_for_status()
+            return response.json()
 
 
 def get_atmosphere_latest() -> dict:
@@ -30,44 +182,423 @@ def get_hekate_latest() -> dict:
     return get_latest_release(HEKATE_REPO)
 
 
+def find_zip_entry(release: dict, pattern: str = "*.zip") -> Optional[dict]:
+    """Find the first asset of a release whose name matches a glob pattern.
+
+    Returns the asset entry (id, name, URL, digest...), or None.
+    """
+    for asset in release.get("assets", []):
+        if fnmatch.fnmatchcase(asset.get("name", ""), pattern):
+            return asset
+    return None
+
+
 def find_zip_asset(release: dict) -> Optional[str]:
     """Find the .zip asset download URL in a release.
 
     Returns the URL of the first .zip asset, or None if not found.
     """
-    for asset in release.get("assets", []):
-        name = asset.get("name", "")
-        if name.endswith(".zip"):
-            return asset["browser_download_url"]
-    return None
+    asset = find_zip_entry(release)
+    return asset["browser_download_url"] if asset else None
 
 
-def download_asset(url: str, dest: Path, console: Console) -> Path:
-    """Download an asset from a URL with a Rich progress bar.
+def asset_sha256(asset: dict) -> Optional[str]:
+    """Return the SHA-256 GitHub publishes for an asset, if any.
 
-    Returns the path of the downloaded file.
+    The API reports it as a "digest" field of the form "sha256:<hex>".
     """
-    dest = Path(dest)
-    dest.mkdir(parents=True, exist_ok=True)
+    digest = asset.get("digest") or ""
+    algorithm, _, value = digest.partition(":")
+    return value.lower() if algorithm == "sha256" and value else None
 
-    filename = url.split("/")[-1]
-    filepath = dest / filename
 
-    response = requests.get(url, stream=True, timeout=60)
-    response.raise_for_status()
-    total = int(response.headers.get("content-length", 0))
+def download_progress(console: Console) -> Progress:
+    """Build the Rich progress display used for downloads.
 
-    with Progress(
+    A single instance can be shared by several concurrent downloads so
+    that each one gets its own row.
+    """
+    return Progress(
         "[progress.description]{task.description}",
         BarColumn(),
         DownloadColumn(),
         TransferSpeedColumn(),
         console=console,
-    ) as progress:
-        task = progress.add_task(f"Downloading {filename}", total=total)
-        with open(filepath, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-                progress.update(task, advance=len(chunk))
+    )
 
+
+def download_asset(
+    url: str,
+    dest: Path,
+    console: Console,
+    progress: Optional[Progress] = None,
+    asset_id: Optional[object] = None,
+    sha256: Optional[str] = None,
+    use_cache: bool = True,
+    size: Optional[int] = None,
+) -> Path:
+    """Download an asset from a URL with a Rich progress bar.
+
+    If progress is given, the download is added as a row of that (already
+    running) display instead of opening its own.
+
+    When size (the asset size published in the release) is known and large
+    enough, the asset is fetched as several parallel Range requests written
+    into a preallocated file. Otherwise, or if the server does not support
+    ranges, it is fetched as one stream into a .part file; if the
+    connection drops, the download resumes from where it stopped using an
+    HTTP Range request.
+
+    When asset_id is known, the local asset cache is checked first and the
+    download is stored there afterwards; the returned path then points into
+    the cache, and the .part file is kept there so that an interrupted
+    download can be resumed by a later run. If sha256 and size are given,
+    the download is verified against them.
+    Returns the path of the downloaded file.
+    """
+    cache = AssetCache() if use_cache and asset_id is not None else None
+    if cache is not None:
+        cached = cache.lookup(asset_id, sha256)
+        if cached is not None:
+            console.print(f"Using cached {cached.name}")
+            return cached
+
+    filename = url.split("/")[-1]
+    if cache is not None:
+        filepath = cache.partial_path(asset_id, filename)
+    else:
+        filepath = Path(dest) / filename
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+
+    with phase("download", file=filename) as p:
+        if progress is None:
+            with download_progress(console) as own_progress:
+                _fetch(url, filepath, size, own_progress)
+        else:
+            _fetch(url, filepath, size, progress)
+        p.add(bytes=filepath.stat().st_size, files=1)
+
+    actual_size = filepath.stat().st_size
+    if size is not None and actual_size != size:
+        filepath.unlink()
+        raise ValueError(
+            f"Size mismatch for {filename}: expected {size} bytes, "
+            f"got {actual_size}"
+        )
+
+    if sha256 is None and cache is None:
+        return filepath
+
+    with phase("checksum", file=filename) as p:
+        actual = file_sha256(filepath)
+        p.add(bytes=filepath.stat().st_size, files=1)
+    if sha256 is not None and actual != sha256.lower():
+        filepath.unlink()
+        raise ValueError(f"Checksum mismatch for {filename}")
+    if cache is not None:
+        filepath = cache.store(asset_id, filepath, sha256=actual)
+        cache.prune()
     return filepath
+
+
+def remote_zip(asset: dict, progress: Optional[Progress] = None) -> RemoteZip:
+    """An asset to install while it downloads, without storing it.
+
+    The asset's central directory is fetched with a Range request the
+    first time its members are listed, and ValueError is raised then if
+    the server does not support ranges or the release does not publish
+    the asset's size. Its body is later read in one stream, resumed with
+    a Range request if the connection drops; if progress is given, it is
+    shown as a row of that display. See zipstream.RemoteZip.
+    """
+    url = asset["browser_download_url"]
+    name = asset["name"]
+    size = asset.get("size") or 0
+
+    def fetch_range(start: int, end: int) -> bytes:
+        if not size:
+            raise ValueError(f"The size of {name} is not published")
+        return _get_range(url, start, end, size)
+
+    def open_stream() -> Iterator[bytes]:
+        task = None
+        if progress is not None:
+            task = progress.add_task(f"Downloading {name}", total=size)
+        return _iter_stream(url, size, progress, task)
+
+    return RemoteZip(name, size, fetch_range, open_stream, asset_sha256(asset))
+
+
+def _get_range(url: str, start: int, end: int, size: int) -> bytes:
+    """Fetch bytes start..end (inclusive) of url, whose full size is size."""
+    headers = {"Accept-Encoding": "identity", "Range": f"bytes={start}-{end}"}
+    with phase("download range", start=start, end=end) as p:
+        response = get_session().get(url, timeout=60, headers=headers)
+        response.raise_for_status()
+        if response.status_code != 206 or _content_range(response) != (
+            start,
+            end,
+            size,
+        ):
+            raise ValueError(
+                f"Cannot stream {url.split('/')[-1]}: the server does not "
+                "support Range requests"
+            )
+        p.add(bytes=len(response.content))
+    return response.content
+
+
+def _iter_stream(
+    url: str, size: int, progress: Optional[Progress], task: object
+) -> Iterator[bytes]:
+    """Yield the size bytes of url as they arrive, resuming on errors."""
+    offset = 0
+    resumes = 0
+    headers = {"Accept-Encoding": "identity"}
+    with phase("download", file=url.split("/")[-1]) as p:
+        while offset < size:
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                with get_session().get(
+                    url, stream=True, timeout=60, headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    content_range = _content_range(response)
+                    if offset and (
+                        response.status_code != 206
+                        or content_range is None
+                        or content_range[0] != offset
+                    ):
+                        raise ValueError(
+                            f"Cannot resume {url.split('/')[-1]}: the server "
+                            "does not support Range requests"
+                        )
+                    for chunk in _iter_adaptive(response):
+                        offset += len(chunk)
+                        p.add(bytes=len(chunk))
+                        if progress is not None:
+                            progress.update(task, advance=len(chunk))
+                        yield chunk
+                if offset < size:
+                    raise requests.exceptions.ChunkedEncodingError("Download truncated")
+            except _RESUMABLE_ERRORS:
+                resumes += 1
+                if resumes > MAX_RESUMES:
+                    raise
+        p.add(files=1)
+
+
+def _fetch(url: str, filepath: Path, size: Optional[int], progress: Progress) -> None:
+    """Download url into filepath, in segments when possible."""
+    part = filepath.with_name(filepath.name + ".part")
+    # A .part file left by an interrupted single-stream download is resumed
+    if size and len(_segments(size)) > 1 and not part.exists():
+        if hasattr(os, "pwrite"):
+            try:
+                _fetch_segmented(url, filepath, size, progress)
+                return
+            except _RangesUnsupported:
+                pass
+    _fetch_resumable(url, filepath, progress)
+
+
+def _fetch_segmented(url: str, filepath: Path, size: int, progress: Progress) -> None:
+    """Download url as parallel Range requests into a preallocated file.
+
+    Each segment is written at its offset with os.pwrite and resumed on
+    its own if its connection drops. Raises _RangesUnsupported if the
+    server does not answer with the requested ranges; nothing is kept then.
+    """
+    part = filepath.with_name(filepath.name + SEGMENTED_SUFFIX)
+    task = progress.add_task(f"Downloading {filepath.name}", total=size)
+    stop = threading.Event()
+    fd = os.open(part, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    done = False
+    try:
+        _preallocate(fd, size)
+        segments = _segments(size)
+        with ThreadPoolExecutor(len(segments)) as pool:
+            futures = [
+                pool.submit(
+                    _fetch_segment, url, fd, start, end, size, progress, task, stop
+                )
+                for start, end in segments
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                stop.set()  # the other segments give up at their next chunk
+                raise
+        done = True
+    except _RangesUnsupported:
+        progress.remove_task(task)
+        raise
+    finally:
+        os.close(fd)
+        if not done:
+            part.unlink()
+    os.replace(part, filepath)
+
+
+def _fetch_segment(
+    url: str,
+    fd: int,
+    start: int,
+    end: int,
+    size: int,
+    progress: Progress,
+    task: object,
+    stop: threading.Event,
+) -> None:
+    """Fetch bytes start..end (inclusive) of url into fd at their offset."""
+    offset = start
+    resumes = 0
+    # Ranges must apply to the file itself, not a compressed encoding of it
+    headers = {"Accept-Encoding": "identity"}
+    with phase("download segment", start=start, end=end) as p:
+        while offset <= end and not stop.is_set():
+            headers["Range"] = f"bytes={offset}-{end}"
+            try:
+                with get_session().get(
+                    url, stream=True, timeout=60, headers=headers
+                ) as response:
+                    response.raise_for_status()
+                    content_range = _content_range(response)
+                    if response.status_code != 206 or content_range is None:
+                        raise _RangesUnsupported(url)
+                    first, last, total = content_range
+                    if total != size:
+                        raise ValueError(
+                            f"Size mismatch for {url.split('/')[-1]}: expected "
+                            f"{size} bytes, the server has {total}"
+                        )
+                    if (first, last) != (offset, end):
+                        raise _RangesUnsupported(url)
+
+                    for chunk in _iter_adaptive(response):
+                        if stop.is_set():
+                            return
+                        chunk = chunk[: end + 1 - offset]
+                        _pwrite_all(fd, chunk, offset)
+                        offset += len(chunk)
+                        p.add(bytes=len(chunk))
+                        progress.update(task, advance=len(chunk))
+                        if offset > end:
+                            break
+                if offset <= end:
+                    raise requests.exceptions.ChunkedEncodingError("Segment truncated")
+            except _RESUMABLE_ERRORS:
+                resumes += 1
+                if resumes > MAX_RESUMES:
+                    raise
+
+
+def _segments(size: int) -> List[Tuple[int, int]]:
+    """Split size bytes into up to SEGMENTS inclusive (start, end) ranges."""
+    count = max(1, min(SEGMENTS, size // MIN_SEGMENT_SIZE))
+    step = -(-size // count)
+    return [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+
+def _preallocate(fd: int, size: int) -> None:
+    """Give fd its final size up front, so segments can land in any order."""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass  # not supported by this filesystem
+    os.ftruncate(fd, size)
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _fetch_resumable(url: str, filepath: Path, progress: Progress) -> None:
+    """Download url into filepath via a .part file, resuming on errors.
+
+    If a .part file is already present (e.g. from an interrupted run), the
+    download continues from its current size.
+    """
+    part = filepath.with_name(filepath.name + ".part")
+    task = progress.add_task(f"Downloading {filepath.name}", total=None)
+    resumes = 0
+
+    while True:
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            with get_session().get(
+                url, stream=True, timeout=60, headers=headers
+            ) as response:
+                if response.status_code == 416:
+                    # Nothing left to fetch, or a stale .part: start over
+                    if _range_total(response) == offset:
+                        break
+                    part.unlink()
+                    continue
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    offset = 0  # the server ignored the Range header
+                length = response.headers.get("content-length")
+                total = offset + int(length) if length else None
+                progress.update(task, total=total, completed=offset)
+
+                with open(part, "ab" if offset else "wb") as f:
+                    for chunk in _iter_adaptive(response):
+                        f.write(chunk)
+                        progress.update(task, advance=len(chunk))
+
+            if total is None or part.stat().st_size >= total:
+                break
+            raise requests.exceptions.ChunkedEncodingError("Download truncated")
+        except _RESUMABLE_ERRORS:
+            resumes += 1
+            if resumes > MAX_RESUMES:
+                raise
+
+    os.replace(part, filepath)
+
+
+def _content_range(response: requests.Response) -> Optional[Tuple[int, int, int]]:
+    """Parse (first, last, total) from a 'Content-Range: bytes a-b/N' header."""
+    value = response.headers.get("content-range", "")
+    unit, _, spec = value.partition(" ")
+    span, _, total = spec.partition("/")
+    first, _, last = span.partition("-")
+    if unit != "bytes" or not (first.isdigit() and last.isdigit() and total.isdigit()):
+        return None
+    return int(first), int(last), int(total)
+
+
+def _range_total(response: requests.Response) -> Optional[int]:
+    """Parse the full size from a 'Content-Range: bytes */N' header."""
+    _, _, total = response.headers.get("content-range", "").partition("/")
+    return int(total) if total.isdigit() else None
+
+
+def _iter_adaptive(response: requests.Response) -> Iterator[bytes]:
+    """Yield the response body in chunks sized to the observed throughput.
+
+    Starts at MIN_CHUNK_SIZE and doubles or halves the chunk size so each
+    read takes about TARGET_CHUNK_SECONDS, bounded by MAX_CHUNK_SIZE.
+    """
+    chunk_size = MIN_CHUNK_SIZE
+    while True:
+        started = time.monotonic()
+        chunk = response.raw.read(chunk_size, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+        elapsed = time.monotonic() - started
+        if elapsed < TARGET_CHUNK_SECONDS / 2 and len(chunk) == chunk_size:
+            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+        elif elapsed > TARGET_CHUNK_SECONDS * 2:
+            chunk_size = max(chunk_size // 2, MIN_CHUNK_SIZE)
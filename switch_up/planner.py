@@ -0,0 +1,256 @@
+"""Install plans: what an install will do to a card, worked out beforehand.
+
+plan_merge compares the members of one or more ZIPs with the SD card and
+decides, for each file, whether it will be created, overwritten, or
+skipped as already identical, and which macOS junk the cleanup will then
+delete. install_packages executes such a plan, so the card is compared
+only once whether or not the plan was looked at first (a dry run just
+prints it). A plan's duration is estimated from the write throughput
+measured on the card during previous installs.
+"""
+
+import os
+import zipfile
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from switch_up.cleaner import junk_candidates
+from switch_up.profiling import phase
+from switch_up.state import (
+    FileRecord,
+    StateIndex,
+    Throughput,
+    is_intact,
+    read_card_id,
+)
+from switch_up.utils import file_crc32, member_path, validate_zip
+
+if TYPE_CHECKING:
+    from switch_up.core import Source
+
+# Chunk size used when reading files on the SD card back
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# What happens to a planned file
+CREATE = "create"
+OVERWRITE = "overwrite"
+SKIP = "skip"
+
+# Assumed for cards nothing was measured on yet: a slow-ish SD card
+# behind a USB reader
+DEFAULT_THROUGHPUT = Throughput(bytes_per_second=10e6, seconds_per_file=0.01)
+
+# Files at least this large measure sequential speed, smaller ones the
+# cost per file (see measure_throughput)
+LARGE_FILE_SIZE = 1024 * 1024
+
+
+@dataclass
+class PlannedFile:
+    """A member of a source's ZIP, and what the install does with it."""
+
+    source: int
+    info: zipfile.ZipInfo
+    target: Path
+    action: str
+
+    @property
+    def size(self) -> int:
+        return self.info.file_size
+
+
+@dataclass
+class InstallPlan:
+    """Everything an install of sources to dst will do, in order."""
+
+    dst: Path
+    sources: List["Source"]
+    files: List[PlannedFile] = field(default_factory=list)
+    # Directory entries of the ZIPs, by source index
+    dirs: List[Tuple[int, Path]] = field(default_factory=list)
+    # macOS junk the cleanup will delete (from the ZIPs or already there)
+    junk: List[Path] = field(default_factory=list)
+
+    @property
+    def writes(self) -> List[PlannedFile]:
+        """The files that will be written, in order."""
+        return [f for f in self.files if f.action != SKIP]
+
+    def count(self, action: str) -> int:
+        return sum(1 for f in self.files if f.action == action)
+
+    def bytes(self, action: str) -> int:
+        return sum(f.size for f in self.files if f.action == action)
+
+    def estimate(self, throughput: Throughput) -> float:
+        """Seconds the writes of this plan take at throughput."""
+        writes = self.writes
+        return throughput.seconds(sum(f.size for f in writes), len(writes))
+
+
+def is_unchanged(info: zipfile.ZipInfo, target: Path) -> bool:
+    """Check whether target already holds the content of a ZIP member.
+
+    Compares the size first and only then the CRC32 recorded in the ZIP
+    central directory, so the archive itself is never decompressed and
+    files of a different size are never read.
+    """
+    try:
+        if target.stat().st_size != info.file_size:
+            return False
+    except OSError:
+        return False
+    return file_crc32(target, COPY_BUFFER_SIZE) == info.CRC
+
+
+def needs_write(
+    info: zipfile.ZipInfo, target: Path, record: Optional[FileRecord], root: Path
+) -> bool:
+    """Decide whether a ZIP member has to be (re)written to target.
+
+    If the state index has a record for target and the file still has the
+    recorded size and mtime, the recorded CRC32 is trusted and the file is
+    not read. Otherwise falls back to is_unchanged.
+    """
+    if record is not None and is_intact(record, root):
+        return record.crc != info.CRC or record.size != info.file_size
+    return not is_unchanged(info, target)
+
+
+def plan_merge(
+    sources: List["Source"],
+    dst: Path,
+    differential: bool = True,
+    known: Optional[Dict[str, FileRecord]] = None,
+) -> InstallPlan:
+    """Compare the members of sources with dst; see stream_merge_sources.
+
+    Only reads the card (and, for files the state index in known does not
+    vouch for, their content). Raises IsADirectoryError if a file would
+    replace a directory.
+    """
+    dst = Path(dst)
+    plan = InstallPlan(dst, list(sources))
+    planned: Dict[Path, Tuple[int, zipfile.ZipInfo]] = {}
+    with phase("compare") as p, ExitStack() as stack:
+        for i, source in enumerate(sources):
+            if source.remote is not None:
+                infos = source.remote.infolist()
+            else:
+                zf = stack.enter_context(
+                    zipfile.ZipFile(validate_zip(source.zip_path), "r")
+                )
+                infos = zf.infolist()
+            root = source.root(dst)
+            for info in infos:
+                if source.names is not None and info.filename not in source.names:
+                    continue
+                target = member_path(root, info.filename)
+                if info.is_dir():
+                    plan.dirs.append((i, target))
+                    continue
+                planned.pop(target, None)  # the last copy wins
+                planned[target] = (i, info)
+
+        for target, (i, info) in planned.items():
+            relpath = target.relative_to(dst).as_posix()
+            record = known.get(relpath) if known else None
+            if differential and not needs_write(info, target, record, dst):
+                action = SKIP
+            elif target.is_dir():
+                raise IsADirectoryError(f"Cannot replace directory with file: {target}")
+            else:
+                action = OVERWRITE if os.path.lexists(target) else CREATE
+            plan.files.append(PlannedFile(i, info, target, action))
+        p.add(files=len(planned))
+
+    plan.junk = _planned_junk(plan)
+    return plan
+
+
+def plan_install(
+    sources: List["Source"],
+    sd_path: Path,
+    differential: bool = True,
+    use_index: bool = True,
+) -> InstallPlan:
+    """Plan installing sources to the SD card, without changing anything.
+
+    Like install_packages, trusts the card's state index for the files it
+    recorded (unless use_index=False). The result can be printed, passed
+    to install_packages to carry it out, or both.
+    """
+    known = None
+    card = read_card_id(sd_path) if use_index else None
+    if card is not None:
+        with StateIndex() as index:
+            known = index.files(card)
+    return plan_merge(sources, sd_path, differential=differential, known=known)
+
+
+def card_throughput(sd_path: Path) -> Throughput:
+    """The throughput measured on a card, or DEFAULT_THROUGHPUT.
+
+    Measurements from installs come first; a card that was only probed
+    is estimated from its probe.
+    """
+    card = read_card_id(sd_path)
+    if card is not None:
+        with StateIndex() as index:
+            measured = index.throughput(card)
+            probe = index.probe(card)
+        if measured is not None:
+            return measured
+        if probe is not None:
+            return probe.throughput()
+    return DEFAULT_THROUGHPUT
+
+
+def measure_throughput(
+    write_times: List[Tuple[int, float]],
+    previous: Optional[Throughput] = None,
+) -> Optional[Throughput]:
+    """Work out a card's throughput from the (size, seconds) of file writes.
+
+    Large files give the sequential speed; what small files took beyond
+    that is their cost per file. Needs both kinds of files, and returns
+    None otherwise. Averaged with previous, if given, so one slow or fast
+    install does not swing the estimates.
+    """
+    large = [(s, t) for s, t in write_times if s >= LARGE_FILE_SIZE]
+    small = [(s, t) for s, t in write_times if s < LARGE_FILE_SIZE]
+    large_seconds = sum(t for _, t in large)
+    if not large or not small or large_seconds <= 0:
+        return None
+    rate = sum(s for s, _ in large) / large_seconds
+    overhead = sum(t for _, t in small) - sum(s for s, _ in small) / rate
+    measured = Throughput(rate, max(0.0, overhead / len(small)))
+    if previous is None:
+        return measured
+    return Throughput(
+        (measured.bytes_per_second + previous.bytes_per_second) / 2,
+        (measured.seconds_per_file + previous.seconds_per_file) / 2,
+    )
+
+
+def _planned_junk(plan: InstallPlan) -> List[Path]:
+    """The junk the cleanup after plan will delete.
+
+    Mirrors what install_packages passes to clean_paths: the written files
+    and the directories they go into, up to the SD root.
+    """
+    written = {f.target for f in plan.writes}
+    dirs: Set[Path] = set()
+    for path in [t for _, t in plan.dirs] + [t.parent for t in written]:
+        while path != plan.dst and path not in dirs:
+            dirs.add(path)
+            path = path.parent
+    touched = sorted(dirs) + [f.target for f in plan.writes]
+    created = written | dirs
+    junk = dict.fromkeys(
+        t for t in junk_candidates(touched) if t in created or os.path.lexists(t)
+    )
+    # What is inside a junk directory goes with it
+    return [t for t in junk if not any(parent in junk for parent in t.parents)]
@@ -0,0 +1,192 @@
+"""Measure how an SD card handles writes, to tune installs for it.
+
+Cards differ enormously: some write large files quickly but take tens of
+milliseconds per small file, others the other way round. probe_card
+writes to a scratch directory on the card and times sequential writes
+at several buffer sizes, the creation of many small files with different
+numbers of writer threads, an fsync per file against one sync() of
+everything (only where sync() waits for the card, see sync_all_waits),
+and reading a file back from the card. The scratch directory
+is removed afterwards, whatever happens. The fastest settings become the
+card's IOTuning, stored in the state index and used by installs on it.
+"""
+
+import math
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from switch_up.copier import (
+    DEFAULT_TUNING,
+    SYNC_ALL_NEVER,
+    IOTuning,
+    drop_cache,
+    fsync_fd,
+    fsync_path,
+    sync_all_waits,
+)
+from switch_up.state import CardProbe, StateIndex, read_card_id
+
+# Name of the scratch directory on the card (plus a random suffix)
+PROBE_DIR_PREFIX = ".switch-up-probe-"
+
+# Buffer sizes tried for sequential writes, and the bytes written with each
+BUFFER_SIZES = (256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+SEQUENTIAL_SIZE = 32 * 1024 * 1024
+
+# Writer threads tried for small files, and the files created with each
+WRITER_COUNTS = (1, 2, 4, 8)
+SMALL_FILES = 128
+SMALL_FILE_SIZE = 4096
+
+# Bounds for the batch size from which one sync() replaces an fsync per file
+MIN_SYNC_ALL = 16
+MAX_SYNC_ALL = 4096
+
+
+def probe_card(
+    sd_path: Path, size: int = SEQUENTIAL_SIZE, files: int = SMALL_FILES
+) -> CardProbe:
+    """Measure the card at sd_path and choose its IOTuning.
+
+    Writes size bytes with each of BUFFER_SIZES and files small files with
+    each of WRITER_COUNTS, all in a scratch directory that is deleted
+    before returning.
+    """
+    sd_path = Path(sd_path)
+    scratch = sd_path / f"{PROBE_DIR_PREFIX}{uuid.uuid4().hex[:8]}"
+    scratch.mkdir()
+    try:
+        sequential = {
+            buffer_size: _sequential_write(
+                scratch / f"seq-{buffer_size}", size, buffer_size
+            )
+            for buffer_size in BUFFER_SIZES
+        }
+        buffer_size = max(sequential, key=lambda b: sequential[b])
+        read_back = _read_back(scratch / f"seq-{buffer_size}", buffer_size)
+
+        small: Dict[int, Tuple[float, float]] = {
+            writers: _small_files(scratch / f"small-{writers}", files, writers)
+            for writers in WRITER_COUNTS
+        }
+        writers = max(small, key=lambda w: small[w][0])
+        files_per_second, fsync_seconds = small[writers]
+        sync_seconds = _sync_seconds(scratch / "sync", files)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        fsync_path(sd_path)
+
+    return CardProbe(
+        sequential_write=sequential[buffer_size],
+        small_files=files_per_second,
+        read_back=read_back,
+        tuning=IOTuning(
+            buffer_size=buffer_size,
+            writers=writers,
+            sync_all_threshold=sync_all_threshold(sync_seconds, fsync_seconds),
+        ),
+        measured_at=time.time(),
+    )
+
+
+def sync_all_threshold(sync_seconds: Optional[float], fsync_seconds: float) -> int:
+    """The batch size from which one sync() is cheaper than an fsync per file.
+
+    sync_seconds is what a sync() took, or None where sync() does not
+    wait for the card (the threshold then turns it off), and fsync_seconds
+    what each file of a batch took to fsync.
+    """
+    if sync_seconds is None:
+        return SYNC_ALL_NEVER
+    if fsync_seconds <= 0:
+        return MAX_SYNC_ALL
+    return max(MIN_SYNC_ALL, min(MAX_SYNC_ALL, math.ceil(sync_seconds / fsync_seconds)))
+
+
+def card_probe(sd_path: Path) -> Optional[CardProbe]:
+    """The last probe of the card at sd_path, if it was ever probed."""
+    card = read_card_id(sd_path)
+    if card is None:
+        return None
+    with StateIndex() as index:
+        return index.probe(card)
+
+
+def card_tuning(sd_path: Path) -> IOTuning:
+    """The IOTuning chosen for a card by its probe, or DEFAULT_TUNING."""
+    probe = card_probe(sd_path)
+    return probe.tuning if probe is not None else DEFAULT_TUNING
+
+
+def _sequential_write(path: Path, size: int, buffer_size: int) -> float:
+    """Write size bytes to path in buffer_size writes; return bytes per second."""
+    chunk = memoryview(os.urandom(max(1, min(buffer_size, size))))
+    started = time.perf_counter()
+    with open(path, "wb", buffering=0) as out:
+        written = 0
+        while written < size:
+            written += out.write(chunk[: size - written])
+        fsync_fd(out.fileno())
+    return size / _elapsed(started)
+
+
+def _read_back(path: Path, buffer_size: int) -> float:
+    """Read path from the card (not the page cache); return bytes per second."""
+    buffer = bytearray(buffer_size)
+    read = 0
+    with open(path, "rb", buffering=0) as f:
+        drop_cache(f.fileno())
+        started = time.perf_counter()
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            read += n
+    return read / _elapsed(started)
+
+
+def _small_files(directory: Path, files: int, writers: int) -> Tuple[float, float]:
+    """Create and fsync small files with writers threads.
+
+    Returns the files handled per second, and the fsync time per file.
+    """
+    directory.mkdir()
+    data = os.urandom(SMALL_FILE_SIZE)
+    paths = [directory / f"{i:05}.bin" for i in range(files)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(lambda path: path.write_bytes(data), paths))
+        syncing = time.perf_counter()
+        list(pool.map(fsync_path, paths))
+    fsync_path(directory)
+    finished = time.perf_counter()
+    return files / _elapsed(started, finished), (finished - syncing) / files
+
+
+def _sync_seconds(directory: Path, files: int) -> Optional[float]:
+    """Time one sync() of files new small files.
+
+    None where sync() returns before the data is on the card: it would
+    look cheap, and installs do not use it there anyway.
+    """
+    if not sync_all_waits():
+        return None
+    directory.mkdir()
+    data = os.urandom(SMALL_FILE_SIZE)
+    for i in range(files):
+        (directory / f"{i:05}.bin").write_bytes(data)
+    started = time.perf_counter()
+    os.sync()
+    return _elapsed(started)
+
+
+def _elapsed(started: float, finished: Optional[float] = None) -> float:
+    if finished is None:
+        finished = time.perf_counter()
+    # Never zero, even on a filesystem in RAM
+    return max(finished - started, 1e-6)
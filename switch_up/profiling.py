@@ -0,0 +1,200 @@
+"""Per-phase instrumentation: wall time, bytes and files of each step.
+
+Code marks its phases with `with phase("merge") as p: ... p.add(bytes=n)`.
+Nothing is recorded until enable() is called; until then phase() returns
+a shared no-op context, so instrumented code pays one global lookup.
+Recorded phases can be exported as a Chrome trace-event file (viewable
+in chrome://tracing or https://ui.perfetto.dev) or summarized per phase.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List, Optional
+
+
+@dataclass
+class PhaseEvent:
+    """One completed phase."""
+
+    name: str
+    start_ns: int
+    end_ns: int
+    thread_id: int
+    thread_name: str
+    bytes: int = 0
+    files: int = 0
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+@dataclass
+class PhaseSummary:
+    """All the calls of one phase, added up."""
+
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+    files: int = 0
+
+
+class Phase:
+    """Counters of a running phase, yielded by phase()."""
+
+    __slots__ = ("bytes", "files", "args")
+
+    def __init__(self, args: Dict[str, Any]) -> None:
+        self.bytes = 0
+        self.files = 0
+        self.args = args
+
+    def add(self, bytes: int = 0, files: int = 0) -> None:
+        self.bytes += bytes
+        self.files += files
+
+
+class Profiler:
+    """Collects the phases completed while it is enabled, from any thread."""
+
+    def __init__(self) -> None:
+        self.started_ns = time.perf_counter_ns()
+        self.events: List[PhaseEvent] = []
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self) -> float:
+        """Wall time since the profiler was created."""
+        return (time.perf_counter_ns() - self.started_ns) / 1e9
+
+    def record(self, event: PhaseEvent) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> List[PhaseSummary]:
+        """Per-phase totals, in the order phases first started."""
+        totals: Dict[str, PhaseSummary] = {}
+        for event in sorted(self.events, key=lambda e: e.start_ns):
+            total = totals.setdefault(event.name, PhaseSummary(event.name))
+            total.calls += 1
+            total.seconds += event.seconds
+            total.bytes += event.bytes
+            total.files += event.files
+        return list(totals.values())
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The phases as Chrome trace-event JSON (complete "X" events)."""
+        pid = os.getpid()
+        trace: List[Dict[str, Any]] = []
+        threads: Dict[int, str] = {}
+        for event in sorted(self.events, key=lambda e: e.start_ns):
+            threads[event.thread_id] = event.thread_name
+            trace.append(
+                {
+                    "name": event.name,
+                    "ph": "X",
+                    "ts": (event.start_ns - self.started_ns) / 1000,
+                    "dur": (event.end_ns - event.start_ns) / 1000,
+                    "pid": pid,
+                    "tid": event.thread_id,
+                    "args": dict(event.args, bytes=event.bytes, files=event.files),
+                }
+            )
+        for thread_id, name in threads.items():
+            trace.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {"name": name},
+                }
+            )
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.chrome_trace()))
+
+
+class _PhaseContext:
+    __slots__ = ("profiler", "name", "phase", "start_ns")
+
+    def __init__(self, profiler: Profiler, name: str, args: Dict[str, Any]) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.phase = Phase(args)
+
+    def __enter__(self) -> Phase:
+        self.start_ns = time.perf_counter_ns()
+        return self.phase
+
+    def __exit__(self, exc_type: Optional[type], *exc: object) -> None:
+        if exc_type is not None:
+            self.phase.args["error"] = exc_type.__name__
+        thread = threading.current_thread()
+        self.profiler.record(
+            PhaseEvent(
+                name=self.name,
+                start_ns=self.start_ns,
+                end_ns=time.perf_counter_ns(),
+                thread_id=thread.ident or 0,
+                thread_name=thread.name,
+                bytes=self.phase.bytes,
+                files=self.phase.files,
+                args=self.phase.args,
+            )
+        )
+
+
+class _NullContext:
+    """What phase() returns while profiling is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> Phase:
+        return _NULL_PHASE
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+
+class _NullPhase(Phase):
+    def add(self, bytes: int = 0, files: int = 0) -> None:
+        pass
+
+
+_NULL_PHASE = _NullPhase({})
+_NULL_CONTEXT = _NullContext()
+
+_profiler: Optional[Profiler] = None
+
+
+def phase(name: str, **args: Any) -> ContextManager[Phase]:
+    """Time the enclosed block as phase name, if profiling is enabled.
+
+    Extra keyword arguments are attached to the trace event.
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _NULL_CONTEXT
+    return _PhaseContext(profiler, name, args)
+
+
+def enable() -> Profiler:
+    """Start recording phases, with a fresh profiler."""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable() -> Optional[Profiler]:
+    """Stop recording; return the profiler that was active."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
@@ -0,0 +1,100 @@
+"""Package registry: which GitHub releases to install, and where.
+
+The registry is a JSON file, ~/.switch-up/packages.json, with one object
+per package:
+
+    [
+        {"name": "Atmosphere", "repo": "Atmosphere-NX/Atmosphere",
+         "asset": "atmosphere-*.zip"},
+        {"name": "JKSV", "repo": "J-D-K/JKSV", "asset": "JKSV.zip",
+         "prefix": "switch"}
+    ]
+
+asset is a glob matched against the names of the release's assets (the
+first match is installed) and prefix is the SD directory its ZIP is
+merged into, the SD root by default. Packages are installed in file
+order, so a later package wins where two ship the same file. Without a
+registry file, DEFAULT_PACKAGES is used.
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import List, Optional
+
+REGISTRY_FILE = Path.home() / ".switch-up" / "packages.json"
+
+_FIELDS = ("name", "repo", "asset", "prefix")
+
+
+@dataclass(frozen=True)
+class Package:
+    """A package declared in the registry."""
+
+    name: str
+    repo: str
+    asset: str = "*.zip"
+    prefix: str = ""
+
+
+DEFAULT_PACKAGES = [
+    Package("Atmosphere", "Atmosphere-NX/Atmosphere", "atmosphere-*.zip"),
+    Package("Hekate", "CTCaer/hekate", "hekate_ctcaer_*.zip"),
+]
+
+
+def load_registry(path: Optional[Path] = None) -> List[Package]:
+    """Read the packages declared in a registry file, in install order.
+
+    path defaults to REGISTRY_FILE; if that does not exist, the built-in
+    DEFAULT_PACKAGES are returned. Raises ValueError if the file is not a
+    valid registry.
+    """
+    if path is None:
+        if not REGISTRY_FILE.is_file():
+            return list(DEFAULT_PACKAGES)
+        path = REGISTRY_FILE
+    path = Path(path)
+    try:
+        entries = json.loads(path.read_text())
+    except ValueError as e:
+        raise ValueError(f"Invalid package registry {path}: {e}") from e
+    if not isinstance(entries, list):
+        raise ValueError(f"Invalid package registry {path}: expected a list")
+
+    packages = []
+    names = set()
+    for i, entry in enumerate(entries):
+        package = _parse_entry(entry, f"{path}, entry {i + 1}")
+        if package.name in names:
+            raise ValueError(f"Duplicate package in {path}: {package.name}")
+        names.add(package.name)
+        packages.append(package)
+    return packages
+
+
+def _parse_entry(entry: object, where: str) -> Package:
+    if not isinstance(entry, dict):
+        raise ValueError(f"{where}: expected an object")
+    unknown = sorted(set(entry) - set(_FIELDS))
+    if unknown:
+        raise ValueError(f"{where}: unknown fields {', '.join(unknown)}")
+    for key in _FIELDS:
+        if key in entry and not isinstance(entry[key], str):
+            raise ValueError(f"{where}: {key} must be a string")
+    for key in ("name", "repo"):
+        if not entry.get(key):
+            raise ValueError(f"{where}: {key} is required")
+    if entry["repo"].count("/") != 1:
+        raise ValueError(f"{where}: repo must look like owner/name")
+
+    prefix = entry.get("prefix", "").strip("/")
+    parts = PurePosixPath(prefix).parts
+    if ".." in parts or ":" in prefix or "\\" in prefix:
+        raise ValueError(f"{where}: prefix must be a path inside the SD card")
+    return Package(
+        name=entry["name"],
+        repo=entry["repo"],
+        asset=entry.get("asset") or "*.zip",
+        prefix=prefix,
+    )
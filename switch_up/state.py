@@ -0,0 +1,276 @@
+"""Per-card state index: what switch-up installed on each SD card."""
+
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from switch_up.copier import IOTuning
+
+STATE_DB = Path.home() / ".switch-up" / "state.db"
+
+# Written to the SD root so a card is recognized whatever its mount point
+CARD_ID_FILE = ".switch-up-id"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    card_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    crc INTEGER NOT NULL,
+    package TEXT NOT NULL,
+    version TEXT,
+    PRIMARY KEY (card_id, path)
+);
+CREATE TABLE IF NOT EXISTS packages (
+    card_id TEXT NOT NULL,
+    package TEXT NOT NULL,
+    version TEXT,
+    installed_at REAL NOT NULL,
+    PRIMARY KEY (card_id, package)
+);
+CREATE TABLE IF NOT EXISTS throughput (
+    card_id TEXT PRIMARY KEY,
+    bytes_per_second REAL NOT NULL,
+    seconds_per_file REAL NOT NULL,
+    measured_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS probes (
+    card_id TEXT PRIMARY KEY,
+    sequential_write REAL NOT NULL,
+    small_files REAL NOT NULL,
+    read_back REAL NOT NULL,
+    buffer_size INTEGER NOT NULL,
+    writers INTEGER NOT NULL,
+    sync_all_threshold INTEGER NOT NULL,
+    measured_at REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class FileRecord:
+    """A file switch-up installed, as it was right after being written."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    crc: int
+    package: str
+    version: Optional[str] = None
+
+
+@dataclass
+class PackageRecord:
+    """A package installed on a card."""
+
+    package: str
+    version: Optional[str]
+    installed_at: float
+
+
+@dataclass
+class Throughput:
+    """How fast files are written to a card: a cost per byte and per file."""
+
+    bytes_per_second: float
+    seconds_per_file: float
+    # When it was measured; None for an assumed, never measured one
+    measured_at: Optional[float] = None
+
+    def seconds(self, size: int, files: int = 1) -> float:
+        """Time to write files files of size bytes in total."""
+        return size / self.bytes_per_second + files * self.seconds_per_file
+
+
+@dataclass
+class CardProbe:
+    """What switch-up probe measured on a card, and the tuning it chose."""
+
+    # Bytes per second written with the best buffer size
+    sequential_write: float
+    # Small files created and made durable per second, with the best writers
+    small_files: float
+    # Bytes per second read back from the card itself
+    read_back: float
+    tuning: IOTuning
+    measured_at: Optional[float] = None
+
+    def throughput(self) -> Throughput:
+        """The probe as a Throughput, for cards no install was measured on."""
+        return Throughput(self.sequential_write, 1 / self.small_files, self.measured_at)
+
+
+def read_card_id(sd_path: Path) -> Optional[str]:
+    """Return the card identifier stored on the SD, if any."""
+    try:
+        return (Path(sd_path) / CARD_ID_FILE).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def card_id(sd_path: Path) -> str:
+    """Return the card identifier, writing a new one to the SD if missing."""
+    existing = read_card_id(sd_path)
+    if existing:
+        return existing
+    new_id = uuid.uuid4().hex
+    (Path(sd_path) / CARD_ID_FILE).write_text(new_id + "\n")
+    return new_id
+
+
+class StateIndex:
+    """SQLite index of installed files, keyed by card id and relative path.
+
+    Each instance holds its own connection, so threads (e.g. fleet workers)
+    should each open their own. Use as a context manager to close it.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None) -> None:
+        self.db_path = Path(db_path) if db_path is not None else STATE_DB
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "StateIndex":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def files(self, card: str, package: Optional[str] = None) -> Dict[str, FileRecord]:
+        """Indexed files of a card (optionally of one package), by path."""
+        query = (
+            "SELECT path, size, mtime_ns, crc, package, version FROM files "
+            "WHERE card_id = ?"
+        )
+        params: Tuple[str, ...] = (card,)
+        if package is not None:
+            query += " AND package = ?"
+            params += (package,)
+        return {row[0]: FileRecord(*row) for row in self._conn.execute(query, params)}
+
+    def packages(self, card: str) -> List[PackageRecord]:
+        """Packages installed on a card, in installation order."""
+        rows = self._conn.execute(
+            "SELECT package, version, installed_at FROM packages "
+            "WHERE card_id = ? ORDER BY installed_at",
+            (card,),
+        )
+        return [PackageRecord(*row) for row in rows]
+
+    def record_install(
+        self,
+        card: str,
+        sd_path: Path,
+        package: str,
+        version: Optional[str],
+        members: Iterable[Tuple[str, int, int]],
+    ) -> int:
+        """Record that package was installed, replacing its previous files.
+
+        members are (relative path, size, CRC32) tuples; each is stat'ed on
+        the SD to capture its mtime, and missing ones are skipped.
+        Returns the number of files recorded.
+        """
+        sd_path = Path(sd_path)
+        rows = []
+        for relpath, size, crc in members:
+            try:
+                st = os.stat(sd_path / relpath)
+            except OSError:
+                continue
+            rows.append((card, relpath, size, st.st_mtime_ns, crc, package, version))
+
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM files WHERE card_id = ? AND package = ?", (card, package)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files "
+                "(card_id, path, size, mtime_ns, crc, package, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO packages (card_id, package, version, installed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (card, package, version, time.time()),
+            )
+        return len(rows)
+
+    def throughput(self, card: str) -> Optional[Throughput]:
+        """The write throughput measured on a card, if any."""
+        row = self._conn.execute(
+            "SELECT bytes_per_second, seconds_per_file, measured_at "
+            "FROM throughput WHERE card_id = ?",
+            (card,),
+        ).fetchone()
+        return Throughput(*row) if row else None
+
+    def record_throughput(self, card: str, throughput: Throughput) -> None:
+        """Store a new measurement for a card, replacing the previous one."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO throughput "
+                "(card_id, bytes_per_second, seconds_per_file, measured_at) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    card,
+                    throughput.bytes_per_second,
+                    throughput.seconds_per_file,
+                    throughput.measured_at or time.time(),
+                ),
+            )
+
+    def probe(self, card: str) -> Optional[CardProbe]:
+        """The last probe of a card, if any."""
+        row = self._conn.execute(
+            "SELECT sequential_write, small_files, read_back, buffer_size, "
+            "writers, sync_all_threshold, measured_at "
+            "FROM probes WHERE card_id = ?",
+            (card,),
+        ).fetchone()
+        if not row:
+            return None
+        return CardProbe(row[0], row[1], row[2], IOTuning(*row[3:6]), row[6])
+
+    def record_probe(self, card: str, probe: CardProbe) -> None:
+        """Store a card's probe, replacing the previous one."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes "
+                "(card_id, sequential_write, small_files, read_back, buffer_size, "
+                "writers, sync_all_threshold, measured_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    card,
+                    probe.sequential_write,
+                    probe.small_files,
+                    probe.read_back,
+                    probe.tuning.buffer_size,
+                    probe.tuning.writers,
+                    probe.tuning.sync_all_threshold,
+                    probe.measured_at or time.time(),
+                ),
+            )
+
+
+def is_intact(record: FileRecord, sd_path: Path) -> bool:
+    """Whether an indexed file still looks as it did after install.
+
+    Only stats the file (size and mtime); it is never read.
+    """
+    try:
+        st = os.stat(Path(sd_path) / record.path)
+    except OSError:
+        return False
+    return st.st_size == record.size and st.st_mtime_ns == record.mtime_ns
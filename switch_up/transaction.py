@@ -0,0 +1,195 @@
+"""Journaled installs: stage files on the card, then commit them by renaming."""
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from switch_up.copier import SyncBatch, fsync_fd, fsync_path
+
+# Journal kept at the SD root while an install is in progress
+JOURNAL_FILE = ".switch-up-journal.json"
+
+# New files are staged, and replaced files preserved, next to their targets
+STAGED_SUFFIX = ".switch-up-new"
+PRESERVED_SUFFIX = ".switch-up-old"
+
+# Journal states, in the order an install goes through them
+STAGING = "staging"
+COMMITTING = "committing"
+COMMITTED = "committed"
+
+
+class Transaction:
+    """An all-or-nothing set of file writes under root.
+
+    Files are first written to a staging path next to their target (see
+    staged). commit then swaps each one in with os.replace, keeping the
+    file it replaces under a preserved name until every file is in place;
+    rollback renames those back. Both cost a few renames per changed file,
+    never a data copy.
+
+    Every step is recorded in a journal at the SD root before it happens,
+    so an install interrupted at any point is undone (or finished, if it
+    had already committed) by recover on the next run.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        targets: Iterable[Path],
+        dirs: Iterable[Path] = (),
+    ) -> None:
+        self.root = Path(root)
+        self.state = STAGING
+        # Relative paths of the files written, and whether each existed
+        self.files: List[str] = []
+        self.existed: Set[str] = set()
+        # Directories the install creates, so rollback can remove them
+        self.dirs: List[str] = []
+
+        missing: Set[Path] = set()
+        seen: Set[str] = set()
+        for target in targets:
+            relpath = Path(target).relative_to(self.root).as_posix()
+            if relpath in seen:
+                continue  # duplicate ZIP member: the last one written wins
+            seen.add(relpath)
+            self.files.append(relpath)
+            if os.path.lexists(target):
+                self.existed.add(relpath)
+            missing |= self._missing_dirs(Path(target).parent)
+        for directory in dirs:
+            missing |= self._missing_dirs(Path(directory))
+        self.dirs = sorted(p.relative_to(self.root).as_posix() for p in missing)
+
+    @property
+    def journal(self) -> Path:
+        return self.root / JOURNAL_FILE
+
+    @classmethod
+    def load(cls, root: Path) -> Optional["Transaction"]:
+        """Return the transaction left in root's journal, if any."""
+        root = Path(root)
+        try:
+            data = json.loads((root / JOURNAL_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        transaction = cls(root, ())
+        transaction.state = data["state"]
+        transaction.files = data["files"]
+        transaction.existed = set(data["existed"])
+        transaction.dirs = data["dirs"]
+        return transaction
+
+    def staged(self, target: Path) -> Path:
+        """Where the new content of target is written before the commit."""
+        return Path(target).with_name(Path(target).name + STAGED_SUFFIX)
+
+    def preserved(self, target: Path) -> Path:
+        """Where the file target replaces is kept until the commit is done."""
+        return Path(target).with_name(Path(target).name + PRESERVED_SUFFIX)
+
+    def begin(self) -> None:
+        """Record the planned writes, before anything is staged."""
+        self._write_journal(STAGING)
+
+    def commit(self, batch: Optional[SyncBatch] = None) -> None:
+        """Swap every staged file into place, then drop the preserved ones.
+
+        batch holds the staged files not yet made durable, if any; it is
+        flushed before any original is replaced.
+        """
+        if batch is None:
+            batch = SyncBatch()
+            for relpath in self.files:
+                batch.add(self.staged(self.root / relpath))
+        batch.flush()
+        self._write_journal(COMMITTING)
+        for relpath in self.files:
+            target = self.root / relpath
+            if relpath in self.existed:
+                os.replace(target, self.preserved(target))
+            os.replace(self.staged(target), target)
+            batch.add_dir(target.parent)
+        # The renames must be durable before the journal says they are done
+        batch.flush()
+        self._write_journal(COMMITTED)
+        self.finish()
+
+    def rollback(self) -> None:
+        """Undo the install: restore replaced files, drop new ones.
+
+        Safe to call at any point, including after an interrupted commit.
+        """
+        for relpath in reversed(self.files):
+            target = self.root / relpath
+            staged = self.staged(target)
+            preserved = self.preserved(target)
+            if os.path.lexists(preserved):
+                os.replace(preserved, target)
+            elif relpath not in self.existed and not os.path.lexists(staged):
+                # Committed, and there was nothing before it
+                _unlink(target)
+            _unlink(staged)
+        for relpath in reversed(self.dirs):
+            try:
+                os.rmdir(self.root / relpath)
+            except OSError:
+                pass  # not empty (user files) or already gone
+        _unlink(self.journal)
+
+    def finish(self) -> None:
+        """Drop the preserved originals and the journal of a committed install."""
+        for relpath in self.files:
+            _unlink(self.preserved(self.root / relpath))
+        _unlink(self.journal)
+
+    def _missing_dirs(self, directory: Path) -> Set[Path]:
+        missing = set()
+        while directory != self.root and not directory.exists():
+            missing.add(directory)
+            directory = directory.parent
+        return missing
+
+    def _write_journal(self, state: str) -> None:
+        self.state = state
+        tmp = self.journal.with_name(JOURNAL_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "state": state,
+                    "files": self.files,
+                    "existed": sorted(self.existed),
+                    "dirs": self.dirs,
+                },
+                f,
+            )
+            f.flush()
+            fsync_fd(f.fileno())
+        os.replace(tmp, self.journal)
+        fsync_path(self.root)
+
+
+def recover(sd_path: Path) -> Optional[Transaction]:
+    """Finish or undo an install that was interrupted on this card.
+
+    An install that had fully committed is finished (preserved files are
+    removed); anything earlier is rolled back. Returns the recovered
+    transaction (its state tells which), or None if there was nothing to do.
+    """
+    transaction = Transaction.load(sd_path)
+    if transaction is None:
+        return None
+    if transaction.state == COMMITTED:
+        transaction.finish()
+    else:
+        transaction.rollback()
+    return transaction
+
+
+def _unlink(path: Path) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
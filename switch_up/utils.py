@@ -1,14 +1,22 @@
 """Helpers: ZIP extraction, automatic SD path detection, and validations."""
 
+import getpass
+import sys
 import tempfile
 import zipfile
-from pathlib import Path
+import zlib
+from pathlib import Path, PurePosixPath
 from typing import List, Optional
 
+from switch_up.profiling import phase
+
 
 # Markers that identify a Nintendo Switch SD card
 SD_MARKERS = ("Nintendo", "bootloader")
 
+# Where macOS mounts removable volumes
+VOLUMES_DIR = Path("/Volumes")
+
 
 def detect_sd_path(path: Path) -> bool:
     """Check if a path looks like a Nintendo Switch SD card.
@@ -23,9 +31,9 @@ def detect_sd_path(path: Path) -> bool:
     return False
 
 
-def find_sd_volumes() -> List[Path]:
-    """Scan /Volumes/ for mounted volumes that look like Switch SD cards."""
-    volumes_dir = Path("/Volumes")
+def find_sd_volumes(root: Path = VOLUMES_DIR) -> List[Path]:
+    """Scan root (/Volumes/) for mounted volumes that look like Switch SD cards."""
+    volumes_dir = Path(root)
     if not volumes_dir.is_dir():
         return []
     results: List[Path] = []
@@ -35,6 +43,26 @@ def find_sd_volumes() -> List[Path]:
     return results
 
 
+def default_mount_root() -> Path:
+    """Where this system mounts removable volumes.
+
+    /Volumes on macOS; on Linux the per-user directory of udisks
+    (/run/media/<user> or /media/<user>), falling back to /media and /mnt.
+    """
+    if not sys.platform.startswith("linux"):
+        return VOLUMES_DIR
+    candidates = [Path("/media")]
+    try:
+        user = getpass.getuser()
+        candidates[:0] = [Path("/run/media") / user, Path("/media") / user]
+    except (KeyError, OSError):  # no name for this uid (e.g. a container)
+        pass
+    for candidate in candidates:
+        if candidate.is_dir():
+            return candidate
+    return Path("/mnt")
+
+
 def resolve_sd_path(sd_path: Optional[Path]) -> Path:
     """Resolve the SD path: use the one provided or try to auto-detect."""
     if sd_path is not None:
@@ -58,16 +86,91 @@ def resolve_sd_path(sd_path: Optional[Path]) -> Path:
     return volumes[0]
 
 
-def extract_zip(zip_path: Path, dest: Optional[Path] = None) -> Path:
-    """Extract a ZIP file to a temporary directory or the specified destination.
+def resolve_sd_paths(sd_paths: Optional[List[Path]]) -> List[Path]:
+    """Resolve several SD paths: use the ones provided or every detected card."""
+    if sd_paths:
+        return [resolve_sd_path(path) for path in sd_paths]
 
-    Returns the path where files were extracted.
+    volumes = find_sd_volumes()
+    if not volumes:
+        raise FileNotFoundError(
+            "No Switch SD card found mounted at /Volumes/. "
+            "Pass the SD card paths manually."
+        )
+    return volumes
+
+
+def validate_zip(zip_path: Path) -> Path:
+    """Check that zip_path exists and is a ZIP archive.
+
+    Returns the path as a Path object.
     """
     zip_path = Path(zip_path)
     if not zip_path.is_file():
         raise FileNotFoundError(f"File not found: {zip_path}")
     if not zipfile.is_zipfile(zip_path):
         raise ValueError(f"Not a valid ZIP file: {zip_path}")
+    return zip_path
+
+
+def member_path(root: Path, name: str) -> Path:
+    """Map a ZIP member name to its destination path under root.
+
+    Rejects absolute names and names that would escape root via '..',
+    which zipfile.extractall would otherwise sanitize for us.
+    """
+    parts = PurePosixPath(name.replace("\\", "/")).parts
+    if not parts or parts[0] == "/" or ".." in parts or ":" in parts[0]:
+        raise ValueError(f"Unsafe path in ZIP: {name}")
+    return Path(root).joinpath(*parts)
+
+
+def zip_payload_size(zip_path: Path) -> int:
+    """Total uncompressed size of the files in a ZIP."""
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        return sum(info.file_size for info in zf.infolist() if not info.is_dir())
+
+
+def file_crc32(path: Path, chunk_size: int = 1024 * 1024) -> int:
+    """Compute the CRC32 of a file, in the same form zipfile stores it."""
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+
+def format_bytes(size: float) -> str:
+    """Format a byte count for humans, e.g. 1536 -> '1.5 KB'."""
+    if size < 1024:
+        return f"{size:.0f} B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024:
+            break
+    return f"{size:.1f} {unit}"
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration for humans, e.g. 83 -> '1m 23s'."""
+    if seconds < 1:
+        return "<1s"
+    whole = round(seconds)
+    if whole < 60:
+        return f"{whole}s"
+    minutes, whole = divmod(whole, 60)
+    if minutes < 60:
+        return f"{minutes}m {whole:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+def extract_zip(zip_path: Path, dest: Optional[Path] = None) -> Path:
+    """Extract a ZIP file to a temporary directory or the specified destination.
+
+    Returns the path where files were extracted.
+    """
+    zip_path = validate_zip(zip_path)
 
     if dest is None:
         dest = Path(tempfile.mkdtemp(prefix="switch_up_"))
@@ -75,7 +178,10 @@ def extract_zip(zip_path: Path, dest: Optional[Path] = None) -> Path:
         dest = Path(dest)
         dest.mkdir(parents=True, exist_ok=True)
 
-    with zipfile.ZipFile(zip_path, "r") as zf:
+    with phase("extract", zip=zip_path.name) as p, zipfile.ZipFile(zip_path) as zf:
         zf.extractall(dest)
+        for info in zf.infolist():
+            if not info.is_dir():
+                p.add(bytes=info.file_size, files=1)
 
     return dest
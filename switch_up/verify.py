@@ -0,0 +1,144 @@
+"""Post-write verification: read files back and check them against the ZIP."""
+
+import os
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from switch_up.copier import SyncBatch, copy_stream, drop_cache
+from switch_up.utils import member_path, validate_zip
+
+# Threads reading files back, and the read size each one uses
+VERIFY_WORKERS = 4
+VERIFY_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+@dataclass
+class VerifyReport:
+    """Result of checking files on the SD against a ZIP."""
+
+    files_checked: int = 0
+    bytes_checked: int = 0
+    # Relative path -> what is wrong with it
+    mismatches: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+
+class VerificationError(OSError):
+    """Files on the SD still differ from the ZIP after being rewritten."""
+
+    def __init__(self, report: VerifyReport) -> None:
+        self.report = report
+        names = ", ".join(sorted(report.mismatches)[:5])
+        super().__init__(f"{len(report.mismatches)} files failed verification: {names}")
+
+
+def verify_members(
+    zip_path: Path,
+    sd_path: Path,
+    names: Optional[Iterable[str]] = None,
+    workers: int = VERIFY_WORKERS,
+) -> VerifyReport:
+    """Read files back from the SD and compare them with the ZIP.
+
+    Each file is checked against the size and CRC32 stored in the ZIP
+    central directory, so the archive itself is never decompressed.
+    names limits the check to those relative paths (default: every file
+    in the ZIP). Reads run on a thread pool with large buffers.
+    """
+    zip_path = validate_zip(zip_path)
+    sd_path = Path(sd_path)
+    wanted = set(names) if names is not None else None
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        infos = [info for info in zf.infolist() if not info.is_dir()]
+
+    jobs = []
+    for info in infos:
+        target = member_path(sd_path, info.filename)
+        relpath = target.relative_to(sd_path).as_posix()
+        if wanted is None or relpath in wanted:
+            jobs.append((relpath, target, info.file_size, info.CRC))
+
+    report = VerifyReport()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        checks = pool.map(lambda job: _check_file(*job[1:]), jobs)
+        for (relpath, _, size, _), problem in zip(jobs, checks):
+            report.files_checked += 1
+            report.bytes_checked += size
+            if problem is not None:
+                report.mismatches[relpath] = problem
+    return report
+
+
+def rewrite_members(zip_path: Path, sd_path: Path, names: Iterable[str]) -> int:
+    """Write the given members (relative paths) from the ZIP to the SD again.
+
+    Returns the number of files rewritten.
+    """
+    zip_path = validate_zip(zip_path)
+    sd_path = Path(sd_path)
+    wanted = set(names)
+    rewritten = 0
+    batch = SyncBatch()
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            target = member_path(sd_path, info.filename)
+            if info.is_dir() or target.relative_to(sd_path).as_posix() not in wanted:
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with zf.open(info) as source, open(target, "wb", buffering=0) as out:
+                copy_stream(source, out, size=info.file_size)
+            batch.add(target)
+            rewritten += 1
+    batch.flush()
+    return rewritten
+
+
+def verify_and_repair(
+    zip_path: Path, sd_path: Path, names: Optional[List[str]] = None
+) -> VerifyReport:
+    """Verify files and rewrite the ones that fail, once.
+
+    Returns the report of the first pass. Raises VerificationError if any
+    file still fails after being rewritten.
+    """
+    report = verify_members(zip_path, sd_path, names)
+    if report.ok:
+        return report
+    rewrite_members(zip_path, sd_path, report.mismatches)
+    second = verify_members(zip_path, sd_path, list(report.mismatches))
+    if not second.ok:
+        raise VerificationError(second)
+    return report
+
+
+def _check_file(target: Path, size: int, crc: int) -> Optional[str]:
+    """Return what is wrong with target, or None if it matches."""
+    try:
+        with open(target, "rb", buffering=0) as f:
+            actual_size = os.fstat(f.fileno()).st_size
+            if actual_size != size:
+                return f"size {actual_size} != {size}"
+            drop_cache(f.fileno())
+            actual = 0
+            buffer = bytearray(min(size, VERIFY_BUFFER_SIZE))
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                actual = zlib.crc32(view[:n], actual)
+    except FileNotFoundError:
+        return "missing"
+    except OSError as e:
+        return f"unreadable: {e.strerror or e}"
+    if actual & 0xFFFFFFFF != crc:
+        return "CRC32 mismatch"
+    return None
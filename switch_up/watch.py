@@ -0,0 +1,367 @@
+"""Watch mode: install to every Switch SD card as soon as it is mounted.
+
+A Station keeps the latest releases resolved and downloaded in the
+background (ReleaseKeeper) and watches a mount root for new volumes
+(MountWatcher). Each volume that looks like a Switch SD card is installed
+to on a worker thread, several at once, and shown in a status table. A
+card is recognized by its card id, so it is processed only once per run,
+even if it is unplugged and mounted again (under any name).
+
+On Linux the watcher sleeps until the kernel reports a change: inotify on
+the mount root for mount points appearing, and the mount table itself
+for mounts onto existing directories. Elsewhere the root is listed every
+few seconds, which costs a directory read and a few stats per volume.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from rich.console import Console
+from rich.table import Table
+
+from switch_up.core import Source, install_packages
+from switch_up.state import card_id
+from switch_up.utils import find_sd_volumes, format_bytes, zip_payload_size
+
+# Seconds between listings of the mount root without kernel events (and
+# between safety rescans with them)
+POLL_INTERVAL = 2.0
+
+# A mount point is created before the volume is mounted on it; wait this
+# long after an event before looking
+SETTLE_DELAY = 0.5
+
+# Seconds between checks for new releases
+REFRESH_INTERVAL = 30 * 60
+
+# Card states in the status table
+WAITING = "waiting"
+INSTALLING = "installing"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "already done"
+
+_STATE_STYLES = {
+    WAITING: "dim",
+    INSTALLING: "bold blue",
+    DONE: "green",
+    FAILED: "red",
+    SKIPPED: "yellow",
+}
+
+# inotify(7) events on the mount root that can mean a new volume
+_IN_CREATE = 0x100
+_IN_MOVED_TO = 0x80
+_IN_ONLYDIR = 0x1000000
+_MOUNTS = "/proc/self/mounts"
+
+
+class MountWatcher:
+    """Lists the SD cards under root and waits for the volumes to change."""
+
+    def __init__(self, root: Path, interval: float = POLL_INTERVAL) -> None:
+        self.root = Path(root)
+        self.interval = interval
+        self._inotify: Optional[_Inotify] = None
+        self._mounts = None
+        self._poller = None
+        if sys.platform.startswith("linux") and hasattr(select, "poll"):
+            self._watch_kernel()
+
+    @property
+    def event_driven(self) -> bool:
+        return self._poller is not None
+
+    def scan(self) -> List[Path]:
+        """The volumes under root that look like Switch SD cards."""
+        return find_sd_volumes(self.root)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the volumes may have changed, or timeout (interval)."""
+        timeout = self.interval if timeout is None else timeout
+        if self._poller is None:
+            time.sleep(timeout)
+            return
+        if self._poller.poll(timeout * 1000):
+            time.sleep(SETTLE_DELAY)
+            self._rearm()
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+        if self._mounts is not None:
+            self._mounts.close()
+        self._inotify = self._mounts = self._poller = None
+
+    def __enter__(self) -> "MountWatcher":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _watch_kernel(self) -> None:
+        """Register inotify and the mount table with a poller, if possible."""
+        poller = select.poll()
+        try:
+            self._inotify = _Inotify(self.root, _IN_CREATE | _IN_MOVED_TO)
+            poller.register(self._inotify.fd, select.POLLIN)
+        except OSError:
+            self._inotify = None
+        try:
+            self._mounts = open(_MOUNTS, "rb")
+            self._mounts.read()
+            poller.register(self._mounts, select.POLLPRI | select.POLLERR)
+        except OSError:
+            self._mounts = None
+        if self._inotify is not None or self._mounts is not None:
+            self._poller = poller
+
+    def _rearm(self) -> None:
+        """Consume the pending events so the next poll waits for new ones."""
+        if self._inotify is not None:
+            self._inotify.drain()
+        if self._mounts is not None:
+            self._mounts.seek(0)
+            self._mounts.read()
+
+
+class _Inotify:
+    """An inotify watch on one directory, through libc (Linux only)."""
+
+    def __init__(self, path: Path, mask: int) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask | _IN_ONLYDIR) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Cannot watch {path}")
+
+    def drain(self) -> None:
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class ReleaseKeeper:
+    """The latest releases, resolved and downloaded ahead of any card.
+
+    prepare() resolves and downloads the releases (into the cache) and
+    returns them as sources; it is called right away and then every
+    interval seconds on a background thread. If a refresh fails, the
+    sources from the previous one are kept.
+    """
+
+    def __init__(
+        self, prepare: Callable[[], List[Source]], interval: float = REFRESH_INTERVAL
+    ) -> None:
+        self._prepare = prepare
+        self.interval = interval
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._sources: Optional[List[Source]] = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="switch-up-releases", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop refreshing; installs still waiting for sources fail."""
+        self._stop.set()
+        self._ready.set()
+
+    def refresh(self) -> None:
+        """Resolve and download the releases now."""
+        try:
+            self._sources = self._prepare()
+            self.error = None
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        self.checked_at = time.time()
+        if self._sources is not None:
+            self._ready.set()
+
+    def sources(self, timeout: Optional[float] = None) -> List[Source]:
+        """The current sources, waiting for the first ones if needed.
+
+        Raises TimeoutError if there are none after timeout seconds (or
+        once the keeper is stopped).
+        """
+        self._ready.wait(timeout)
+        if self._sources is None:
+            raise TimeoutError(self.error or "The releases are not downloaded yet")
+        return self._sources
+
+    def describe(self) -> str:
+        """The packages and versions kept, for the status table."""
+        if self._sources is None:
+            return f"Releases: {self.error}" if self.error else "Releases: resolving..."
+        names = ", ".join(
+            f"{s.package or s.zip_path.stem} {s.version or ''}".strip()
+            for s in self._sources
+        )
+        assert self.checked_at is not None
+        checked = datetime.fromtimestamp(self.checked_at).strftime("%H:%M")
+        problem = f" [yellow](refresh failed: {self.error})[/]" if self.error else ""
+        return f"Releases: {names} (checked {checked}){problem}"
+
+    def _run(self) -> None:
+        while True:
+            self.refresh()
+            if self._stop.wait(self.interval):
+                return
+
+
+@dataclass
+class CardStatus:
+    """One card the station found, and how its install went."""
+
+    sd_path: Path
+    state: str = WAITING
+    card: Optional[str] = None
+    total: int = 0
+    done: int = 0
+    started: Optional[float] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class Station:
+    """Installs the releases of keeper to every SD card mounted under a root.
+
+    Call check() whenever the volumes may have changed (run() does, in a
+    loop with a MountWatcher): each new card gets a row in statuses and an
+    install on the thread pool. install_options are passed on to
+    install_packages.
+    """
+
+    def __init__(
+        self,
+        keeper: ReleaseKeeper,
+        workers: int = 4,
+        **install_options: object,
+    ) -> None:
+        self.keeper = keeper
+        self.statuses: List[CardStatus] = []
+        self._options = install_options
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="switch-up-card")
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        # Mounted volumes already handled, and the cards processed this run
+        self._mounted: Dict[Path, CardStatus] = {}
+        self._cards: Set[str] = set()
+
+    def check(self, volumes: List[Path]) -> List[CardStatus]:
+        """Start installing to the cards among volumes not seen yet.
+
+        volumes are the SD cards mounted right now; a volume that is gone
+        may be processed again if it comes back (unless it is a card
+        already processed). Returns the new rows.
+        """
+        current = {Path(v) for v in volumes}
+        new = []
+        with self._lock:
+            for gone in set(self._mounted) - current:
+                del self._mounted[gone]
+            for sd_path in sorted(current - set(self._mounted)):
+                status = CardStatus(sd_path)
+                self._mounted[sd_path] = status
+                self.statuses.append(status)
+                self._futures.append(self._pool.submit(self._process, status))
+                new.append(status)
+        return new
+
+    def run(self, watcher: MountWatcher, stop: threading.Event) -> None:
+        """Check the volumes of watcher until stop is set."""
+        while not stop.is_set():
+            self.check(watcher.scan())
+            watcher.wait()
+
+    @property
+    def busy(self) -> int:
+        """Cards waiting for or being installed."""
+        return sum(1 for s in self.statuses if s.state in (WAITING, INSTALLING))
+
+    def join(self) -> None:
+        """Wait for every install started so far, and stop the pool."""
+        self._pool.shutdown(wait=True)
+
+    def table(self) -> Table:
+        """The status table: one row per card found."""
+        table = Table(title="switch-up watch", caption=self.keeper.describe())
+        table.add_column("Card")
+        table.add_column("Status")
+        table.add_column("Progress", justify="right")
+        table.add_column("Time", justify="right")
+        table.add_column("Error")
+        now = time.monotonic()
+        for s in self.statuses:
+            seconds = s.seconds
+            if s.state == INSTALLING and s.started is not None:
+                seconds = now - s.started
+            progress = ""
+            if s.total:
+                progress = f"{format_bytes(s.done)} / {format_bytes(s.total)}"
+            table.add_row(
+                str(s.sd_path),
+                f"[{_STATE_STYLES[s.state]}]{s.state}[/]",
+                progress,
+                f"{seconds:.1f}s" if seconds else "",
+                s.error or "",
+            )
+        return table
+
+    def _process(self, status: CardStatus) -> None:
+        """Install to one card; never raises (the error goes in status)."""
+        try:
+            card = card_id(status.sd_path)
+            status.card = card
+            with self._lock:
+                if card in self._cards:
+                    status.state = SKIPPED
+                    return
+                self._cards.add(card)
+            sources = self.keeper.sources()
+            status.total = sum(zip_payload_size(s.zip_path) for s in sources)
+            status.state = INSTALLING
+            status.started = time.monotonic()
+
+            def advance(size: int) -> None:
+                status.done += size
+
+            install_packages(
+                sources,
+                status.sd_path,
+                Console(quiet=True),
+                on_progress=advance,
+                **self._options,  # type: ignore[arg-type]
+            )
+            status.state = DONE
+        except Exception as e:
+            status.error = str(e) or type(e).__name__
+            status.state = FAILED
+        finally:
+            if status.started is not None:
+                status.seconds = time.monotonic() - status.started
@@ -0,0 +1,335 @@
+"""Read a ZIP archive front to back while it downloads.
+
+Every member of a ZIP is preceded by a local header, so an archive can be
+unpacked in one forward pass over its bytes, as they arrive. The central
+directory at the end is still what the install is planned from:
+RemoteZip fetches it first (a Range request for the archive's tail),
+so the files to write are known, and unchanged ones skipped, before the
+body is downloaded. The body is then read once; each local header must
+agree with the central directory, each member with its CRC32, and at
+the end the central directory that arrived with the body must be the
+one the install was planned with, and the whole archive must have the
+published size and SHA-256. The archive itself is never stored.
+"""
+
+import hashlib
+import io
+import struct
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Bytes of the archive's tail fetched first; enough for the central
+# directory of a typical release (it is fetched further back if not)
+TAIL_SIZE = 64 * 1024
+
+# Compressed bytes handed to the decompressor at a time
+INPUT_CHUNK_SIZE = 256 * 1024
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+
+class RemoteZip:
+    """A ZIP archive read over the network instead of from a file.
+
+    fetch_range(start, end) returns the archive's bytes start..end
+    (inclusive), and open_stream() iterates over all of its bytes, in
+    order. size is the archive's published size, and sha256 its digest,
+    if known.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        fetch_range: Callable[[int, int], bytes],
+        open_stream: Callable[[], Iterable[bytes]],
+        sha256: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.size = size
+        self.sha256 = sha256.lower() if sha256 else None
+        self._fetch_range = fetch_range
+        self._open_stream = open_stream
+        self._tail = b""
+        self._infos: Optional[List[zipfile.ZipInfo]] = None
+
+    def infolist(self) -> List[zipfile.ZipInfo]:
+        """The members listed in the central directory, fetched on first use."""
+        if self._infos is None:
+            start = max(0, self.size - TAIL_SIZE)
+            self._tail = self._fetch_range(start, self.size - 1)
+            while True:
+                tail = _TailFile(self.size, self.size - len(self._tail), self._tail)
+                try:
+                    with zipfile.ZipFile(tail, "r") as zf:
+                        self._infos = zf.infolist()
+                    break
+                except _MissingBytes as missing:
+                    end = self.size - len(self._tail) - 1
+                    self._tail = self._fetch_range(missing.offset, end) + self._tail
+        return self._infos
+
+    def members(
+        self, wanted: Iterable[zipfile.ZipInfo]
+    ) -> Iterator[Tuple[zipfile.ZipInfo, io.RawIOBase]]:
+        """Download the archive once, yielding the wanted members as they come.
+
+        Each member is yielded with a file object inflating its content on
+        the fly; it must be read before asking for the next member (what is
+        left unread is skipped). Once every member is through, the rest of
+        the archive is checked (see the module docstring); any problem is
+        raised from the last step of the iteration, so a caller looping
+        over this does not finish before the archive is known to be whole.
+        """
+        infos = sorted(self.infolist(), key=lambda i: i.header_offset)
+        wanted_offsets = {info.header_offset for info in wanted}
+        stream = _ByteStream(self._open_stream(), self.size - len(self._tail))
+        for info in infos:
+            stream.skip_to(info.header_offset)
+            _check_local_header(stream, info)
+            if info.header_offset not in wanted_offsets:
+                stream.skip(info.compress_size)
+                continue
+            reader = _MemberReader(stream, info)
+            yield info, reader
+            reader.finish()
+
+        received = stream.drain()
+        if received != self.size:
+            raise ValueError(
+                f"Size mismatch for {self.name}: expected {self.size} bytes, "
+                f"got {received}"
+            )
+        if stream.captured != self._tail:
+            raise zipfile.BadZipFile(
+                f"Central directory of {self.name} changed during the download"
+            )
+        if self.sha256 is not None and stream.hexdigest() != self.sha256:
+            raise ValueError(f"Checksum mismatch for {self.name}")
+
+
+class _MissingBytes(Exception):
+    """zipfile asked for bytes before the part of the tail we have."""
+
+    def __init__(self, offset: int) -> None:
+        super().__init__(offset)
+        self.offset = offset
+
+
+class _TailFile(io.RawIOBase):
+    """A seekable file of size bytes, of which only those from start on are
+    known; reading earlier ones raises _MissingBytes."""
+
+    def __init__(self, size: int, start: int, data: bytes) -> None:
+        self.size = size
+        self.start = start
+        self.data = data
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}
+        self.position = max(0, base[whence] + offset)
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        end = min(self.size, self.position + len(buffer))
+        if self.position >= end:
+            return 0
+        if self.position < self.start:
+            raise _MissingBytes(self.position)
+        chunk = self.data[self.position - self.start : end - self.start]
+        buffer[: len(chunk)] = chunk
+        self.position = end
+        return len(chunk)
+
+
+class _ByteStream:
+    """Exact reads from an iterator of byte chunks, hashing everything.
+
+    Bytes from offset capture_from on are also kept, to compare the
+    central directory at the end with the one planned from.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], capture_from: int) -> None:
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self._received = 0
+        self._capture_from = capture_from
+        self._hash = hashlib.sha256()
+        self.captured = b""
+        self.position = 0
+
+    def read_some(self, n: int) -> bytes:
+        """Up to n bytes (at least one); raises BadZipFile at the end."""
+        if not self._buffer and not self._next_chunk():
+            raise zipfile.BadZipFile("Archive truncated")
+        data = bytes(self._buffer[:n])
+        self._buffer = self._buffer[n:]
+        self.position += len(data)
+        return data
+
+    def read(self, n: int) -> bytes:
+        parts = []
+        while n > 0:
+            data = self.read_some(n)
+            parts.append(data)
+            n -= len(data)
+        return b"".join(parts)
+
+    def skip(self, n: int) -> None:
+        while n > 0:
+            n -= len(self.read_some(min(n, INPUT_CHUNK_SIZE)))
+
+    def skip_to(self, offset: int) -> None:
+        if offset < self.position:
+            raise zipfile.BadZipFile(f"Overlapping ZIP members at offset {offset}")
+        self.skip(offset - self.position)
+
+    def drain(self) -> int:
+        """Consume the rest of the stream; return the total bytes received."""
+        self._buffer = memoryview(b"")
+        while self._next_chunk():
+            self._buffer = memoryview(b"")
+        return self._received
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def _next_chunk(self) -> bool:
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            start = self._received
+            self._received += len(chunk)
+            self._hash.update(chunk)
+            if self._received > self._capture_from:
+                self.captured += chunk[max(0, self._capture_from - start) :]
+            self._buffer = memoryview(chunk)
+            return True
+        return False
+
+
+class _MemberReader(io.RawIOBase):
+    """The content of one member, inflated as its bytes arrive."""
+
+    def __init__(self, stream: _ByteStream, info: zipfile.ZipInfo) -> None:
+        self._stream = stream
+        self._info = info
+        self._remaining = info.compress_size
+        self._decompressor = (
+            zlib.decompressobj(-zlib.MAX_WBITS)
+            if info.compress_type == zipfile.ZIP_DEFLATED
+            else None
+        )
+        self._pending = b""
+        self._crc = 0
+        self._size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        if not self._pending:
+            self._pending = self._fill(len(buffer))
+        n = min(len(buffer), len(self._pending))
+        if n == 0:
+            self._check()
+            return 0
+        buffer[:n] = self._pending[:n]
+        self._crc = zlib.crc32(self._pending[:n], self._crc)
+        self._size += n
+        self._pending = self._pending[n:]
+        return n
+
+    def finish(self) -> None:
+        """Skip whatever the consumer did not read."""
+        self._stream.skip(self._remaining)
+        self._remaining = 0
+
+    def _fill(self, want: int) -> bytes:
+        """The next piece of content, at most about want bytes; b"" at the end."""
+        while True:
+            if self._decompressor is None:
+                if not self._remaining:
+                    return b""
+                data = self._stream.read_some(min(want, self._remaining))
+                self._remaining -= len(data)
+                return data
+            d = self._decompressor
+            if d.unconsumed_tail:
+                data = d.decompress(d.unconsumed_tail, want)
+            elif self._remaining:
+                chunk = self._stream.read_some(min(self._remaining, INPUT_CHUNK_SIZE))
+                self._remaining -= len(chunk)
+                data = d.decompress(chunk, want)
+            else:
+                return d.flush()
+            if data:
+                return data
+
+    def _check(self) -> None:
+        if self._size != self._info.file_size or self._crc != self._info.CRC:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for {self._info.filename}")
+
+
+def _check_local_header(stream: _ByteStream, info: zipfile.ZipInfo) -> None:
+    """Read the local header of info and check it against the central one."""
+    (
+        signature,
+        _,
+        flags,
+        method,
+        _,
+        _,
+        crc,
+        compress_size,
+        file_size,
+        name_length,
+        extra_length,
+    ) = _LOCAL_HEADER.unpack(stream.read(_LOCAL_HEADER.size))
+    raw_name = stream.read(name_length)
+    stream.skip(extra_length)
+
+    name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+    if signature != _LOCAL_SIGNATURE or name != info.orig_filename:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    if flags & _FLAG_ENCRYPTED:
+        raise ValueError(f"Encrypted ZIP members are not supported: {info.filename}")
+    if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        raise ValueError(
+            f"Unsupported compression for streaming: {info.filename} "
+            f"(method {method})"
+        )
+    if method != info.compress_type:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    # With a data descriptor the header sizes are zero, and ZIP64 sizes
+    # live in the extra field; the central directory is used then
+    sizes: Dict[str, Tuple[int, int]] = {
+        "crc": (crc, info.CRC),
+        "compressed size": (compress_size, info.compress_size),
+        "size": (file_size, info.file_size),
+    }
+    if not flags & _FLAG_DATA_DESCRIPTOR and 0xFFFFFFFF not in (
+        compress_size,
+        file_size,
+    ):
+        for what, (local, central) in sizes.items():
+            if local != central:
+                raise zipfile.BadZipFile(
+                    f"Local {what} of {info.filename} differs from the "
+                    "central directory"
+                )
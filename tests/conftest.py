@@ -2,9 +2,13 @@
 
 import zipfile
 from pathlib import Path
+from typing import Iterator
+from unittest.mock import patch
 
 import pytest
 
+from tests.release_server import ReleaseServer
+
 
 @pytest.fixture
 def fake_sd(tmp_path: Path) -> Path:
@@ -67,3 +71,20 @@ def sample_zip(tmp_path: Path) -> Path:
             if file.is_file():
                 zf.write(file, file.relative_to(zip_content))
     return zip_path
+
+
+@pytest.fixture
+def release_server() -> Iterator[ReleaseServer]:
+    """Local HTTP server standing in for GitHub."""
+    server = ReleaseServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path: Path) -> Iterator[None]:
+    """Keep the state index and package registry out of the real home."""
+    with patch("switch_up.state.STATE_DB", tmp_path / "state.db"), patch(
+        "switch_up.registry.REGISTRY_FILE", tmp_path / "packages.json"
+    ):
+        yield
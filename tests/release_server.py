@@ -0,0 +1,128 @@
+"""Local HTTP stand-in for the GitHub API and release asset downloads."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class ReleaseServer:
+    """Serve release JSON and asset bytes from memory on 127.0.0.1.
+
+    Assets honour HTTP Range requests (unless ranges=False) and can be told
+    to drop the connection after a number of bytes, to simulate a flaky link.
+    API calls can be refused as rate limited (see rate_limit).
+    """
+
+    def __init__(self, ranges: bool = True) -> None:
+        self.ranges = ranges
+        self.files: Dict[str, bytes] = {}
+        self.drop_after: Dict[str, int] = {}
+        self.limited = 0
+        self.retry_after = 0
+        self.limit_status = 403
+        self.requests: List[Dict[str, Optional[str]]] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        # Clients hang up mid-response on purpose (dropped or abandoned
+        # downloads); don't print a traceback for each
+        self._server.handle_error = lambda request, address: None  # type: ignore
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_file(self, path: str, content: bytes, drop_after: Optional[int] = None) -> str:
+        """Serve content at path; return its full URL.
+
+        With drop_after, the first request for it is cut after that many bytes.
+        """
+        self.files[path] = content
+        if drop_after is not None:
+            self.drop_after[path] = drop_after
+        return self.url + path
+
+    def add_release(self, repo: str, release: dict) -> None:
+        """Serve release as the latest release of repo."""
+        self.add_file(f"/repos/{repo}/releases/latest", json.dumps(release).encode())
+
+    def rate_limit(self, count: int, retry_after: int = 0, status: int = 403) -> None:
+        """Refuse the next count API calls with GitHub's rate limit response.
+
+        GitHub answers 403 for the primary rate limit and 403 or 429 for
+        secondary ones.
+        """
+        self.limited = count
+        self.retry_after = retry_after
+        self.limit_status = status
+
+    def start(self) -> "ReleaseServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                range_header = self.headers.get("Range")
+                server.requests.append({"path": self.path, "range": range_header})
+                if self.path.startswith("/repos/") and server.limited:
+                    server.limited -= 1
+                    self.send_response(server.limit_status)
+                    self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("X-RateLimit-Remaining", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                content = server.files.get(self.path)
+                if content is None:
+                    self.send_error(404)
+                    return
+
+                start, end = 0, len(content) - 1
+                if range_header and server.ranges:
+                    first, _, last = range_header.split("=")[1].partition("-")
+                    start = int(first)
+                    if last:
+                        end = min(int(last), end)
+                    if start >= len(content):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(content)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range", f"bytes {start}-{end}/{len(content)}"
+                    )
+                else:
+                    self.send_response(200)
+                    if server.ranges:
+                        self.send_header("Accept-Ranges", "bytes")
+                body = content[start : end + 1]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+
+                drop = server.drop_after.pop(self.path, None)
+                if drop is not None:
+                    self.wfile.write(body[:drop])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,153 @@
+"""Tests for the backup module."""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+from switch_up.backup import DEFAULT_KEEP_LAST, BackupStore, backup_candidates
+from switch_up.core import create_backup
+
+
+def _cards(tmp_path: Path, count: int) -> List[Path]:
+    cards = []
+    for i in range(count):
+        card = tmp_path / f"card{i}"
+        card.mkdir()
+        (card / "hekate_ipl.ini").write_text(f"card={i}\n")
+        cards.append(card)
+    return cards
+
+
+class TestBackupCandidates:
+    def test_includes_settings_and_skips_payloads(self, fake_sd: Path) -> None:
+        (fake_sd / "bootloader" / "payloads").mkdir()
+        (fake_sd / "bootloader" / "payloads" / "fusee.bin").write_bytes(b"\x00")
+        (fake_sd / "bootloader" / "nyx.ini").write_text("[config]\n")
+        (fake_sd / "switch" / "DBI").mkdir(parents=True)
+        (fake_sd / "switch" / "DBI" / "dbi.json").write_text("{}")
+        (fake_sd / "switch" / "DBI" / "._dbi.json").write_bytes(b"\x00")
+
+        found = set(backup_candidates(fake_sd))
+        assert found == {
+            "hekate_ipl.ini",
+            "exosphere.ini",
+            "atmosphere/config/system_settings.ini",
+            "bootloader/nyx.ini",
+            "switch/DBI/dbi.json",
+        }
+
+
+class TestBackupStore:
+    def test_identical_files_are_stored_once(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        store = BackupStore(tmp_path / "backups")
+        first = store.create(fake_sd)
+        second = store.create(fake_sd)
+
+        assert first.snapshot_id != second.snapshot_id
+        assert first.files == second.files
+        assert len(list(store.objects.glob("*/*"))) == len(first.files)
+        linked = store.tree(second.snapshot_id) / "hekate_ipl.ini"
+        assert linked.read_text() == "autoboot=0\n"
+
+    def test_unchanged_files_are_not_read_again(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        store = BackupStore(tmp_path / "backups")
+        store.create(fake_sd)
+        (fake_sd / "exosphere.ini").write_text("log_enabled=0\n")
+        with patch("switch_up.backup.file_sha256", return_value="0" * 64) as sha:
+            snapshot = store.create(fake_sd)
+        sha.assert_called_once_with(fake_sd / "exosphere.ini")
+        assert snapshot.files["exosphere.ini"].sha256 == "0" * 64
+
+    def test_restore_by_id(self, fake_sd: Path, tmp_path: Path) -> None:
+        store = BackupStore(tmp_path / "backups")
+        target = fake_sd / "hekate_ipl.ini"
+        mtime_ns = target.stat().st_mtime_ns
+        snapshot = store.create(fake_sd)
+        target.write_text("autoboot=1\n")
+        target.unlink()
+
+        assert store.restore(snapshot.snapshot_id, fake_sd) == len(snapshot.files)
+        assert target.read_text() == "autoboot=0\n"
+        assert target.stat().st_mtime_ns == mtime_ns
+
+    def test_prune_keeps_newest_per_card(self, tmp_path: Path) -> None:
+        store = BackupStore(tmp_path / "backups")
+        cards = []
+        for name in ("a", "b"):
+            card = tmp_path / name
+            card.mkdir()
+            (card / "hekate_ipl.ini").write_text(f"card={name}\n")
+            cards.append(card)
+        for i in range(3):
+            for card in cards:
+                (card / "exosphere.ini").write_text(f"rev={i}\n")
+                store.create(card)
+
+        deleted = store.prune(keep_last=1, max_age_days=None)
+        assert len(deleted) == 4
+        remaining = store.snapshots()
+        assert {s.sd_path for s in remaining} == {str(c) for c in cards}
+        for snapshot in deleted:
+            assert not store.tree(snapshot.snapshot_id).exists()
+
+    def test_prune_collects_unused_objects(self, fake_sd: Path, tmp_path: Path) -> None:
+        store = BackupStore(tmp_path / "backups")
+        store.create(fake_sd)
+        (fake_sd / "exosphere.ini").write_text("log_enabled=0\n")
+        latest = store.create(fake_sd)
+
+        old = time.time() - 7200
+        for blob in store.objects.glob("*/*"):
+            os.utime(blob, (old, old))
+        with patch("switch_up.backup.OBJECT_GRACE_SECONDS", 0):
+            store.prune(keep_last=1)
+
+        live = {e.sha256 for e in latest.files.values()}
+        assert {p.name for p in store.objects.glob("*/*")} == live
+
+    def test_concurrent_prunes_do_not_fail(self, tmp_path: Path) -> None:
+        store = BackupStore(tmp_path / "backups")
+        for card in _cards(tmp_path, 2):
+            for _ in range(20):
+                store.create(card)
+        barrier = threading.Barrier(2)
+
+        def prune() -> None:
+            barrier.wait()
+            BackupStore(store.root).prune(keep_last=1)
+
+        with ThreadPoolExecutor(2) as pool:
+            for future in [pool.submit(prune) for _ in range(2)]:
+                future.result()
+        assert len(store.snapshots()) == 2
+
+
+class TestCreateBackup:
+    def test_cards_backed_up_at_once(self, tmp_path: Path) -> None:
+        root = tmp_path / "backups"
+        cards = _cards(tmp_path, 2)
+        store = BackupStore(root)
+        for card in cards:
+            for _ in range(DEFAULT_KEEP_LAST + 5):
+                store.create(card)
+        barrier = threading.Barrier(2)
+
+        def backup(card: Path) -> Path:
+            barrier.wait()
+            return create_backup(card)
+
+        with patch("switch_up.backup.BACKUP_DIR", root), ThreadPoolExecutor(2) as pool:
+            trees = list(pool.map(backup, cards))
+
+        assert all(tree.is_dir() for tree in trees)
+        for card in cards:
+            kept = [s for s in store.snapshots() if s.sd_path == str(card)]
+            assert len(kept) == DEFAULT_KEEP_LAST
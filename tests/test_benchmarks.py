@@ -0,0 +1,36 @@
+"""Smoke test for the benchmark suite, at a tiny size."""
+
+import json
+import zipfile
+from pathlib import Path
+
+from benchmarks.run import BENCHMARKS, compare, main
+from benchmarks.synthetic import build_release_zip, build_sd_tree, inject_junk
+
+
+class TestSynthetic:
+    def test_tree_and_junk(self, tmp_path: Path) -> None:
+        stats = build_sd_tree(tmp_path, 500)
+        assert stats.files >= 450
+        assert (tmp_path / "Nintendo").is_dir()
+        assert inject_junk(tmp_path) > 0
+        assert any(tmp_path.rglob(".DS_Store"))
+
+    def test_release_zip(self, tmp_path: Path) -> None:
+        zip_path = build_release_zip(tmp_path / "r.zip", 100, large_size=1024)
+        with zipfile.ZipFile(zip_path) as zf:
+            names = zf.namelist()
+        assert len(names) == len(set(names)) == 100
+        assert "atmosphere/package3" in names
+
+
+class TestRun:
+    def test_runs_every_benchmark(self, tmp_path: Path) -> None:
+        out = tmp_path / "results.json"
+        report = main(
+            ["--files", "300", "--members", "40", "--repeat", "1", "--out", str(out)]
+        )
+        assert set(report["results"]) == set(BENCHMARKS)
+        assert json.loads(out.read_text()) == report
+        assert all(r["files"] > 0 for r in report["results"].values())
+        assert len(compare(report, report)) == len(BENCHMARKS)
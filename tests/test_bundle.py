@@ -0,0 +1,124 @@
+"""Tests for the bundle module."""
+
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from switch_up.bundle import BUNDLE_MANIFEST, apply_bundle, build_bundle, read_manifest
+from switch_up.core import Source
+from switch_up.state import StateIndex, read_card_id
+
+
+@pytest.fixture(autouse=True)
+def isolated_backups(tmp_path: Path) -> Iterator[None]:
+    with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+        yield
+
+
+def _zip(path: Path, members: Dict[str, bytes]) -> Path:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path
+
+
+@pytest.fixture
+def sources(tmp_path: Path) -> list:
+    ams = _zip(
+        tmp_path / "atmosphere-1.8.0.zip",
+        {
+            "atmosphere/package3": b"package3",
+            "switch/shared.nro": b"old",
+            "atmosphere/.DS_Store": b"junk",
+            "__MACOSX/atmosphere/._package3": b"junk",
+        },
+    )
+    jksv = _zip(
+        tmp_path / "JKSV.zip",
+        {"JKSV/JKSV.nro": b"jksv", "shared.nro": b"new", "JKSV/._JKSV.nro": b"j"},
+    )
+    return [
+        Source(ams, package="Atmosphere", version="1.8.0"),
+        Source(jksv, "switch", "JKSV", "v1"),
+    ]
+
+
+class TestBuildBundle:
+    def test_merges_packages_without_junk(self, sources: list, tmp_path: Path) -> None:
+        bundle = tmp_path / "bundle.zip"
+        manifest = build_bundle(sources, bundle)
+
+        assert [(f.path, f.package) for f in manifest.files] == [
+            ("atmosphere/package3", "Atmosphere"),
+            ("switch/shared.nro", "JKSV"),
+            ("switch/JKSV/JKSV.nro", "JKSV"),
+        ]
+        with zipfile.ZipFile(bundle) as zf:
+            infos = zf.infolist()
+            assert [i.filename for i in infos] == [BUNDLE_MANIFEST] + [
+                f.path for f in manifest.files
+            ]
+            assert {i.compress_type for i in infos} == {zipfile.ZIP_STORED}
+            assert zf.read("switch/shared.nro") == b"new"
+
+    def test_records_packages(self, sources: list, tmp_path: Path) -> None:
+        manifest = build_bundle(sources, tmp_path / "bundle.zip")
+        assert [(p.name, p.version, p.zip) for p in manifest.packages] == [
+            ("Atmosphere", "1.8.0", "atmosphere-1.8.0.zip"),
+            ("JKSV", "v1", "JKSV.zip"),
+        ]
+        assert read_manifest(tmp_path / "bundle.zip") == manifest
+
+
+class TestReadManifest:
+    def test_rejects_plain_zip(self, sample_zip: Path) -> None:
+        with pytest.raises(ValueError, match="Not a switch-up bundle"):
+            read_manifest(sample_zip)
+
+    def test_rejects_bundle_not_matching_manifest(
+        self, sources: list, tmp_path: Path
+    ) -> None:
+        bundle = tmp_path / "bundle.zip"
+        build_bundle(sources, bundle)
+        tampered = tmp_path / "tampered.zip"
+        with zipfile.ZipFile(bundle) as src, zipfile.ZipFile(tampered, "w") as dst:
+            for info in src.infolist():
+                data = src.read(info)
+                if info.filename == "atmosphere/package3":
+                    data = b"PACKAGE3"
+                dst.writestr(info, data)
+        with pytest.raises(ValueError, match="atmosphere/package3"):
+            read_manifest(tampered)
+
+
+class TestApplyBundle:
+    def test_installs_every_package(
+        self, sources: list, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        bundle = tmp_path / "bundle.zip"
+        build_bundle(sources, bundle)
+
+        result = apply_bundle(bundle, fake_sd, Console(quiet=True), verify=True)
+
+        assert result.files_written == 3
+        assert (fake_sd / "switch" / "JKSV" / "JKSV.nro").read_bytes() == b"jksv"
+        assert (fake_sd / "switch" / "shared.nro").read_bytes() == b"new"
+        assert not (fake_sd / BUNDLE_MANIFEST).exists()
+        with StateIndex() as index:
+            card = read_card_id(fake_sd)
+            assert card is not None
+            assert {p.package for p in index.packages(card)} == {"Atmosphere", "JKSV"}
+
+    def test_reapplying_skips_identical_files(
+        self, sources: list, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        bundle = tmp_path / "bundle.zip"
+        build_bundle(sources, bundle)
+        apply_bundle(bundle, fake_sd, Console(quiet=True))
+        result = apply_bundle(bundle, fake_sd, Console(quiet=True))
+        assert result.files_written == 0
+        assert result.files_skipped == 3
@@ -0,0 +1,83 @@
+"""Tests for the asset cache module."""
+
+import os
+import time
+from pathlib import Path
+
+from switch_up.cache import AssetCache, file_sha256
+
+
+def _download(tmp_path: Path, name: str, content: bytes) -> Path:
+    path = tmp_path / "dl" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+class TestAssetCache:
+    def test_store_then_lookup(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        stored = cache.store(42, _download(tmp_path, "ams.zip", b"zipdata"))
+        assert stored.read_bytes() == b"zipdata"
+        assert stored.name == "ams.zip"
+        assert cache.lookup(42) == stored
+
+    def test_lookup_miss(self, tmp_path: Path) -> None:
+        assert AssetCache(tmp_path / "cache").lookup(42) is None
+
+    def test_lookup_with_other_digest_is_a_miss(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        cache.store(42, _download(tmp_path, "ams.zip", b"zipdata"))
+        assert cache.lookup(42, sha256="0" * 64) is None
+
+    def test_lookup_checks_published_digest(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        path = _download(tmp_path, "ams.zip", b"zipdata")
+        digest = file_sha256(path)
+        stored = cache.store(42, path)
+        assert cache.lookup(42, sha256=digest.upper()) == stored
+
+    def test_identical_content_is_stored_once(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        a = cache.store(1, _download(tmp_path, "a.zip", b"same"))
+        b = cache.store(2, _download(tmp_path, "a.zip", b"same"))
+        assert a == b
+        assert len(list((tmp_path / "cache" / "objects").iterdir())) == 1
+
+    def test_prune_by_size_evicts_least_recently_used(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        cache.store(1, _download(tmp_path, "old.zip", b"x" * 100))
+        cache.store(2, _download(tmp_path, "new.zip", b"y" * 100))
+        time.sleep(0.01)
+        cache.lookup(2)
+
+        evicted = cache.prune(max_bytes=150, max_age_days=None)
+
+        assert [e.asset_id for e in evicted] == ["1"]
+        assert cache.lookup(1) is None
+        assert cache.lookup(2) is not None
+
+    def test_prune_by_age(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        cache.store(1, _download(tmp_path, "a.zip", b"data"))
+        entry = cache.entries()[0]
+        entry.last_used = time.time() - 10 * 86400
+        cache._write_entry(entry)
+
+        evicted = cache.prune(max_bytes=None, max_age_days=5)
+
+        assert len(evicted) == 1
+        assert not entry.path.exists()
+
+    def test_prune_keeps_objects_shared_by_other_assets(self, tmp_path: Path) -> None:
+        cache = AssetCache(tmp_path / "cache")
+        cache.store(1, _download(tmp_path, "a.zip", b"same"))
+        stored = cache.store(2, _download(tmp_path, "a.zip", b"same"))
+        entry = [e for e in cache.entries() if e.asset_id == "1"][0]
+        entry.last_used = 0
+        cache._write_entry(entry)
+
+        cache.prune(max_bytes=None, max_age_days=1)
+
+        assert stored.is_file()
+        assert os.listdir(tmp_path / "cache" / "assets") == ["2.json"]
@@ -1,10 +1,20 @@
 """Tests for the cleaner module."""
 
+import os
+import subprocess
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
-from switch_up.cleaner import clean_macos_junk
+from switch_up.cleaner import (
+    NATIVE_XATTRS,
+    clean_macos_junk,
+    clean_paths,
+    remove_xattrs,
+    scan_junk,
+    remove_xattrs_paths,
+)
 
 
 class TestCleanMacosJunk:
@@ -23,9 +33,9 @@ class TestCleanMacosJunk:
         assert not (fake_sd_with_junk / "__MACOSX").exists()
 
     def test_returns_correct_count(self, fake_sd_with_junk: Path) -> None:
-        # 2x .DS_Store + 2x ._* + 1x ._ignored (inside __MACOSX) + 1x __MACOSX = 6
+        # 2x .DS_Store + 2x ._* + 1x __MACOSX (removed whole, not entered) = 5
         removed = clean_macos_junk(fake_sd_with_junk)
-        assert removed == 6
+        assert removed == 5
 
     def test_preserves_normal_files(self, fake_sd_with_junk: Path) -> None:
         clean_macos_junk(fake_sd_with_junk)
@@ -45,3 +55,160 @@ class TestCleanMacosJunk:
     def test_clean_directory_returns_zero(self, fake_sd: Path) -> None:
         removed = clean_macos_junk(fake_sd)
         assert removed == 0
+
+    def test_removes_volume_junk_dirs(self, fake_sd: Path) -> None:
+        for name in (".Spotlight-V100", ".Trashes", ".fseventsd", ".TemporaryItems"):
+            (fake_sd / name / "sub").mkdir(parents=True)
+            (fake_sd / name / "sub" / "data").write_bytes(b"x")
+        assert clean_macos_junk(fake_sd) == 4
+        assert sorted(p.name for p in fake_sd.iterdir()) == [
+            "Nintendo", "atmosphere", "bootloader", "exosphere.ini", "hekate_ipl.ini",
+        ]
+
+
+class TestScanJunk:
+    def test_dry_run_reports_without_removing(self, fake_sd_with_junk: Path) -> None:
+        report = scan_junk(fake_sd_with_junk, remove=False)
+
+        assert report.dirs == [fake_sd_with_junk / "__MACOSX"]
+        assert report.files == sorted([
+            fake_sd_with_junk / ".DS_Store",
+            fake_sd_with_junk / "._somefile",
+            fake_sd_with_junk / "atmosphere" / ".DS_Store",
+            fake_sd_with_junk / "atmosphere" / "._config",
+        ])
+        assert (fake_sd_with_junk / "__MACOSX" / "._ignored").exists()
+        assert (fake_sd_with_junk / ".DS_Store").exists()
+
+    def test_does_not_descend_into_junk_dirs(self, fake_sd_with_junk: Path) -> None:
+        report = scan_junk(fake_sd_with_junk, remove=False)
+        assert not any("__MACOSX" in p.parts for p in report.files)
+
+    def test_custom_patterns(self, fake_sd: Path) -> None:
+        (fake_sd / "Thumbs.db").write_bytes(b"x")
+        (fake_sd / ".DS_Store").write_bytes(b"x")
+        report = scan_junk(fake_sd, patterns=["Thumbs.db"])
+        assert report.files == [fake_sd / "Thumbs.db"]
+        assert (fake_sd / ".DS_Store").exists()
+
+    def test_deep_tree(self, tmp_path: Path) -> None:
+        for i in range(20):
+            d = tmp_path.joinpath(*[f"d{i}"] * 5)
+            d.mkdir(parents=True)
+            (d / ".DS_Store").write_bytes(b"x")
+            (d / "keep.bin").write_bytes(b"x")
+        report = scan_junk(tmp_path, workers=4)
+        assert report.count == 20
+        assert len(list(tmp_path.rglob("keep.bin"))) == 20
+
+    def test_records_errors(self, fake_sd_with_junk: Path) -> None:
+        with patch("switch_up.cleaner.os.unlink", side_effect=PermissionError(13, "Denied")):
+            report = scan_junk(fake_sd_with_junk)
+        assert fake_sd_with_junk / ".DS_Store" in report.errors
+        assert fake_sd_with_junk / "atmosphere" / "._config" in report.errors
+        assert report.count == 0
+
+
+class TestCleanPaths:
+    def test_removes_dot_underscore_siblings(self, fake_sd: Path) -> None:
+        written = fake_sd / "atmosphere" / "package3"
+        written.write_bytes(b"data")
+        (fake_sd / "atmosphere" / "._package3").write_bytes(b"\x00")
+
+        assert clean_paths([written]) == 1
+        assert written.is_file()
+        assert not (fake_sd / "atmosphere" / "._package3").exists()
+
+    def test_removes_ds_store_in_touched_dirs(self, fake_sd_with_junk: Path) -> None:
+        clean_paths([fake_sd_with_junk / "atmosphere"])
+        assert not (fake_sd_with_junk / "atmosphere" / ".DS_Store").exists()
+
+    def test_leaves_untouched_paths_alone(self, fake_sd_with_junk: Path) -> None:
+        clean_paths([fake_sd_with_junk / "atmosphere"])
+        assert (fake_sd_with_junk / ".DS_Store").exists()
+        assert (fake_sd_with_junk / "__MACOSX").exists()
+        assert (fake_sd_with_junk / "._somefile").exists()
+
+    def test_removes_touched_junk_itself(self, fake_sd_with_junk: Path) -> None:
+        removed = clean_paths(
+            [fake_sd_with_junk / "__MACOSX", fake_sd_with_junk / "__MACOSX" / "._ignored"]
+        )
+        assert removed == 1
+        assert not (fake_sd_with_junk / "__MACOSX").exists()
+
+    def test_ignores_missing_paths(self, tmp_path: Path) -> None:
+        assert clean_paths([tmp_path / "gone"]) == 0
+
+
+def _set_user_xattr(path: Path) -> None:
+    if not NATIVE_XATTRS:
+        pytest.skip("os.setxattr is not available on this platform")
+    try:
+        os.setxattr(path, "user.com.apple.quarantine", b"0081;")
+    except OSError:
+        pytest.skip("filesystem does not support user xattrs")
+
+
+class TestRemoveXattrs:
+    def test_removes_user_attributes(self, fake_sd: Path) -> None:
+        target = fake_sd / "hekate_ipl.ini"
+        _set_user_xattr(target)
+        os.setxattr(target, "user.com.apple.FinderInfo", b"\x00" * 32)
+
+        report = remove_xattrs(fake_sd)
+
+        assert report.ok
+        assert os.listxattr(target) == []
+        assert report.cleaned == {target: 2}
+        assert report.attrs_removed == 2
+
+    def test_walks_whole_tree(self, fake_sd: Path) -> None:
+        deep = (
+            fake_sd / "atmosphere" / "contents"
+            / "0100000000001000" / "romfs" / "user_mod.txt"
+        )
+        _set_user_xattr(deep)
+        report = remove_xattrs(fake_sd)
+        assert deep in report.cleaned
+        assert report.files_scanned == len(list(fake_sd.rglob("*"))) + 1
+
+    def test_files_without_attributes_are_not_reported(self, fake_sd: Path) -> None:
+        report = remove_xattrs(fake_sd)
+        assert report.cleaned == {}
+        assert report.ok
+
+    def test_error_if_not_directory(self, tmp_path: Path) -> None:
+        f = tmp_path / "file.txt"
+        f.write_text("test")
+        with pytest.raises(NotADirectoryError):
+            remove_xattrs(f)
+
+    def test_reports_errors_per_file(self, fake_sd: Path) -> None:
+        target = fake_sd / "exosphere.ini"
+        _set_user_xattr(target)
+        with patch("os.removexattr", side_effect=PermissionError(13, "Denied")):
+            report = remove_xattrs(fake_sd)
+        assert not report.ok
+        assert "Denied" in report.errors[target]
+
+
+class TestRemoveXattrsPaths:
+    def test_only_given_paths(self, fake_sd: Path) -> None:
+        touched = fake_sd / "hekate_ipl.ini"
+        untouched = fake_sd / "exosphere.ini"
+        _set_user_xattr(touched)
+        _set_user_xattr(untouched)
+
+        report = remove_xattrs_paths([touched])
+
+        assert report.cleaned == {touched: 1}
+        assert os.listxattr(untouched) != []
+
+    def test_subprocess_fallback(self, fake_sd: Path) -> None:
+        completed = subprocess.CompletedProcess([], 1, stdout="", stderr="boom")
+        with patch("switch_up.cleaner.NATIVE_XATTRS", False), patch(
+            "switch_up.cleaner.subprocess.run", return_value=completed
+        ) as run:
+            report = remove_xattrs_paths([fake_sd / "hekate_ipl.ini"])
+        assert run.call_args[0][0][:2] == ["xattr", "-c"]
+        assert report.errors == {fake_sd / "hekate_ipl.ini": "boom"}
@@ -0,0 +1,531 @@
+"""Tests for the CLI commands."""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from switch_up.backup import BackupStore
+from switch_up.cache import AssetCache
+from switch_up.cli import app
+from switch_up.core import Source
+from tests.release_server import ReleaseServer
+
+runner = CliRunner()
+
+# Modules that must not be loaded just to start the CLI
+HEAVY_MODULES = (
+    "requests",
+    "urllib3",
+    "rich.progress",
+    "rich.table",
+    "switch_up.network",
+    "switch_up.core",
+    "switch_up.fleet",
+    "switch_up.watch",
+)
+
+# Import time of switch_up.cli (typer and the Rich console included);
+# eagerly importing the network and install stack costs about 4x this
+STARTUP_BUDGET_SECONDS = 0.2
+
+
+def _release(tag: str, *names: str) -> dict:
+    return {
+        "tag_name": tag,
+        "assets": [
+            {"name": name, "browser_download_url": f"https://x/{name}"}
+            for name in names
+        ],
+    }
+
+
+RELEASES = {
+    "Atmosphere-NX/Atmosphere": _release("1.8.0", "fusee.bin", "atmosphere-1.8.0.zip"),
+    "CTCaer/hekate": _release(
+        "v6.2", "nyx_usb.zip", "hekate_ctcaer_6.2.zip", "hekate.bin"
+    ),
+    "J-D-K/JKSV": _release("v1", "JKSV.zip"),
+}
+
+
+def _fake_download(
+    url: str, dest: Path, console: object, progress: object = None, **kwargs: object
+) -> Path:
+    name = url.split("/")[-1]
+    path = Path(dest) / name
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(f"{Path(name).stem}/marker", url)
+    return path
+
+
+class TestUpdate:
+    def test_downloads_concurrently_and_installs_in_one_pass(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        both_started = threading.Barrier(2, timeout=5)
+        installs: List[List[str]] = []
+
+        def fake_download(url: str, dest: Path, *args: object, **kwargs: object):
+            # Deadlocks (and times out) unless both downloads run at once
+            both_started.wait()
+            return _fake_download(url, dest, *args, **kwargs)
+
+        def fake_install(
+            sources: List[Source], sd: Path, console: object, **kwargs: object
+        ) -> None:
+            installs.append([s.zip_path.name for s in sources])
+
+        with patch(
+            "switch_up.network.get_latest_release", side_effect=RELEASES.get
+        ), patch("switch_up.network.download_asset", side_effect=fake_download), patch(
+            "switch_up.core.install_packages", side_effect=fake_install
+        ):
+            result = runner.invoke(app, ["update", "--sd-path", str(fake_sd)])
+
+        assert result.exit_code == 0, result.output
+        # The matching assets, not the first .zip of each release
+        assert installs == [["atmosphere-1.8.0.zip", "hekate_ctcaer_6.2.zip"]]
+
+    def test_missing_zip_asset_fails(self, fake_sd: Path) -> None:
+        with patch(
+            "switch_up.network.get_latest_release",
+            return_value={"tag_name": "1.8.0", "assets": []},
+        ), patch("switch_up.core.install_packages") as install:
+            result = runner.invoke(
+                app, ["update", "--ams-only", "--sd-path", str(fake_sd)]
+            )
+        assert result.exit_code == 1
+        assert "No asset matching atmosphere-*.zip" in result.output
+        install.assert_not_called()
+
+    def test_installs_registry_packages_under_prefix(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        registry = tmp_path / "packages.json"
+        registry.write_text(
+            json.dumps(
+                [
+                    {
+                        "name": "Atmosphere",
+                        "repo": "Atmosphere-NX/Atmosphere",
+                        "asset": "atmosphere-*.zip",
+                    },
+                    {"name": "JKSV", "repo": "J-D-K/JKSV", "prefix": "switch"},
+                ]
+            )
+        )
+        with patch("switch_up.registry.REGISTRY_FILE", registry), patch(
+            "switch_up.backup.BACKUP_DIR", tmp_path / "backups"
+        ), patch(
+            "switch_up.network.get_latest_release", side_effect=RELEASES.get
+        ), patch(
+            "switch_up.network.download_asset", side_effect=_fake_download
+        ):
+            result = runner.invoke(app, ["update", "--sd-path", str(fake_sd)])
+            status = runner.invoke(app, ["status", str(fake_sd)])
+
+        assert result.exit_code == 0, result.output
+        assert (fake_sd / "atmosphere-1.8.0" / "marker").is_file()
+        assert (fake_sd / "switch" / "JKSV" / "marker").is_file()
+        assert "JKSV" in status.output
+        assert result.output.count("Backing up configuration") == 1
+
+    def test_direct_installs_without_storing_the_zip(
+        self, fake_sd: Path, tmp_path: Path, release_server: ReleaseServer
+    ) -> None:
+        data = _fake_download("https://x/atmosphere-1.8.0.zip", tmp_path, None)
+        url = release_server.add_file("/atmosphere-1.8.0.zip", data.read_bytes())
+        asset = {
+            "id": 1,
+            "name": data.name,
+            "browser_download_url": url,
+            "size": data.stat().st_size,
+        }
+        release_server.add_release(
+            "Atmosphere-NX/Atmosphere", {"tag_name": "1.8.0", "assets": [asset]}
+        )
+        with patch("switch_up.network.GITHUB_API", release_server.url), patch(
+            "switch_up.backup.BACKUP_DIR", tmp_path / "backups"
+        ):
+            result = runner.invoke(
+                app, ["update", "--ams-only", "--direct", "--sd-path", str(fake_sd)]
+            )
+
+        assert result.exit_code == 0, result.output
+        assert "streaming from the download" in result.output
+        assert (fake_sd / "atmosphere-1.8.0" / "marker").is_file()
+        assert AssetCache().entries() == []
+
+    def test_direct_rejects_verify(self, fake_sd: Path) -> None:
+        result = runner.invoke(
+            app, ["update", "--direct", "--verify", "--sd-path", str(fake_sd)]
+        )
+        assert result.exit_code == 1
+        assert "--direct" in result.output
+
+    def test_invalid_registry_fails(self, fake_sd: Path, tmp_path: Path) -> None:
+        registry = tmp_path / "packages.json"
+        registry.write_text('[{"name": "JKSV"}]')
+        with patch("switch_up.registry.REGISTRY_FILE", registry):
+            result = runner.invoke(app, ["update", "--sd-path", str(fake_sd)])
+        assert result.exit_code == 1
+        assert "repo is required" in result.output
+
+
+class TestPackages:
+    def test_lists_default_packages(self) -> None:
+        result = runner.invoke(app, ["packages"])
+        assert result.exit_code == 0, result.output
+        assert "Atmosphere-NX/Atmosphere" in result.output
+        assert "hekate_ctcaer_*.zip" in result.output
+        assert "Built-in defaults" in result.output
+
+
+class TestCache:
+    def test_ls_and_prune(self, tmp_path: Path) -> None:
+        download = tmp_path / "ams.zip"
+        download.write_bytes(b"zipdata")
+        with patch("switch_up.cache.CACHE_DIR", tmp_path / "cache"):
+            AssetCache().store(7, download)
+            listed = runner.invoke(app, ["cache", "ls"])
+            pruned = runner.invoke(app, ["cache", "prune", "--all"])
+            empty = runner.invoke(app, ["cache", "ls"])
+
+        assert "ams.zip" in listed.output
+        assert "Evicted 1 assets" in pruned.output
+        assert "Cache is empty" in empty.output
+
+    def test_prune_requires_a_limit(self, tmp_path: Path) -> None:
+        with patch("switch_up.cache.CACHE_DIR", tmp_path / "cache"):
+            result = runner.invoke(app, ["cache", "prune"])
+        assert result.exit_code == 1
+
+
+class TestFleet:
+    def test_installs_local_zip_to_all_cards(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        other = tmp_path / "other_sd"
+        (other / "Nintendo").mkdir(parents=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            result = runner.invoke(
+                app, ["fleet", str(fake_sd), str(other), "--zip", str(sample_zip)]
+            )
+
+        assert result.exit_code == 0, result.output
+        assert "All 2 cards completed" in result.output
+        assert (other / "atmosphere" / "package3").is_file()
+
+    def test_exit_code_when_a_card_fails(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        (fake_sd / "atmosphere" / "package3").mkdir()
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            result = runner.invoke(app, ["fleet", str(fake_sd), "--zip", str(sample_zip)])
+        assert result.exit_code == 1
+        assert "1 of 1 cards failed" in result.output
+
+
+    def test_dry_run_plans_every_card(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        other = tmp_path / "other_sd"
+        (other / "Nintendo").mkdir(parents=True)
+        result = runner.invoke(
+            app,
+            ["fleet", str(fake_sd), str(other), "--zip", str(sample_zip), "--dry-run"],
+        )
+
+        assert result.exit_code == 0, result.output
+        assert "Fleet plan" in result.output
+        assert "nothing was changed" in result.output
+        assert not (other / "atmosphere").exists()
+
+
+class TestWatch:
+    def test_installs_cards_found_under_the_root(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        from switch_up.watch import Station
+
+        root = tmp_path / "media"
+        root.mkdir()
+        shutil.move(str(fake_sd), str(root))
+
+        def run_once(station: Station, watcher: object, stop: object) -> None:
+            station.check(watcher.scan())  # type: ignore[attr-defined]
+            while station.busy:
+                time.sleep(0.01)
+            raise KeyboardInterrupt
+
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.cli._prepare_releases", return_value=lambda: [Source(sample_zip)]
+        ), patch.object(Station, "run", run_once):
+            result = runner.invoke(app, ["watch", "--root", str(root)])
+
+        assert result.exit_code == 0, result.output
+        assert f"Watching: {root}" in result.output
+        assert "Updated 1 cards, 0 failed" in result.output
+        assert (root / "SD" / "atmosphere" / "package3").is_file()
+
+    def test_missing_root(self, tmp_path: Path) -> None:
+        result = runner.invoke(app, ["watch", "--root", str(tmp_path / "nowhere")])
+        assert result.exit_code == 1
+        assert "does not exist" in result.output
+
+
+class TestInstall:
+    def test_dry_run_prints_plan_and_changes_nothing(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        before = sorted(fake_sd.rglob("*"))
+        result = runner.invoke(
+            app, ["install", str(sample_zip), "--sd-path", str(fake_sd), "--dry-run"]
+        )
+
+        assert result.exit_code == 0, result.output
+        assert "+ atmosphere/package3" in result.output
+        assert "Create          2 files" in result.output
+        assert "Estimated time" in result.output
+        assert sorted(fake_sd.rglob("*")) == before
+
+    def test_prints_plan_before_installing(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            result = runner.invoke(
+                app, ["install", str(sample_zip), "--sd-path", str(fake_sd)]
+            )
+        assert result.exit_code == 0, result.output
+        assert "Plan for" in result.output
+        assert "+ atmosphere/package3" not in result.output
+        assert (fake_sd / "atmosphere" / "package3").is_file()
+
+    def test_writer_options_override_the_card_tuning(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        args = ["install", str(sample_zip), "--sd-path", str(fake_sd)]
+        with patch("switch_up.core.install_packages") as install:
+            runner.invoke(app, args)
+            assert install.call_args.kwargs["tuning"] is None
+
+            result = runner.invoke(app, args + ["--writers", "2", "--small-files", "64"])
+        assert result.exit_code == 0, result.output
+        tuning = install.call_args.kwargs["tuning"]
+        assert (tuning.writers, tuning.small_file_limit) == (2, 64 * 1024)
+
+
+class TestFixArchiveBit:
+    def test_dry_run_lists_without_removing(self, fake_sd_with_junk: Path) -> None:
+        result = runner.invoke(app, ["fix-archive-bit", str(fake_sd_with_junk), "--dry-run"])
+        assert result.exit_code == 0
+        assert "__MACOSX/" in result.output
+        assert "5 junk files/folders would be removed" in result.output
+        assert (fake_sd_with_junk / ".DS_Store").exists()
+
+    def test_removes_junk(self, fake_sd_with_junk: Path) -> None:
+        result = runner.invoke(app, ["fix-archive-bit", str(fake_sd_with_junk)])
+        assert result.exit_code == 0
+        assert "Removed 5 junk files/folders" in result.output
+        assert not (fake_sd_with_junk / "__MACOSX").exists()
+
+
+class TestStatus:
+    def test_reports_installed_packages(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            runner.invoke(app, ["install", str(sample_zip), "--sd-path", str(fake_sd)])
+        result = runner.invoke(app, ["status", str(fake_sd)])
+        assert result.exit_code == 0, result.output
+        assert "atmosphere-update" in result.output
+        assert "All installed files are intact" in result.output
+
+    def test_detects_damaged_files(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            runner.invoke(app, ["install", str(sample_zip), "--sd-path", str(fake_sd)])
+        (fake_sd / "bootloader" / "update.bin").unlink()
+        result = runner.invoke(app, ["status", str(fake_sd)])
+        assert result.exit_code == 1
+        assert "bootloader/update.bin" in result.output
+
+    def test_deep_check_reads_contents(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            runner.invoke(app, ["install", str(sample_zip), "--sd-path", str(fake_sd)])
+        target = fake_sd / "atmosphere" / "package3"
+        st = target.stat()
+        target.write_bytes(b"bad_package3_data")  # same size
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        assert runner.invoke(app, ["status", str(fake_sd)]).exit_code == 0
+        assert runner.invoke(app, ["status", str(fake_sd), "--deep"]).exit_code == 1
+
+    def test_unknown_card(self, fake_sd: Path) -> None:
+        result = runner.invoke(app, ["status", str(fake_sd)])
+        assert result.exit_code == 0
+        assert "No switch-up installs recorded" in result.output
+
+
+class TestProbe:
+    def test_probes_once_then_shows_the_cached_result(self, fake_sd: Path) -> None:
+        args = ["probe", str(fake_sd), "--size", "1"]
+        result = runner.invoke(app, args)
+        assert result.exit_code == 0, result.output
+        assert "Probing the card" in result.output
+        assert "Sequential write" in result.output
+
+        result = runner.invoke(app, args)
+        assert "Probing the card" not in result.output
+        assert "--force to measure again" in result.output
+
+        result = runner.invoke(app, args + ["--force"])
+        assert "Probing the card" in result.output
+
+    def test_shows_when_sync_is_not_used(self, fake_sd: Path) -> None:
+        with patch("switch_up.copier.sys.platform", "darwin"):
+            result = runner.invoke(app, ["probe", str(fake_sd), "--size", "1"])
+        assert result.exit_code == 0, result.output
+        assert "fsync per file" in result.output
+
+
+class TestVerify:
+    def test_reports_and_repairs_mismatches(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            runner.invoke(app, ["install", str(sample_zip), "--sd-path", str(fake_sd)])
+        args = ["verify", str(sample_zip), "--sd-path", str(fake_sd)]
+        assert runner.invoke(app, args).exit_code == 0
+
+        (fake_sd / "atmosphere" / "package3").write_bytes(b"bad_package3_data")
+        result = runner.invoke(app, args)
+        assert result.exit_code == 1
+        assert "atmosphere/package3: CRC32 mismatch" in result.output
+
+        result = runner.invoke(app, args + ["--repair"])
+        assert result.exit_code == 0, result.output
+        assert runner.invoke(app, args).exit_code == 0
+
+
+class TestBackup:
+    def test_ls_and_restore(self, fake_sd: Path, tmp_path: Path) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            assert "No backups yet" in runner.invoke(app, ["backup", "ls"]).output
+            snapshot = BackupStore().create(fake_sd)
+            (fake_sd / "hekate_ipl.ini").write_text("autoboot=1\n")
+
+            listing = runner.invoke(app, ["backup", "ls"])
+            assert snapshot.snapshot_id in listing.output
+            result = runner.invoke(
+                app,
+                ["backup", "restore", snapshot.snapshot_id, "-s", str(fake_sd)],
+            )
+            assert result.exit_code == 0, result.output
+            missing = runner.invoke(
+                app, ["backup", "restore", "nope", "-s", str(fake_sd)]
+            )
+            assert missing.exit_code == 1
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+
+
+class TestBundle:
+    def test_build_show_and_apply(self, fake_sd: Path, tmp_path: Path) -> None:
+        bundle = tmp_path / "bundle.zip"
+        with patch(
+            "switch_up.network.get_latest_release", side_effect=RELEASES.get
+        ), patch("switch_up.network.download_asset", side_effect=_fake_download):
+            built = runner.invoke(app, ["bundle", "build", "-o", str(bundle)])
+        assert built.exit_code == 0, built.output
+        assert "from 2 packages" in built.output
+
+        shown = runner.invoke(app, ["bundle", "show", str(bundle)])
+        assert "hekate_ctcaer_6.2.zip" in shown.output
+
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.network.get_session", side_effect=AssertionError("network")
+        ):
+            applied = runner.invoke(
+                app, ["bundle", "apply", str(bundle), "--sd-path", str(fake_sd)]
+            )
+        assert applied.exit_code == 0, applied.output
+        assert (fake_sd / "hekate_ctcaer_6.2" / "marker").is_file()
+
+    def test_unknown_package_fails(self, tmp_path: Path) -> None:
+        result = runner.invoke(app, ["bundle", "build", "-p", "Nope"])
+        assert result.exit_code == 1
+        assert "Unknown packages: Nope" in result.output
+
+    def test_apply_rejects_plain_zip(self, fake_sd: Path, sample_zip: Path) -> None:
+        result = runner.invoke(
+            app, ["bundle", "apply", str(sample_zip), "--sd-path", str(fake_sd)]
+        )
+        assert result.exit_code == 1
+        assert "Not a switch-up bundle" in result.output
+
+
+class TestProfiling:
+    def test_install_writes_trace_and_stats(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        trace = tmp_path / "trace.json"
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            result = runner.invoke(
+                app,
+                [
+                    "install",
+                    str(sample_zip),
+                    "--sd-path",
+                    str(fake_sd),
+                    "--profile",
+                    str(trace),
+                    "--stats",
+                ],
+            )
+        assert result.exit_code == 0, result.output
+        assert "Phases" in result.output
+        names = {e["name"] for e in json.loads(trace.read_text())["traceEvents"]}
+        assert {"backup", "merge", "write", "commit", "clean", "xattrs"} <= names
+
+
+def _import_times(code: str) -> Dict[str, float]:
+    """Run code in a fresh interpreter; cumulative import time per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+class TestStartup:
+    def test_version_skips_heavy_imports(self) -> None:
+        times = _import_times("from switch_up.cli import app; app(['--version'])")
+        assert "switch_up.cli" in times
+        assert [m for m in HEAVY_MODULES if m in times] == []
+
+    def test_import_time_within_budget(self) -> None:
+        best = min(
+            _import_times("import switch_up.cli")["switch_up.cli"] for _ in range(3)
+        )
+        assert best < STARTUP_BUDGET_SECONDS
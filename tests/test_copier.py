@@ -0,0 +1,178 @@
+"""Tests for the copier module."""
+
+import errno
+import io
+import os
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from switch_up import copier
+from switch_up.copier import (
+    FileWriter,
+    IOTuning,
+    SyncBatch,
+    copy_file,
+    copy_stream,
+    make_skeleton,
+)
+
+
+class TestCopyFile:
+    def test_copies_content_and_mtime(self, tmp_path: Path) -> None:
+        src = tmp_path / "src.bin"
+        src.write_bytes(os.urandom(300_000))
+        os.utime(src, (1_600_000_000, 1_600_000_000))
+        dst = tmp_path / "dst.bin"
+
+        assert copy_file(src, dst, buffer_size=64 * 1024) == 300_000
+        assert dst.read_bytes() == src.read_bytes()
+        assert dst.stat().st_mtime == 1_600_000_000
+
+    def test_falls_back_to_user_space_copy(self, tmp_path: Path) -> None:
+        src = tmp_path / "src.bin"
+        src.write_bytes(b"payload" * 1000)
+        dst = tmp_path / "dst.bin"
+
+        def unsupported(src_fd: int, dst_fd: int, n: int) -> int:
+            raise OSError(errno.EXDEV, "cross-device")
+
+        with patch.object(copier, "_kernel_copiers", return_value=[unsupported]):
+            assert copy_file(src, dst) == 7000
+        assert dst.read_bytes() == src.read_bytes()
+
+    def test_empty_file(self, tmp_path: Path) -> None:
+        src = tmp_path / "empty"
+        src.touch()
+        assert copy_file(src, tmp_path / "copy") == 0
+        assert (tmp_path / "copy").read_bytes() == b""
+
+
+class TestCopyStream:
+    def test_copies_in_chunks(self) -> None:
+        data = os.urandom(100_000)
+        out = io.BytesIO()
+        assert copy_stream(io.BytesIO(data), out, buffer_size=4096) == len(data)
+        assert out.getvalue() == data
+
+
+class TestFileWriter:
+    def test_writes_small_files_on_the_pool(self, tmp_path: Path) -> None:
+        threads = set()
+        real_write = copier.write_file
+
+        def write(path: Path, data: bytes) -> int:
+            threads.add(threading.current_thread().name)
+            return real_write(path, data)
+
+        with patch.object(copier, "write_file", write):
+            with FileWriter(IOTuning(writers=4)) as writer:
+                for i in range(50):
+                    writer.write(tmp_path / f"f{i}", b"x" * i)
+        assert all((tmp_path / f"f{i}").read_bytes() == b"x" * i for i in range(50))
+        assert threading.current_thread().name not in threads
+
+    def test_copies_large_files_inline(self, tmp_path: Path) -> None:
+        (tmp_path / "big").write_bytes(b"\0" * 2048)
+        threads = []
+        real_copy = copier.copy_file
+
+        def copy(*args: object) -> int:
+            threads.append(threading.current_thread())
+            return real_copy(*args)  # type: ignore[arg-type]
+
+        with patch.object(copier, "copy_file", copy):
+            with FileWriter(IOTuning(writers=4, small_file_limit=1024)) as writer:
+                writer.copy(tmp_path / "big", tmp_path / "copy", 2048)
+        assert threads == [threading.current_thread()]
+        assert (tmp_path / "copy").read_bytes() == b"\0" * 2048
+
+    def test_raises_the_first_failure(self, tmp_path: Path) -> None:
+        with pytest.raises(FileNotFoundError):
+            with FileWriter(IOTuning(writers=2)) as writer:
+                writer.write(tmp_path / "missing" / "f", b"x")
+                writer.close()
+                writer.write(tmp_path / "g", b"y")
+        assert not (tmp_path / "g").exists()
+
+    def test_bounds_the_queued_files(self, tmp_path: Path) -> None:
+        release = threading.Event()
+        queued = []
+
+        def write(path: Path, data: bytes) -> int:
+            release.wait()
+            return 0
+
+        with patch.object(copier, "write_file", write):
+            writer = FileWriter(IOTuning(writers=2))
+            producer = threading.Thread(
+                target=lambda: [
+                    queued.append(writer.write(tmp_path / str(i), b""))
+                    for i in range(10)
+                ]
+            )
+            producer.start()
+            producer.join(timeout=0.2)
+            assert len(queued) == 4
+            release.set()
+            producer.join()
+            writer.close()
+        assert len(queued) == 10
+
+
+class TestMakeSkeleton:
+    def test_creates_parents_first(self, tmp_path: Path) -> None:
+        created = []
+        real_mkdir = Path.mkdir
+
+        def mkdir(self: Path, *args: object, **kwargs: object) -> None:
+            created.append(self)
+            real_mkdir(self, *args, **kwargs)  # type: ignore[arg-type]
+
+        with patch.object(Path, "mkdir", mkdir):
+            make_skeleton([tmp_path / "a" / "b", tmp_path / "a", tmp_path / "c"])
+        assert created == [tmp_path / "a", tmp_path / "a" / "b", tmp_path / "c"]
+
+
+class TestSyncBatch:
+    def test_syncs_each_directory_once(self, tmp_path: Path) -> None:
+        batch = SyncBatch()
+        for name in ("a", "b", "c"):
+            (tmp_path / name).write_bytes(b"x")
+            batch.add(tmp_path / name)
+
+        with patch.object(copier, "fsync_path") as fsync_path:
+            batch.flush()
+        synced = [call.args[0] for call in fsync_path.call_args_list]
+        assert sorted(synced[:3]) == [tmp_path / n for n in ("a", "b", "c")]
+        assert synced[3:] == [tmp_path]
+        assert batch.files == [] and batch.dirs == set()
+
+    def test_large_batches_use_one_sync(self, tmp_path: Path) -> None:
+        batch = SyncBatch()
+        for i in range(copier.SYNC_ALL_THRESHOLD):
+            batch.add(tmp_path / f"f{i}")
+
+        with patch.object(copier.sys, "platform", "linux"), patch.object(
+            copier.os, "sync", create=True
+        ) as sync, patch.object(copier, "fsync_path") as fsync_path:
+            batch.flush()
+        sync.assert_called_once_with()
+        fsync_path.assert_called_once_with(tmp_path)
+
+    def test_fsyncs_each_file_where_sync_does_not_wait(self, tmp_path: Path) -> None:
+        batch = SyncBatch()
+        for i in range(copier.SYNC_ALL_THRESHOLD):
+            batch.add(tmp_path / f"f{i}")
+
+        with patch.object(copier.sys, "platform", "darwin"), patch.object(
+            copier.os, "sync", create=True
+        ) as sync, patch.object(copier, "fsync_path") as fsync_path:
+            batch.flush()
+        sync.assert_not_called()
+        synced = [call.args[0] for call in fsync_path.call_args_list]
+        expected = [tmp_path / f"f{i}" for i in range(copier.SYNC_ALL_THRESHOLD)]
+        assert sorted(synced[:-1]) == sorted(expected)
+        assert synced[-1] == tmp_path
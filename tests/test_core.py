@@ -1,16 +1,32 @@
 """Tests for the core module."""
 
+import zipfile
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
 from unittest.mock import patch
 
+import pytest
 from rich.console import Console
 
-from switch_up.core import create_backup, install_zip, restore_backup, smart_merge
+from switch_up.cleaner import XattrReport
+from switch_up.copier import IOTuning
+from switch_up.core import (
+    Source,
+    create_backup,
+    install_packages,
+    install_zip,
+    restore_backup,
+    smart_merge,
+    stream_merge,
+    stream_merge_sources,
+)
+from switch_up.state import StateIndex, read_card_id
+from switch_up.zipstream import RemoteZip
 
 
 class TestCreateBackup:
     def test_backs_up_existing_files(self, fake_sd: Path, tmp_path: Path) -> None:
-        with patch("switch_up.core.BACKUP_DIR", tmp_path / "backups"):
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
             backup = create_backup(fake_sd)
         assert (Path(backup) / "hekate_ipl.ini").is_file()
         assert (Path(backup) / "exosphere.ini").is_file()
@@ -19,14 +35,14 @@ class TestCreateBackup:
         ).is_file()
 
     def test_backup_content_is_correct(self, fake_sd: Path, tmp_path: Path) -> None:
-        with patch("switch_up.core.BACKUP_DIR", tmp_path / "backups"):
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
             backup = create_backup(fake_sd)
         assert (Path(backup) / "hekate_ipl.ini").read_text() == "autoboot=0\n"
 
     def test_sd_without_configs_does_not_fail(self, tmp_path: Path) -> None:
         sd = tmp_path / "empty_sd"
         sd.mkdir()
-        with patch("switch_up.core.BACKUP_DIR", tmp_path / "backups"):
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
             backup = create_backup(sd)
         assert list(Path(backup).rglob("*")) == [] or all(
             p.is_dir() for p in Path(backup).rglob("*")
@@ -34,19 +50,36 @@ class TestCreateBackup:
 
     def test_backup_in_persistent_directory(self, fake_sd: Path, tmp_path: Path) -> None:
         backup_root = tmp_path / "backups"
-        with patch("switch_up.core.BACKUP_DIR", backup_root):
+        with patch("switch_up.backup.BACKUP_DIR", backup_root):
             backup = create_backup(fake_sd)
         assert str(backup).startswith(str(backup_root))
 
 
 class TestRestoreBackup:
     def test_restores_configs(self, fake_sd: Path, tmp_path: Path) -> None:
-        with patch("switch_up.core.BACKUP_DIR", tmp_path / "backups"):
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
             backup = create_backup(fake_sd)
         (fake_sd / "hekate_ipl.ini").write_text("autoboot=1\n")
         restore_backup(backup, fake_sd)
         assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
 
+    def test_restores_by_snapshot_id(self, fake_sd: Path, tmp_path: Path) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            backup = create_backup(fake_sd)
+            (fake_sd / "exosphere.ini").unlink()
+            restore_backup(backup.name, fake_sd)
+        assert (fake_sd / "exosphere.ini").read_text() == "log_enabled=1\n"
+
+    def test_restores_legacy_backup_directory(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        legacy = tmp_path / "backups" / "20250101_120000"
+        legacy.mkdir(parents=True)
+        (legacy / "hekate_ipl.ini").write_text("autoboot=2\n")
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            assert restore_backup(legacy, fake_sd) == 1
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=2\n"
+
 
 class TestSmartMerge:
     def test_merge_preserves_user_files(
@@ -77,11 +110,248 @@ class TestSmartMerge:
         smart_merge(src, fake_sd)
         assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=2\n"
 
+    def test_merge_records_touched_paths(self, fake_sd: Path, tmp_path: Path) -> None:
+        src = tmp_path / "update"
+        (src / "atmosphere" / "exefs_patches").mkdir(parents=True)
+        (src / "atmosphere" / "exefs_patches" / "p.ips").write_bytes(b"ips")
+
+        result = smart_merge(src, fake_sd)
+
+        assert result.files == [fake_sd / "atmosphere" / "exefs_patches" / "p.ips"]
+        assert result.dirs == {
+            fake_sd / "atmosphere",
+            fake_sd / "atmosphere" / "exefs_patches",
+        }
+
+    def test_writes_small_files_concurrently(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        src = tmp_path / "update"
+        files = {
+            f"atmosphere/contents/0100{i:012X}/exefs.nsp": bytes([i]) * (i * 100)
+            for i in range(40)
+        }
+        files["atmosphere/package3"] = b"\1" * 5000
+        for name, data in files.items():
+            (src / name).parent.mkdir(parents=True, exist_ok=True)
+            (src / name).write_bytes(data)
+
+        tuning = IOTuning(writers=4, small_file_limit=4096)
+        result = smart_merge(src, fake_sd, tuning)
+
+        assert len(result.files) == len(files)
+        for name, data in files.items():
+            assert (fake_sd / name).read_bytes() == data
+        assert (fake_sd / "atmosphere" / "contents" / "0100000000001000").is_dir()
+
+
+class TestStreamMerge:
+    def test_writes_members_to_final_paths(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        stream_merge(sample_zip, fake_sd)
+        assert (fake_sd / "atmosphere" / "package3").read_bytes() == b"new_package3_data"
+        assert (fake_sd / "bootloader" / "update.bin").read_bytes() == b"new_bootloader"
+
+    def test_preserves_user_files(self, fake_sd: Path, sample_zip: Path) -> None:
+        stream_merge(sample_zip, fake_sd)
+        user_mod = (
+            fake_sd / "atmosphere" / "contents"
+            / "0100000000001000" / "romfs" / "user_mod.txt"
+        )
+        assert user_mod.read_text() == "mi mod custom\n"
+
+    def test_rejects_paths_outside_destination(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        evil = tmp_path / "evil.zip"
+        with zipfile.ZipFile(evil, "w") as zf:
+            zf.writestr("../escaped.txt", b"nope")
+        with pytest.raises(ValueError, match="Unsafe path"):
+            stream_merge(evil, fake_sd)
+        assert not (fake_sd.parent / "escaped.txt").exists()
+
+    def test_skips_identical_files(self, fake_sd: Path, sample_zip: Path) -> None:
+        first = stream_merge(sample_zip, fake_sd)
+        second = stream_merge(sample_zip, fake_sd)
+        assert first.files_written == 2
+        assert second.files_written == 0
+        assert second.files_skipped == 2
+        assert second.bytes_skipped == first.bytes_written
+
+    def test_rewrites_changed_files(self, fake_sd: Path, sample_zip: Path) -> None:
+        stream_merge(sample_zip, fake_sd)
+        # Same size, different content: only the CRC can tell them apart
+        (fake_sd / "atmosphere" / "package3").write_bytes(b"old_package3_data")
+        result = stream_merge(sample_zip, fake_sd)
+        assert result.files_written == 1
+        assert result.bytes_written == len(b"new_package3_data")
+        assert (fake_sd / "atmosphere" / "package3").read_bytes() == b"new_package3_data"
+
+    def test_records_touched_paths(self, fake_sd: Path, sample_zip: Path) -> None:
+        result = stream_merge(sample_zip, fake_sd)
+        assert set(result.files) == {
+            fake_sd / "atmosphere" / "package3",
+            fake_sd / "bootloader" / "update.bin",
+        }
+        assert result.dirs == {fake_sd / "atmosphere", fake_sd / "bootloader"}
+
+    def test_skipped_files_are_not_touched(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        stream_merge(sample_zip, fake_sd)
+        result = stream_merge(sample_zip, fake_sd)
+        assert result.touched == []
+
+    def test_non_differential_rewrites_everything(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        stream_merge(sample_zip, fake_sd)
+        result = stream_merge(sample_zip, fake_sd, differential=False)
+        assert result.files_written == 2
+        assert result.files_skipped == 0
+
+
+def _zip(path: Path, members: dict) -> Path:
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path
+
+
+def _remote(data: bytes, body: Optional[bytes] = None) -> Tuple[RemoteZip, List[int]]:
+    """A RemoteZip serving data from memory, and a list of its downloads."""
+    downloads: List[int] = []
+
+    def open_stream() -> Iterator[bytes]:
+        downloads.append(1)
+        content = data if body is None else body
+        return (content[i : i + 100] for i in range(0, len(content), 100))
+
+    def fetch_range(start: int, end: int) -> bytes:
+        return data[start : end + 1]
+
+    return RemoteZip("b.zip", len(data), fetch_range, open_stream), downloads
+
+
+class TestStreamMergeSources:
+    def test_later_source_wins(self, fake_sd: Path, tmp_path: Path) -> None:
+        first = _zip(tmp_path / "a.zip", {"switch/shared.nro": b"a", "a.txt": b"a"})
+        second = _zip(tmp_path / "b.zip", {"switch/shared.nro": b"bb"})
+
+        results = stream_merge_sources([Source(first), Source(second)], fake_sd)
+
+        assert (fake_sd / "switch" / "shared.nro").read_bytes() == b"bb"
+        # The overridden copy is never written nor recorded for the first
+        assert [m[0] for m in results[0].members] == ["a.txt"]
+        assert [m[0] for m in results[1].members] == ["switch/shared.nro"]
+        assert results[0].files_written + results[1].files_written == 2
+
+    def test_installs_under_prefix(self, fake_sd: Path, tmp_path: Path) -> None:
+        package = _zip(tmp_path / "jksv.zip", {"JKSV/JKSV.nro": b"nro"})
+        (result,) = stream_merge_sources([Source(package, "switch")], fake_sd)
+        assert (fake_sd / "switch" / "JKSV" / "JKSV.nro").read_bytes() == b"nro"
+        assert result.members == [("switch/JKSV/JKSV.nro", 3, zipfile.crc32(b"nro"))]
+
+    def test_rejects_prefix_outside_destination(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        package = _zip(tmp_path / "p.zip", {"x": b"x"})
+        with pytest.raises(ValueError, match="Unsafe path"):
+            stream_merge_sources([Source(package, "../out")], fake_sd)
+
+    def test_failure_rolls_back_every_source(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        first = _zip(tmp_path / "a.zip", {"hekate_ipl.ini": b"new"})
+        second = _zip(tmp_path / "b.zip", {"atmosphere/package3": b"new"})
+        (fake_sd / "atmosphere" / "package3").mkdir(parents=True)
+
+        with pytest.raises(IsADirectoryError):
+            stream_merge_sources([Source(first), Source(second)], fake_sd)
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+
+    def test_remote_source_installs_while_downloading(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        local = _zip(tmp_path / "a.zip", {"a.txt": b"a"})
+        data = _zip(tmp_path / "b.zip", {"switch/b.nro": b"b" * 5000}).read_bytes()
+        remote, downloads = _remote(data)
+        sources = [Source(local), Source(Path("b.zip"), "x", remote=remote)]
+
+        results = stream_merge_sources(sources, fake_sd)
+        assert (fake_sd / "x" / "switch" / "b.nro").read_bytes() == b"b" * 5000
+        assert results[1].members == [
+            ("x/switch/b.nro", 5000, zipfile.crc32(b"b" * 5000))
+        ]
+        assert len(downloads) == 1
+
+        # Nothing to write: the archive is not downloaded again
+        stream_merge_sources(sources, fake_sd)
+        assert len(downloads) == 1
+
+    def test_bad_download_rolls_back(self, fake_sd: Path, tmp_path: Path) -> None:
+        data = _zip(tmp_path / "b.zip", {"hekate_ipl.ini": b"new"}).read_bytes()
+        remote, _ = _remote(data, body=data[:-10])
+        before = sorted(p.relative_to(fake_sd) for p in fake_sd.rglob("*"))
+
+        with pytest.raises(ValueError, match="Size mismatch"):
+            stream_merge_sources([Source(Path("b.zip"), remote=remote)], fake_sd)
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+        assert sorted(p.relative_to(fake_sd) for p in fake_sd.rglob("*")) == before
+
+
+class TestInstallPackages:
+    def test_one_pass_records_each_package(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        homebrew = _zip(tmp_path / "jksv.zip", {"JKSV.nro": b"nro"})
+        console = Console(record=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.core.clean_paths", return_value=0
+        ) as clean:
+            result = install_packages(
+                [
+                    Source(sample_zip, package="Atmosphere", version="1.8.0"),
+                    Source(homebrew, "switch/JKSV", "JKSV", "v1"),
+                ],
+                fake_sd,
+                console,
+                verify=True,
+            )
+
+        output = console.export_text()
+        assert result.files_written == 3
+        assert clean.call_count == 1
+        assert output.count("Backing up") == 1
+        assert "All 3 files match" in output
+        with StateIndex() as index:
+            card = read_card_id(fake_sd)
+            assert card is not None
+            versions = {p.package: p.version for p in index.packages(card)}
+            assert versions == {"Atmosphere": "1.8.0", "JKSV": "v1"}
+            assert set(index.files(card, "JKSV")) == {"switch/JKSV/JKSV.nro"}
+
+
+    def test_failed_writer_restores_backup(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        def broken_copy(src: Path, dst: Path, *args: object) -> int:
+            (fake_sd / "hekate_ipl.ini").write_text("corrupted")
+            raise OSError("card removed")
+
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.copier.copy_file", side_effect=broken_copy
+        ):
+            with pytest.raises(OSError, match="card removed"):
+                install_zip(sample_zip, fake_sd, Console(quiet=True), stream=False)
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+
 
 class TestInstallZip:
     def test_full_flow(self, fake_sd: Path, sample_zip: Path, tmp_path: Path) -> None:
         console = Console(quiet=True)
-        with patch("switch_up.core.BACKUP_DIR", tmp_path / "backups"):
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
             install_zip(sample_zip, fake_sd, console)
 
         assert (fake_sd / "atmosphere" / "package3").is_file()
@@ -92,3 +362,64 @@ class TestInstallZip:
             / "0100000000001000" / "romfs" / "user_mod.txt"
         )
         assert user_mod.is_file()
+
+    def test_extract_mode(self, fake_sd: Path, sample_zip: Path, tmp_path: Path) -> None:
+        console = Console(quiet=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            install_zip(sample_zip, fake_sd, console, stream=False)
+        assert (fake_sd / "atmosphere" / "package3").read_bytes() == b"new_package3_data"
+
+    def test_failed_stream_restores_backup(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        console = Console(quiet=True)
+
+        def broken_merge(sources: object, dst: Path, **kwargs: object) -> None:
+            (dst / "hekate_ipl.ini").write_text("corrupted")
+            raise OSError("card removed")
+
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.core.stream_merge_sources", side_effect=broken_merge
+        ):
+            with pytest.raises(OSError):
+                install_zip(sample_zip, fake_sd, console)
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+
+    def test_cleans_only_touched_paths(
+        self, fake_sd_with_junk: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        (fake_sd_with_junk / "Nintendo" / ".DS_Store").write_bytes(b"\x00")
+        (fake_sd_with_junk / "bootloader" / "._update.bin").write_bytes(b"\x00")
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.core.remove_xattrs_paths", return_value=XattrReport()
+        ) as xattrs:
+            install_zip(sample_zip, fake_sd_with_junk, Console(quiet=True))
+
+        assert not (fake_sd_with_junk / "bootloader" / "._update.bin").exists()
+        assert not (fake_sd_with_junk / "atmosphere" / ".DS_Store").exists()
+        assert (fake_sd_with_junk / "Nintendo" / ".DS_Store").exists()
+        assert fake_sd_with_junk / "Nintendo" not in xattrs.call_args[0][0]
+
+    def test_records_install_in_state_index(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            install_zip(
+                sample_zip, fake_sd, Console(quiet=True),
+                package="Atmosphere", version="1.8.0",
+            )
+        with StateIndex() as index:
+            files = index.files(read_card_id(fake_sd))
+        assert set(files) == {"atmosphere/package3", "bootloader/update.bin"}
+        assert files["atmosphere/package3"].version == "1.8.0"
+
+    def test_index_skips_unchanged_files_without_reading(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        console = Console(quiet=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            install_zip(sample_zip, fake_sd, console)
+            with patch("switch_up.planner.file_crc32") as crc:
+                result = install_zip(sample_zip, fake_sd, console)
+        crc.assert_not_called()
+        assert result.files_skipped == 2
@@ -0,0 +1,91 @@
+"""Tests for the fleet module."""
+
+import shutil
+from pathlib import Path
+from typing import Iterator, List
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from switch_up.backup import BackupStore
+from switch_up.fleet import install_fleet
+from switch_up.utils import extract_zip
+
+
+@pytest.fixture
+def cards(fake_sd: Path, tmp_path: Path) -> List[Path]:
+    """Three identical fake SD cards."""
+    result = []
+    for i in range(3):
+        card = tmp_path / f"card{i}"
+        shutil.copytree(fake_sd, card)
+        result.append(card)
+    return result
+
+
+@pytest.fixture(autouse=True)
+def isolated_backups(tmp_path: Path) -> Iterator[None]:
+    with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+        yield
+
+
+class TestInstallFleet:
+    def test_installs_to_every_card(self, cards: List[Path], sample_zip: Path) -> None:
+        results = install_fleet([sample_zip], cards, Console(quiet=True))
+
+        assert [r.sd_path for r in results] == cards
+        assert all(r.ok for r in results)
+        for card in cards:
+            assert (card / "atmosphere" / "package3").read_bytes() == b"new_package3_data"
+
+    def test_extracts_once_without_streaming(
+        self, cards: List[Path], sample_zip: Path
+    ) -> None:
+        extracted: List[Path] = []
+
+        def extract(zip_path: Path) -> Path:
+            extracted.append(extract_zip(zip_path))
+            return extracted[-1]
+
+        with patch("switch_up.fleet.extract_zip", side_effect=extract), patch(
+            "switch_up.core.extract_zip"
+        ) as per_card:
+            results = install_fleet(
+                [sample_zip], cards, Console(quiet=True), stream=False
+            )
+
+        assert all(r.ok for r in results), [r.error for r in results]
+        assert len(extracted) == 1
+        per_card.assert_not_called()
+        assert not extracted[0].exists()
+        for card in cards:
+            assert (card / "atmosphere" / "package3").read_bytes() == b"new_package3_data"
+
+    def test_failing_card_does_not_abort_others(
+        self, cards: List[Path], sample_zip: Path
+    ) -> None:
+        # A directory where the ZIP wants a file makes the write fail
+        (cards[1] / "atmosphere" / "package3").mkdir()
+
+        results = install_fleet([sample_zip], cards, Console(quiet=True), workers=2)
+
+        assert [r.ok for r in results] == [True, False, True]
+        assert results[1].error
+        assert (cards[2] / "bootloader" / "update.bin").is_file()
+
+    def test_reports_bytes_per_card(self, cards: List[Path], sample_zip: Path) -> None:
+        install_fleet([sample_zip], cards[:1], Console(quiet=True))
+        results = install_fleet([sample_zip], cards, Console(quiet=True))
+
+        assert results[0].bytes_written == 0
+        assert results[0].bytes_skipped > 0
+        assert results[1].bytes_written == results[0].bytes_skipped
+
+    def test_backups_do_not_collide(
+        self, cards: List[Path], sample_zip: Path, tmp_path: Path
+    ) -> None:
+        install_fleet([sample_zip], cards, Console(quiet=True))
+        snapshots = BackupStore(tmp_path / "backups").snapshots()
+        assert len({s.snapshot_id for s in snapshots}) == len(cards)
+        assert {s.sd_path for s in snapshots} == {str(c) for c in cards}
@@ -0,0 +1,367 @@
+"""Tests for the network module."""
+
+import io
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import patch
+
+import pytest
+import requests
+from rich.console import Console
+
+from switch_up.network import (
+    RateLimiter,
+    RateLimitError,
+    asset_sha256,
+    download_asset,
+    find_zip_asset,
+    find_zip_entry,
+    get_latest_release,
+    get_session,
+    remote_zip,
+)
+from tests.release_server import ReleaseServer
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+class TestFindZipAsset:
+    def test_returns_first_zip(self) -> None:
+        release = {
+            "assets": [
+                {"name": "fusee.bin", "browser_download_url": "https://x/fusee.bin"},
+                {"name": "ams.zip", "browser_download_url": "https://x/ams.zip"},
+            ]
+        }
+        assert find_zip_asset(release) == "https://x/ams.zip"
+
+    def test_none_without_zip(self) -> None:
+        assert find_zip_asset({"assets": []}) is None
+
+    def test_matches_pattern(self) -> None:
+        release = {
+            "assets": [
+                {"name": "nyx_usb.zip"},
+                {"name": "hekate_ctcaer_6.2.0_Nyx_1.6.0.zip"},
+            ]
+        }
+        asset = find_zip_entry(release, "hekate_ctcaer_*.zip")
+        assert asset == {"name": "hekate_ctcaer_6.2.0_Nyx_1.6.0.zip"}
+        assert find_zip_entry(release, "JKSV.zip") is None
+
+
+class TestAssetSha256:
+    def test_parses_digest(self) -> None:
+        assert asset_sha256({"digest": "sha256:ABC"}) == "abc"
+
+    def test_missing_or_other_algorithm(self) -> None:
+        assert asset_sha256({}) is None
+        assert asset_sha256({"digest": "md5:abc"}) is None
+
+
+class TestSession:
+    def test_session_is_shared(self) -> None:
+        assert get_session() is get_session()
+
+    def test_latest_release(self, release_server: ReleaseServer) -> None:
+        release_server.add_release("Atmosphere-NX/Atmosphere", {"tag_name": "1.8.0"})
+        with patch("switch_up.network.GITHUB_API", release_server.url):
+            release = get_latest_release("Atmosphere-NX/Atmosphere")
+        assert release["tag_name"] == "1.8.0"
+
+
+@pytest.fixture
+def rate_limiter() -> Iterator[RateLimiter]:
+    """A fresh limiter, so pauses do not leak into other tests."""
+    limiter = RateLimiter()
+    with patch("switch_up.network._rate_limiter", limiter):
+        yield limiter
+
+
+class TestRateLimit:
+    def test_retries_after_rate_limit(
+        self, release_server: ReleaseServer, rate_limiter: RateLimiter
+    ) -> None:
+        release_server.add_release("CTCaer/hekate", {"tag_name": "v6.2"})
+        release_server.rate_limit(2)
+        with patch("switch_up.network.GITHUB_API", release_server.url):
+            release = get_latest_release("CTCaer/hekate")
+        assert release["tag_name"] == "v6.2"
+        assert len(release_server.requests) == 3
+
+    def test_long_reset_raises(
+        self, release_server: ReleaseServer, rate_limiter: RateLimiter
+    ) -> None:
+        release_server.add_release("CTCaer/hekate", {"tag_name": "v6.2"})
+        release_server.rate_limit(1, retry_after=3600)
+        with patch("switch_up.network.GITHUB_API", release_server.url):
+            with pytest.raises(RateLimitError, match="60 minutes"):
+                get_latest_release("CTCaer/hekate")
+            # Later calls do not even try until the limit resets
+            with pytest.raises(RateLimitError):
+                get_latest_release("CTCaer/hekate")
+        assert len(release_server.requests) == 1
+
+    def test_retries_after_secondary_rate_limit(
+        self, release_server: ReleaseServer, rate_limiter: RateLimiter
+    ) -> None:
+        release_server.add_release("CTCaer/hekate", {"tag_name": "v6.2"})
+        release_server.rate_limit(1, retry_after=1, status=429)
+        with patch("switch_up.network.GITHUB_API", release_server.url):
+            started = time.monotonic()
+            release = get_latest_release("CTCaer/hekate")
+        assert release["tag_name"] == "v6.2"
+        assert time.monotonic() - started >= 1
+        assert len(release_server.requests) == 2
+
+    def test_long_secondary_rate_limit_raises(
+        self, release_server: ReleaseServer, rate_limiter: RateLimiter
+    ) -> None:
+        release_server.add_release("CTCaer/hekate", {"tag_name": "v6.2"})
+        release_server.rate_limit(1, retry_after=3600, status=429)
+        with patch("switch_up.network.GITHUB_API", release_server.url):
+            with pytest.raises(RateLimitError, match="60 minutes"):
+                get_latest_release("CTCaer/hekate")
+        # Not retried (nor slept on) by the session itself
+        assert len(release_server.requests) == 1
+
+    def test_observe_reads_github_headers(self) -> None:
+        limiter = RateLimiter()
+        response = requests.Response()
+        response.headers["X-RateLimit-Remaining"] = "12"
+        assert limiter.observe(response) is None
+
+        response.headers["X-RateLimit-Remaining"] = "0"
+        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 30)
+        delay = limiter.observe(response)
+        assert delay is not None and 28 <= delay <= 30
+
+    def test_caps_concurrent_calls(self) -> None:
+        limiter = RateLimiter(concurrency=2)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def call() -> None:
+            with limiter.slot():
+                with lock:
+                    running.append(1)
+                    peak.append(len(running))
+                time.sleep(0.02)
+                with lock:
+                    running.pop()
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: call(), range(16)))
+        assert max(peak) == 2
+
+
+class TestDownloadAsset:
+    def test_downloads_file(self, release_server: ReleaseServer, tmp_path: Path) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        path = download_asset(url, tmp_path, Console(quiet=True))
+        assert path == tmp_path / "ams.zip"
+        assert path.read_bytes() == PAYLOAD
+        assert not (tmp_path / "ams.zip.part").exists()
+
+    def test_resumes_after_disconnect(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD, drop_after=300_000)
+        path = download_asset(url, tmp_path, Console(quiet=True))
+
+        assert path.read_bytes() == PAYLOAD
+        ranges = [r["range"] for r in release_server.requests]
+        assert ranges[0] is None
+        # Resumed from whatever reached the .part file before the drop
+        resumed_from = int(ranges[1].split("=")[1].rstrip("-"))
+        assert 0 < resumed_from <= 300_000
+
+    def test_resumes_leftover_part_file(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        (tmp_path / "ams.zip.part").write_bytes(PAYLOAD[:1000])
+
+        path = download_asset(url, tmp_path, Console(quiet=True))
+
+        assert path.read_bytes() == PAYLOAD
+        assert release_server.requests[0]["range"] == "bytes=1000-"
+
+    def test_complete_part_file_is_finished(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        (tmp_path / "ams.zip.part").write_bytes(PAYLOAD)
+        path = download_asset(url, tmp_path, Console(quiet=True))
+        assert path.read_bytes() == PAYLOAD
+
+    def test_restarts_when_server_ignores_ranges(self, tmp_path: Path) -> None:
+        server = ReleaseServer(ranges=False).start()
+        try:
+            url = server.add_file("/ams.zip", PAYLOAD, drop_after=300_000)
+            path = download_asset(url, tmp_path, Console(quiet=True))
+        finally:
+            server.stop()
+        assert path.read_bytes() == PAYLOAD
+
+
+class TestDownloadAssetCache:
+    def test_second_download_is_served_from_cache(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        console = Console(quiet=True)
+        with patch("switch_up.cache.CACHE_DIR", tmp_path / "cache"):
+            first = download_asset(url, tmp_path / "a", console, asset_id=7)
+            second = download_asset(url, tmp_path / "b", console, asset_id=7)
+
+        assert len(release_server.requests) == 1
+        assert first == second
+        assert second.read_bytes() == PAYLOAD
+        assert not (tmp_path / "cache" / "partial" / "7").exists()
+
+    def test_checksum_mismatch_raises(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", b"tampered")
+        with patch("switch_up.cache.CACHE_DIR", tmp_path / "cache"):
+            with pytest.raises(ValueError, match="Checksum mismatch"):
+                download_asset(
+                    url, tmp_path, Console(quiet=True), asset_id=7, sha256="0" * 64
+                )
+        assert not (tmp_path / "cache" / "assets").exists()
+
+    def test_no_cache_without_asset_id(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        with patch("switch_up.cache.CACHE_DIR", tmp_path / "cache"):
+            path = download_asset(url, tmp_path / "dl", Console(quiet=True))
+        assert path == tmp_path / "dl" / "ams.zip"
+        assert not (tmp_path / "cache").exists()
+
+
+@pytest.fixture
+def small_segments() -> Iterator[None]:
+    """Split PAYLOAD into four 256 KiB segments."""
+    with patch("switch_up.network.MIN_SEGMENT_SIZE", 256 * 1024):
+        yield
+
+
+@pytest.mark.usefixtures("small_segments")
+class TestSegmentedDownload:
+    def test_fetches_ranges_in_parallel(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        path = download_asset(url, tmp_path, Console(quiet=True), size=len(PAYLOAD))
+
+        assert path.read_bytes() == PAYLOAD
+        assert sorted(r["range"] for r in release_server.requests) == [
+            "bytes=0-262143",
+            "bytes=262144-524287",
+            "bytes=524288-786431",
+            "bytes=786432-1048575",
+        ]
+        assert not (tmp_path / "ams.zip.segments").exists()
+
+    def test_resumes_dropped_segment(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD, drop_after=100_000)
+        path = download_asset(url, tmp_path, Console(quiet=True), size=len(PAYLOAD))
+        assert path.read_bytes() == PAYLOAD
+        assert len(release_server.requests) == 5
+
+    def test_single_stream_without_range_support(self, tmp_path: Path) -> None:
+        server = ReleaseServer(ranges=False).start()
+        try:
+            url = server.add_file("/ams.zip", PAYLOAD)
+            path = download_asset(url, tmp_path, Console(quiet=True), size=len(PAYLOAD))
+        finally:
+            server.stop()
+        assert path.read_bytes() == PAYLOAD
+        assert server.requests[-1]["range"] is None
+        assert not (tmp_path / "ams.zip.segments").exists()
+
+    def test_small_asset_is_one_stream(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD[:1000])
+        download_asset(url, tmp_path, Console(quiet=True), size=1000)
+        assert [r["range"] for r in release_server.requests] == [None]
+
+    def test_published_size_mismatch_raises(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        with pytest.raises(ValueError, match="Size mismatch"):
+            download_asset(url, tmp_path, Console(quiet=True), size=len(PAYLOAD) + 1)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_checksum_validated_after_assembly(
+        self, release_server: ReleaseServer, tmp_path: Path
+    ) -> None:
+        url = release_server.add_file("/ams.zip", PAYLOAD)
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            download_asset(
+                url,
+                tmp_path,
+                Console(quiet=True),
+                sha256="0" * 64,
+                size=len(PAYLOAD),
+            )
+
+
+def _zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+class TestRemoteZip:
+    MEMBERS = {"atmosphere/package3": PAYLOAD, "hekate_ipl.ini": b"autoboot=0\n"}
+
+    def _asset(self, url: str, data: bytes) -> dict:
+        return {"name": "ams.zip", "browser_download_url": url, "size": len(data)}
+
+    def test_reads_tail_then_streams_body(self, release_server: ReleaseServer) -> None:
+        data = _zip_bytes(self.MEMBERS)
+        url = release_server.add_file("/ams.zip", data)
+        remote = remote_zip(self._asset(url, data))
+
+        infos = remote.infolist()
+        assert release_server.requests[0]["range"].endswith(f"-{len(data) - 1}")
+        contents = {info.filename: f.read() for info, f in remote.members(infos)}
+        assert contents == self.MEMBERS
+        assert [r["range"] for r in release_server.requests[1:]] == [None]
+
+    def test_resumes_dropped_stream(self, release_server: ReleaseServer) -> None:
+        data = _zip_bytes(self.MEMBERS)
+        url = release_server.add_file("/ams.zip", data)
+        remote = remote_zip(self._asset(url, data))
+        infos = remote.infolist()
+
+        release_server.drop_after["/ams.zip"] = len(data) // 2
+        contents = {info.filename: f.read() for info, f in remote.members(infos)}
+        assert contents == self.MEMBERS
+        ranges = [r["range"] for r in release_server.requests[1:]]
+        assert ranges[0] is None
+        assert 0 < int(ranges[1].split("=")[1].rstrip("-")) <= len(data) // 2
+
+    def test_without_range_support(self) -> None:
+        server = ReleaseServer(ranges=False).start()
+        try:
+            data = _zip_bytes(self.MEMBERS)
+            url = server.add_file("/ams.zip", data)
+            with pytest.raises(ValueError, match="does not support Range"):
+                remote_zip(self._asset(url, data)).infolist()
+        finally:
+            server.stop()
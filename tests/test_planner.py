@@ -0,0 +1,152 @@
+"""Tests for the planner module."""
+
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from switch_up.core import Source, install_packages
+from switch_up.planner import (
+    CREATE,
+    DEFAULT_THROUGHPUT,
+    OVERWRITE,
+    SKIP,
+    card_throughput,
+    measure_throughput,
+    plan_install,
+    plan_merge,
+)
+from switch_up.copier import IOTuning
+from switch_up.state import CardProbe, StateIndex, Throughput, card_id
+
+
+def _zip(path: Path, members: dict) -> Path:
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path
+
+
+def _actions(plan) -> dict:
+    return {f.target.relative_to(plan.dst).as_posix(): f.action for f in plan.files}
+
+
+class TestPlanMerge:
+    def test_classifies_every_file(self, fake_sd: Path, tmp_path: Path) -> None:
+        package = _zip(
+            tmp_path / "ams.zip",
+            {
+                "hekate_ipl.ini": b"autoboot=0\n",
+                "exosphere.ini": b"log_enabled=0\n",
+                "atmosphere/package3": b"new",
+            },
+        )
+        plan = plan_merge([Source(package)], fake_sd)
+
+        assert _actions(plan) == {
+            "hekate_ipl.ini": SKIP,
+            "exosphere.ini": OVERWRITE,
+            "atmosphere/package3": CREATE,
+        }
+        assert plan.count(SKIP) == 1
+        assert plan.bytes(CREATE) == 3
+        assert [f.action for f in plan.writes] == [OVERWRITE, CREATE]
+
+    def test_changes_nothing(self, fake_sd: Path, tmp_path: Path) -> None:
+        before = sorted(fake_sd.rglob("*"))
+        package = _zip(tmp_path / "ams.zip", {"atmosphere/package3": b"new"})
+        plan_install([Source(package)], fake_sd)
+        assert sorted(fake_sd.rglob("*")) == before
+
+    def test_lists_junk_the_cleanup_deletes(
+        self, fake_sd_with_junk: Path, tmp_path: Path
+    ) -> None:
+        package = _zip(
+            tmp_path / "ams.zip",
+            {"atmosphere/package3": b"new", "atmosphere/._package3": b"\0"},
+        )
+        plan = plan_merge([Source(package)], fake_sd_with_junk)
+        junk = {p.relative_to(fake_sd_with_junk).as_posix() for p in plan.junk}
+        # The junk around written paths, not the rest of the card's
+        assert junk == {"atmosphere/._package3", "atmosphere/.DS_Store"}
+
+    def test_file_over_directory_raises(self, fake_sd: Path, tmp_path: Path) -> None:
+        package = _zip(tmp_path / "ams.zip", {"atmosphere/contents": b"x"})
+        with pytest.raises(IsADirectoryError):
+            plan_merge([Source(package)], fake_sd)
+
+
+class TestPlanExecution:
+    def test_install_carries_out_the_plan(self, fake_sd: Path, tmp_path: Path) -> None:
+        package = _zip(tmp_path / "ams.zip", {"atmosphere/package3": b"new"})
+        sources = [Source(package)]
+        plan = plan_install(sources, fake_sd)
+
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.core.plan_merge"
+        ) as replan:
+            result = install_packages(sources, fake_sd, Console(quiet=True), plan=plan)
+
+        replan.assert_not_called()
+        assert result.files_written == 1
+        assert (fake_sd / "atmosphere" / "package3").read_bytes() == b"new"
+
+    def test_plan_needs_streaming(self, fake_sd: Path, tmp_path: Path) -> None:
+        package = _zip(tmp_path / "ams.zip", {"atmosphere/package3": b"new"})
+        plan = plan_install([Source(package)], fake_sd)
+        with pytest.raises(ValueError, match="streaming"):
+            install_packages(
+                [Source(package)], fake_sd, Console(quiet=True), stream=False, plan=plan
+            )
+
+
+class TestThroughput:
+    def test_measures_rate_and_cost_per_file(self) -> None:
+        mib = 1024 * 1024
+        # 10 MiB/s; small files take 10 ms more than their bytes
+        times = [(8 * mib, 0.8), (2 * mib, 0.2), (1000, 0.0101), (3000, 0.0103)]
+        measured = measure_throughput(times)
+        assert measured is not None
+        assert measured.bytes_per_second == pytest.approx(10 * mib, rel=0.01)
+        assert measured.seconds_per_file == pytest.approx(0.01, rel=0.01)
+
+    def test_needs_large_and_small_files(self) -> None:
+        assert measure_throughput([(1000, 0.01)]) is None
+        assert measure_throughput([(8 * 1024 * 1024, 0.8)]) is None
+
+    def test_averages_with_previous(self) -> None:
+        mib = 1024 * 1024
+        previous = Throughput(20 * mib, 0.02)
+        measured = measure_throughput([(10 * mib, 1.0), (0, 0.0)], previous)
+        assert measured is not None
+        assert measured.bytes_per_second == pytest.approx(15 * mib)
+        assert measured.seconds_per_file == pytest.approx(0.01)
+
+    def test_install_records_card_throughput(
+        self, fake_sd: Path, tmp_path: Path
+    ) -> None:
+        assert card_throughput(fake_sd) == DEFAULT_THROUGHPUT
+        package = _zip(
+            tmp_path / "ams.zip",
+            {"atmosphere/package3": b"\1" * (2 * 1024 * 1024), "a.ini": b"a"},
+        )
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            install_packages([Source(package)], fake_sd, Console(quiet=True))
+
+        measured = card_throughput(fake_sd)
+        assert measured.measured_at is not None
+        with StateIndex() as index:
+            assert index.throughput(card_id(fake_sd)) == measured
+
+    def test_probed_card_is_estimated_from_its_probe(self, fake_sd: Path) -> None:
+        probe = CardProbe(20e6, 50.0, 40e6, IOTuning(), measured_at=1000.0)
+        with StateIndex() as index:
+            index.record_probe(card_id(fake_sd), probe)
+        assert card_throughput(fake_sd) == Throughput(20e6, 0.02, 1000.0)
+
+    def test_estimate(self, fake_sd: Path, tmp_path: Path) -> None:
+        package = _zip(tmp_path / "ams.zip", {"a": b"\0" * 1000, "b": b"\0" * 1000})
+        plan = plan_merge([Source(package)], fake_sd)
+        assert plan.estimate(Throughput(1000, 0.5)) == pytest.approx(3.0)
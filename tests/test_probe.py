@@ -0,0 +1,85 @@
+"""Tests for the probe module."""
+
+from pathlib import Path
+from unittest.mock import patch
+
+from rich.console import Console
+
+from switch_up.copier import DEFAULT_TUNING, SYNC_ALL_NEVER, FileWriter, IOTuning
+from switch_up.core import install_zip
+from switch_up.probe import (
+    BUFFER_SIZES,
+    MAX_SYNC_ALL,
+    MIN_SYNC_ALL,
+    PROBE_DIR_PREFIX,
+    WRITER_COUNTS,
+    card_tuning,
+    probe_card,
+    sync_all_threshold,
+)
+from switch_up.state import CardProbe, StateIndex, card_id
+
+
+class TestProbeCard:
+    def test_measures_and_cleans_up(self, fake_sd: Path) -> None:
+        before = sorted(fake_sd.rglob("*"))
+        result = probe_card(fake_sd, size=64 * 1024, files=8)
+
+        assert sorted(fake_sd.rglob("*")) == before
+        assert not list(fake_sd.glob(PROBE_DIR_PREFIX + "*"))
+        assert result.sequential_write > 0
+        assert result.small_files > 0
+        assert result.read_back > 0
+        assert result.measured_at is not None
+        assert result.tuning.buffer_size in BUFFER_SIZES
+        assert result.tuning.writers in WRITER_COUNTS
+        assert MIN_SYNC_ALL <= result.tuning.sync_all_threshold <= MAX_SYNC_ALL
+
+    def test_skips_sync_where_it_does_not_wait(self, fake_sd: Path) -> None:
+        with patch("switch_up.copier.sys.platform", "darwin"), patch(
+            "switch_up.probe.os.sync", create=True
+        ) as sync:
+            result = probe_card(fake_sd, size=1024, files=2)
+        sync.assert_not_called()
+        assert result.tuning.sync_all_threshold == SYNC_ALL_NEVER
+
+    def test_cleans_up_after_a_failure(self, fake_sd: Path) -> None:
+        with patch("switch_up.probe._read_back", side_effect=OSError("unplugged")):
+            try:
+                probe_card(fake_sd, size=1024, files=2)
+            except OSError:
+                pass
+        assert not list(fake_sd.glob(PROBE_DIR_PREFIX + "*"))
+
+
+class TestSyncAllThreshold:
+    def test_from_the_cost_of_sync_and_fsync(self) -> None:
+        assert sync_all_threshold(0.5, 0.01) == 50
+        assert sync_all_threshold(0.001, 0.01) == MIN_SYNC_ALL
+        assert sync_all_threshold(100.0, 0.001) == MAX_SYNC_ALL
+        assert sync_all_threshold(0.5, 0.0) == MAX_SYNC_ALL
+
+    def test_off_where_sync_does_not_wait(self) -> None:
+        assert sync_all_threshold(None, 0.01) == SYNC_ALL_NEVER
+
+
+class TestCardTuning:
+    def test_default_until_probed(self, fake_sd: Path) -> None:
+        assert card_tuning(fake_sd) == DEFAULT_TUNING
+        tuning = IOTuning(buffer_size=1024 * 1024, writers=2, sync_all_threshold=64)
+        with StateIndex() as index:
+            index.record_probe(card_id(fake_sd), CardProbe(1e6, 100, 2e6, tuning))
+        assert card_tuning(fake_sd) == tuning
+
+    def test_install_uses_the_card_tuning(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        tuning = IOTuning(buffer_size=64 * 1024, writers=2, sync_all_threshold=64)
+        with StateIndex() as index:
+            index.record_probe(card_id(fake_sd), CardProbe(1e6, 100, 2e6, tuning))
+
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.core.FileWriter", wraps=FileWriter
+        ) as writer:
+            install_zip(sample_zip, fake_sd, Console(quiet=True))
+        writer.assert_called_once_with(tuning)
@@ -0,0 +1,78 @@
+"""Tests for the profiling module."""
+
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from switch_up import profiling
+from switch_up.profiling import phase
+
+
+@pytest.fixture(autouse=True)
+def profiling_off() -> Iterator[None]:
+    yield
+    profiling.disable()
+
+
+class TestPhase:
+    def test_disabled_records_nothing(self) -> None:
+        assert phase("merge") is phase("clean")
+        with phase("merge") as p:
+            p.add(bytes=10, files=1)
+        profiler = profiling.enable()
+        assert profiler.events == []
+
+    def test_records_counters_and_nesting(self) -> None:
+        profiler = profiling.enable()
+        with phase("install", zip="ams.zip"):
+            with phase("merge") as p:
+                p.add(bytes=100, files=2)
+                p.add(bytes=50, files=1)
+        assert profiling.disable() is profiler
+
+        merge, install = profiler.events
+        assert (merge.name, merge.bytes, merge.files) == ("merge", 150, 3)
+        assert install.args == {"zip": "ams.zip"}
+        assert install.start_ns <= merge.start_ns <= merge.end_ns <= install.end_ns
+
+    def test_failed_phase_is_recorded(self) -> None:
+        profiler = profiling.enable()
+        with pytest.raises(OSError):
+            with phase("download"):
+                raise OSError("reset")
+        assert profiler.events[0].args["error"] == "OSError"
+
+    def test_summary_adds_up_threads(self) -> None:
+        profiler = profiling.enable()
+
+        def work() -> None:
+            with phase("download") as p:
+                p.add(bytes=1000, files=1)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        (download,) = profiler.summary()
+        assert (download.calls, download.bytes, download.files) == (4, 4000, 4)
+
+
+class TestChromeTrace:
+    def test_complete_events_and_thread_names(self, tmp_path: Path) -> None:
+        profiler = profiling.enable()
+        with phase("extract") as p:
+            p.add(files=3)
+        trace = profiler.chrome_trace()["traceEvents"]
+
+        event = next(e for e in trace if e["ph"] == "X")
+        assert event["name"] == "extract"
+        assert event["args"]["files"] == 3
+        assert event["dur"] >= 0
+        names = [e for e in trace if e["ph"] == "M"]
+        assert names[0]["args"]["name"] == threading.current_thread().name
+
+        profiler.write_trace(tmp_path / "trace.json")
+        assert (tmp_path / "trace.json").read_text().startswith('{"traceEvents"')
@@ -0,0 +1,66 @@
+"""Tests for the registry module."""
+
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from switch_up.registry import DEFAULT_PACKAGES, Package, load_registry
+
+
+def _write(path: Path, entries: List[object]) -> Path:
+    path.write_text(json.dumps(entries))
+    return path
+
+
+class TestLoadRegistry:
+    def test_defaults_without_file(self) -> None:
+        assert load_registry() == DEFAULT_PACKAGES
+
+    def test_reads_packages_in_order(self, tmp_path: Path) -> None:
+        path = _write(
+            tmp_path / "packages.json",
+            [
+                {"name": "Hekate", "repo": "CTCaer/hekate"},
+                {
+                    "name": "JKSV",
+                    "repo": "J-D-K/JKSV",
+                    "asset": "JKSV*.zip",
+                    "prefix": "/switch/",
+                },
+            ],
+        )
+        assert load_registry(path) == [
+            Package("Hekate", "CTCaer/hekate", "*.zip", ""),
+            Package("JKSV", "J-D-K/JKSV", "JKSV*.zip", "switch"),
+        ]
+
+    @pytest.mark.parametrize(
+        "entries, message",
+        [
+            ({"name": "JKSV"}, "expected a list"),
+            ([{"name": "JKSV"}], "repo is required"),
+            ([{"name": "JKSV", "repo": "JKSV"}], "owner/name"),
+            ([{"name": "A", "repo": "a/b", "url": "x"}], "unknown fields url"),
+            ([{"name": "A", "repo": "a/b", "prefix": 3}], "must be a string"),
+            ([{"name": "A", "repo": "a/b", "prefix": "../x"}], "inside the SD"),
+            (
+                [{"name": "A", "repo": "a/b"}, {"name": "A", "repo": "c/d"}],
+                "Duplicate package",
+            ),
+        ],
+    )
+    def test_rejects_invalid_registry(
+        self, tmp_path: Path, entries: object, message: str
+    ) -> None:
+        path = tmp_path / "packages.json"
+        path.write_text(json.dumps(entries))
+        with pytest.raises(ValueError, match=message):
+            load_registry(path)
+
+    def test_rejects_invalid_json(self, tmp_path: Path) -> None:
+        path = tmp_path / "packages.json"
+        path.write_text("[{")
+        with pytest.raises(ValueError, match="Invalid package registry"):
+            load_registry(path)
@@ -0,0 +1,99 @@
+"""Tests for the state module."""
+
+import os
+from pathlib import Path
+
+from switch_up.copier import IOTuning
+from switch_up.state import (
+    CARD_ID_FILE,
+    CardProbe,
+    StateIndex,
+    card_id,
+    is_intact,
+    read_card_id,
+)
+
+
+class TestCardId:
+    def test_created_once_and_reused(self, fake_sd: Path) -> None:
+        assert read_card_id(fake_sd) is None
+        first = card_id(fake_sd)
+        assert (fake_sd / CARD_ID_FILE).is_file()
+        assert card_id(fake_sd) == first
+        assert read_card_id(fake_sd) == first
+
+    def test_distinct_cards_get_distinct_ids(self, tmp_path: Path) -> None:
+        a, b = tmp_path / "a", tmp_path / "b"
+        a.mkdir()
+        b.mkdir()
+        assert card_id(a) != card_id(b)
+
+
+class TestStateIndex:
+    def test_records_installed_files(self, fake_sd: Path) -> None:
+        card = card_id(fake_sd)
+        with StateIndex() as index:
+            count = index.record_install(
+                card, fake_sd, "Atmosphere", "1.8.0",
+                [("hekate_ipl.ini", 11, 123), ("missing.bin", 1, 1)],
+            )
+            files = index.files(card)
+            packages = index.packages(card)
+
+        assert count == 1
+        record = files["hekate_ipl.ini"]
+        assert record.crc == 123
+        assert record.mtime_ns == os.stat(fake_sd / "hekate_ipl.ini").st_mtime_ns
+        assert [(p.package, p.version) for p in packages] == [("Atmosphere", "1.8.0")]
+
+    def test_reinstall_replaces_package_files(self, fake_sd: Path) -> None:
+        card = card_id(fake_sd)
+        with StateIndex() as index:
+            index.record_install(card, fake_sd, "Hekate", "v6.1", [("hekate_ipl.ini", 11, 1)])
+            index.record_install(card, fake_sd, "Hekate", "v6.2", [("exosphere.ini", 14, 2)])
+            files = index.files(card, package="Hekate")
+            packages = index.packages(card)
+
+        assert list(files) == ["exosphere.ini"]
+        assert packages[0].version == "v6.2"
+
+    def test_cards_are_kept_apart(self, fake_sd: Path) -> None:
+        with StateIndex() as index:
+            index.record_install("card-a", fake_sd, "Hekate", None, [("hekate_ipl.ini", 11, 1)])
+            assert index.files("card-b") == {}
+
+    def test_persists_across_connections(self, fake_sd: Path, tmp_path: Path) -> None:
+        db = tmp_path / "other.db"
+        with StateIndex(db) as index:
+            index.record_install("card", fake_sd, "Hekate", None, [("hekate_ipl.ini", 11, 1)])
+        with StateIndex(db) as index:
+            assert "hekate_ipl.ini" in index.files("card")
+
+    def test_records_probes(self) -> None:
+        probe = CardProbe(20e6, 50.0, 40e6, IOTuning(1024 * 1024, 4, 128), 1000.0)
+        with StateIndex() as index:
+            assert index.probe("card") is None
+            index.record_probe("card", probe)
+            assert index.probe("card") == probe
+            assert index.probe("other") is None
+        assert probe.throughput().seconds(20_000_000, 50) == 2.0
+
+
+class TestIsIntact:
+    def _record(self, fake_sd: Path) -> object:
+        with StateIndex() as index:
+            index.record_install("card", fake_sd, "Hekate", None, [("hekate_ipl.ini", 11, 1)])
+            return index.files("card")["hekate_ipl.ini"]
+
+    def test_unchanged_file(self, fake_sd: Path) -> None:
+        assert is_intact(self._record(fake_sd), fake_sd)
+
+    def test_modified_file(self, fake_sd: Path) -> None:
+        record = self._record(fake_sd)
+        (fake_sd / "hekate_ipl.ini").write_text("autoboot=1\nextra\n")
+        assert not is_intact(record, fake_sd)
+
+    def test_missing_file(self, fake_sd: Path) -> None:
+        record = self._record(fake_sd)
+        (fake_sd / "hekate_ipl.ini").unlink()
+        assert not is_intact(record, fake_sd)
@@ -0,0 +1,124 @@
+"""Tests for the transaction module."""
+
+import os
+from pathlib import Path
+from typing import Callable, List
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from switch_up.copier import copy_stream, write_file
+from switch_up.core import install_zip, stream_merge
+from switch_up.transaction import (
+    COMMITTED,
+    COMMITTING,
+    JOURNAL_FILE,
+    Transaction,
+    recover,
+)
+
+
+def _leftovers(root: Path) -> List[str]:
+    return sorted(
+        p.relative_to(root).as_posix()
+        for p in root.rglob("*")
+        if p.name.endswith((".switch-up-new", ".switch-up-old"))
+        or p.name == JOURNAL_FILE
+    )
+
+
+def _stage(sd: Path, contents: dict) -> Transaction:
+    transaction = Transaction(sd, [sd / relpath for relpath in contents])
+    transaction.begin()
+    for relpath, data in contents.items():
+        target = sd / relpath
+        target.parent.mkdir(parents=True, exist_ok=True)
+        transaction.staged(target).write_bytes(data)
+    return transaction
+
+
+class TestTransaction:
+    def test_commit_swaps_files_in(self, fake_sd: Path) -> None:
+        transaction = _stage(
+            fake_sd, {"hekate_ipl.ini": b"autoboot=1\n", "new/file.bin": b"x"}
+        )
+        transaction.commit()
+        assert (fake_sd / "hekate_ipl.ini").read_bytes() == b"autoboot=1\n"
+        assert (fake_sd / "new" / "file.bin").read_bytes() == b"x"
+        assert _leftovers(fake_sd) == []
+
+    def test_rollback_before_commit(self, fake_sd: Path) -> None:
+        transaction = _stage(
+            fake_sd, {"hekate_ipl.ini": b"autoboot=1\n", "new/file.bin": b"x"}
+        )
+        transaction.rollback()
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+        assert not (fake_sd / "new").exists()
+        assert _leftovers(fake_sd) == []
+
+    def test_recovers_interrupted_commit(self, fake_sd: Path) -> None:
+        transaction = _stage(
+            fake_sd, {"exosphere.ini": b"log_enabled=0\n", "hekate_ipl.ini": b"new"}
+        )
+        # Power lost after swapping in only the first file
+        transaction._write_journal(COMMITTING)
+        target = fake_sd / "exosphere.ini"
+        os.replace(target, transaction.preserved(target))
+        os.replace(transaction.staged(target), target)
+
+        recovered = recover(fake_sd)
+        assert recovered is not None and recovered.state == COMMITTING
+        assert target.read_text() == "log_enabled=1\n"
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+        assert _leftovers(fake_sd) == []
+        assert recover(fake_sd) is None
+
+    def test_recover_finishes_committed_install(self, fake_sd: Path) -> None:
+        transaction = _stage(fake_sd, {"hekate_ipl.ini": b"autoboot=1\n"})
+        with patch.object(Transaction, "finish"):
+            transaction.commit()
+        assert transaction.state == COMMITTED
+
+        recover(fake_sd)
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=1\n"
+        assert _leftovers(fake_sd) == []
+
+
+class TestTransactionalMerge:
+    def test_failed_merge_leaves_card_untouched(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        (fake_sd / "atmosphere" / "package3").write_bytes(b"old_package3")
+        calls = []
+
+        def failing(real: Callable[..., int]) -> Callable[..., int]:
+            def write(*args: object, **kwargs: object) -> int:
+                calls.append(args)
+                if len(calls) == 2:
+                    raise OSError("card removed")
+                return real(*args, **kwargs)
+
+            return write
+
+        # Small files are written by the writer threads, large ones inline
+        with patch("switch_up.core.copy_stream", failing(copy_stream)), patch(
+            "switch_up.copier.write_file", failing(write_file)
+        ):
+            with pytest.raises(OSError):
+                stream_merge(sample_zip, fake_sd)
+
+        assert (fake_sd / "atmosphere" / "package3").read_bytes() == b"old_package3"
+        assert not (fake_sd / "bootloader" / "update.bin").exists()
+        assert _leftovers(fake_sd) == []
+
+    def test_install_recovers_previous_run(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        _stage(fake_sd, {"hekate_ipl.ini": b"half-written"})
+        console = Console(record=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            install_zip(sample_zip, fake_sd, console)
+        assert "interrupted install was rolled back" in console.export_text()
+        assert (fake_sd / "hekate_ipl.ini").read_text() == "autoboot=0\n"
+        assert _leftovers(fake_sd) == []
@@ -2,10 +2,21 @@
 
 import zipfile
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
-from switch_up.utils import detect_sd_path, extract_zip, resolve_sd_path
+from switch_up.utils import (
+    VOLUMES_DIR,
+    default_mount_root,
+    detect_sd_path,
+    extract_zip,
+    file_crc32,
+    format_bytes,
+    find_sd_volumes,
+    format_duration,
+    resolve_sd_path,
+)
 
 
 class TestDetectSdPath:
@@ -26,6 +37,19 @@ class TestDetectSdPath:
         assert detect_sd_path(f) is False
 
 
+class TestFindSdVolumes:
+    def test_scans_the_given_root(self, fake_sd: Path, tmp_path: Path) -> None:
+        (tmp_path / "USB_STICK").mkdir()
+        assert find_sd_volumes(tmp_path) == [fake_sd]
+
+    def test_missing_root(self, tmp_path: Path) -> None:
+        assert find_sd_volumes(tmp_path / "nowhere") == []
+
+    def test_default_root_on_macos(self) -> None:
+        with patch("switch_up.utils.sys.platform", "darwin"):
+            assert default_mount_root() == VOLUMES_DIR
+
+
 class TestExtractZip:
     def test_extracts_correctly(self, sample_zip: Path) -> None:
         dest = extract_zip(sample_zip)
@@ -50,3 +74,28 @@ class TestResolveSdPath:
     def test_path_not_found(self, tmp_path: Path) -> None:
         with pytest.raises(FileNotFoundError):
             resolve_sd_path(tmp_path / "no_existe")
+
+
+class TestFileCrc32:
+    def test_matches_zip_central_directory(self, sample_zip: Path) -> None:
+        dest = extract_zip(sample_zip)
+        with zipfile.ZipFile(sample_zip) as zf:
+            info = zf.getinfo("atmosphere/package3")
+        assert file_crc32(Path(dest) / "atmosphere" / "package3") == info.CRC
+
+
+class TestFormatBytes:
+    def test_small_values_in_bytes(self) -> None:
+        assert format_bytes(512) == "512 B"
+
+    def test_scales_units(self) -> None:
+        assert format_bytes(1536) == "1.5 KB"
+        assert format_bytes(5 * 1024 ** 3) == "5.0 GB"
+
+
+class TestFormatDuration:
+    def test_scales_units(self) -> None:
+        assert format_duration(0.2) == "<1s"
+        assert format_duration(42.4) == "42s"
+        assert format_duration(83) == "1m 23s"
+        assert format_duration(7260) == "2h 01m"
@@ -0,0 +1,109 @@
+"""Tests for the verify module."""
+
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from switch_up.core import Source, install_zip, stream_merge, stream_merge_sources
+from switch_up.verify import (
+    VerificationError,
+    rewrite_members,
+    verify_and_repair,
+    verify_members,
+)
+
+
+class TestVerifyMembers:
+    def test_merged_files_match(self, fake_sd: Path, sample_zip: Path) -> None:
+        stream_merge(sample_zip, fake_sd)
+        report = verify_members(sample_zip, fake_sd)
+        assert report.ok
+        assert report.files_checked == 2
+        assert report.bytes_checked == len(b"new_package3_data") + len(
+            b"new_bootloader"
+        )
+
+    def test_detects_same_size_corruption(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        stream_merge(sample_zip, fake_sd)
+        (fake_sd / "atmosphere" / "package3").write_bytes(b"bad_package3_data")
+        report = verify_members(sample_zip, fake_sd)
+        assert report.mismatches == {"atmosphere/package3": "CRC32 mismatch"}
+
+    def test_detects_missing_and_truncated_files(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        stream_merge(sample_zip, fake_sd)
+        (fake_sd / "atmosphere" / "package3").unlink()
+        (fake_sd / "bootloader" / "update.bin").write_bytes(b"new")
+        report = verify_members(sample_zip, fake_sd)
+        assert report.mismatches["atmosphere/package3"] == "missing"
+        assert report.mismatches["bootloader/update.bin"].startswith("size 3")
+
+    def test_limits_check_to_names(self, fake_sd: Path, sample_zip: Path) -> None:
+        stream_merge(sample_zip, fake_sd)
+        (fake_sd / "atmosphere" / "package3").unlink()
+        report = verify_members(sample_zip, fake_sd, ["bootloader/update.bin"])
+        assert report.ok
+        assert report.files_checked == 1
+
+
+class TestVerifyAndRepair:
+    def test_rewrites_failing_files(self, fake_sd: Path, sample_zip: Path) -> None:
+        stream_merge(sample_zip, fake_sd)
+        target = fake_sd / "atmosphere" / "package3"
+        target.write_bytes(b"bad_package3_data")
+        report = verify_and_repair(sample_zip, fake_sd)
+        assert list(report.mismatches) == ["atmosphere/package3"]
+        assert target.read_bytes() == b"new_package3_data"
+
+    def test_raises_when_rewrite_does_not_help(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        stream_merge(sample_zip, fake_sd)
+        (fake_sd / "atmosphere" / "package3").write_bytes(b"bad_package3_data")
+        with patch("switch_up.verify.rewrite_members", return_value=0):
+            with pytest.raises(VerificationError) as excinfo:
+                verify_and_repair(sample_zip, fake_sd)
+        assert "atmosphere/package3" in excinfo.value.report.mismatches
+
+    def test_rewrite_members_only_writes_given_names(
+        self, fake_sd: Path, sample_zip: Path
+    ) -> None:
+        assert rewrite_members(sample_zip, fake_sd, ["bootloader/update.bin"]) == 1
+        assert (fake_sd / "bootloader" / "update.bin").is_file()
+        assert not (fake_sd / "atmosphere" / "package3").exists()
+
+
+class TestInstallVerify:
+    def test_install_with_verify(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        console = Console(record=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            install_zip(sample_zip, fake_sd, console, verify=True)
+        assert "All 2 files match the ZIP" in console.export_text()
+
+    def test_install_repairs_bad_write(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        real_merge = stream_merge_sources
+
+        def corrupting_merge(sources: List[Source], dst: Path, **kwargs: object):
+            results = real_merge(sources, dst, **kwargs)
+            (dst / "atmosphere" / "package3").write_bytes(b"bad_package3_data")
+            return results
+
+        console = Console(record=True)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.core.stream_merge_sources", corrupting_merge
+        ):
+            install_zip(sample_zip, fake_sd, console, verify=True)
+        assert "were rewritten" in console.export_text()
+        assert (fake_sd / "atmosphere" / "package3").read_bytes() == (
+            b"new_package3_data"
+        )
@@ -0,0 +1,167 @@
+"""Tests for the watch module."""
+
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from rich.console import Console
+
+from switch_up.core import Source
+from switch_up.state import StateIndex, read_card_id
+from switch_up.watch import (
+    DONE,
+    FAILED,
+    SKIPPED,
+    MountWatcher,
+    ReleaseKeeper,
+    Station,
+)
+
+
+def _keeper(sources: List[Source]) -> ReleaseKeeper:
+    keeper = ReleaseKeeper(lambda: sources)
+    keeper.refresh()
+    return keeper
+
+
+def _wait_idle(station: Station) -> None:
+    while station.busy:
+        time.sleep(0.01)
+
+
+class TestMountWatcher:
+    def test_lists_sd_cards_under_the_root(self, fake_sd: Path, tmp_path: Path) -> None:
+        (tmp_path / "USB_STICK").mkdir()
+        with MountWatcher(tmp_path) as watcher:
+            assert watcher.scan() == [fake_sd]
+
+    def test_wakes_up_when_a_volume_appears(self, tmp_path: Path) -> None:
+        root = tmp_path / "media"
+        root.mkdir()
+        with MountWatcher(root, interval=10) as watcher:
+            if not watcher.event_driven:
+                pytest.skip("no kernel events on this platform")
+            timer = threading.Timer(0.1, (root / "SD").mkdir)
+            timer.start()
+            started = time.monotonic()
+            watcher.wait()
+            timer.join()
+        assert time.monotonic() - started < 5
+
+    def test_polls_elsewhere(self, tmp_path: Path) -> None:
+        with patch("switch_up.watch.sys.platform", "darwin"):
+            watcher = MountWatcher(tmp_path, interval=0.01)
+        assert not watcher.event_driven
+        watcher.wait()
+        watcher.close()
+
+
+class TestReleaseKeeper:
+    def test_keeps_previous_sources_when_a_refresh_fails(self, tmp_path: Path) -> None:
+        results = [
+            [Source(tmp_path / "ams.zip", package="Atmosphere", version="1.8.0")]
+        ]
+
+        def prepare() -> List[Source]:
+            if not results:
+                raise ConnectionError("offline")
+            return results.pop()
+
+        keeper = ReleaseKeeper(prepare)
+        keeper.refresh()
+        keeper.refresh()
+        assert keeper.sources(timeout=0)[0].version == "1.8.0"
+        assert keeper.error == "offline"
+        assert "Atmosphere 1.8.0" in keeper.describe()
+        assert "refresh failed: offline" in keeper.describe()
+
+    def test_stopping_fails_waiting_installs(self) -> None:
+        keeper = ReleaseKeeper(lambda: [])
+        keeper.stop()
+        with pytest.raises(TimeoutError):
+            keeper.sources()
+
+
+class TestStation:
+    def test_installs_each_new_card_once(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        station = Station(_keeper([Source(sample_zip)]), workers=2)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"):
+            (status,) = station.check([fake_sd])
+            assert station.check([fake_sd]) == []
+            station.join()
+
+        assert status.state == DONE, status.error
+        assert status.done == status.total > 0
+        assert (fake_sd / "atmosphere" / "package3").is_file()
+        with StateIndex() as index:
+            card = read_card_id(fake_sd)
+            assert card is not None and index.packages(card)
+
+    def test_remounted_card_is_not_processed_again(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        station = Station(_keeper([Source(sample_zip)]), workers=1)
+        with patch("switch_up.backup.BACKUP_DIR", tmp_path / "backups"), patch(
+            "switch_up.watch.install_packages"
+        ) as install:
+            station.check([fake_sd])
+            _wait_idle(station)
+            station.check([])  # unplugged
+            remounted = fake_sd.with_name("SD 1")
+            shutil.move(str(fake_sd), str(remounted))
+            station.check([remounted])
+            station.join()
+
+        assert install.call_count == 1
+        assert [s.state for s in station.statuses] == [DONE, SKIPPED]
+
+    def test_failures_are_reported_per_card(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        other = tmp_path / "OTHER"
+        shutil.copytree(fake_sd, other)
+        station = Station(_keeper([Source(sample_zip)]), workers=2)
+
+        def install(
+            sources: object, sd_path: Path, *args: object, **kw: object
+        ) -> None:
+            if sd_path == other:
+                raise OSError("card removed")
+
+        with patch("switch_up.watch.install_packages", side_effect=install):
+            station.check([fake_sd, other])
+            station.join()
+
+        states = {s.sd_path: (s.state, s.error) for s in station.statuses}
+        assert states == {fake_sd: (DONE, None), other: (FAILED, "card removed")}
+        console = Console(record=True, width=120)
+        console.print(station.table())
+        output = console.export_text()
+        assert "card removed" in output
+        assert "Releases: " in output
+
+    def test_run_checks_until_stopped(
+        self, fake_sd: Path, sample_zip: Path, tmp_path: Path
+    ) -> None:
+        root = tmp_path / "media"
+        root.mkdir()
+        shutil.move(str(fake_sd), str(root))
+        station = Station(_keeper([Source(sample_zip)]), workers=1)
+        stop = threading.Event()
+        with patch("switch_up.watch.install_packages") as install, MountWatcher(
+            root, interval=0.01
+        ) as watcher:
+            runner = threading.Thread(target=station.run, args=(watcher, stop))
+            runner.start()
+            while not station.statuses:
+                time.sleep(0.01)
+            stop.set()
+            runner.join()
+            station.join()
+        install.assert_called_once()
@@ -0,0 +1,147 @@
+"""Tests for the zipstream module."""
+
+import hashlib
+import io
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+import pytest
+
+from switch_up.zipstream import RemoteZip
+
+FILES = {
+    "atmosphere/package3": bytes(range(256)) * 800,
+    "atmosphere/config/system_settings.ini": b"[eupld]\nupload_enabled = u8!0x0\n",
+    "bootloader/hekate_ipl.ini": b"[config]\nautoboot=0\n",
+}
+
+
+def _archive(
+    files: Dict[str, bytes], descriptors: bool = False, comment: bytes = b""
+) -> bytes:
+    """A ZIP of files: package3 stored, the rest deflated.
+
+    With descriptors=True the ZIP is written to an unseekable stream, so
+    its members carry data descriptors instead of sizes in their headers.
+    """
+    buffer = io.BytesIO()
+    out = _Unseekable(buffer) if descriptors else buffer
+    with zipfile.ZipFile(out, "w") as zf:
+        zf.comment = comment
+        zf.writestr("atmosphere/", b"")
+        for name, content in files.items():
+            stored = name.endswith("package3")
+            zf.writestr(
+                name,
+                content,
+                zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED,
+            )
+    return buffer.getvalue()
+
+
+class _Unseekable(io.RawIOBase):
+    def __init__(self, buffer: io.BytesIO) -> None:
+        self.buffer = buffer
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        return self.buffer.write(data)
+
+
+def _remote(
+    data: bytes,
+    body: Optional[bytes] = None,
+    sha256: Optional[str] = None,
+    chunk: int = 1000,
+) -> Tuple[RemoteZip, List[Tuple[int, int]]]:
+    """A RemoteZip over data; body, if given, is what its stream delivers."""
+    ranges: List[Tuple[int, int]] = []
+    body = data if body is None else body
+
+    def fetch_range(start: int, end: int) -> bytes:
+        ranges.append((start, end))
+        return data[start : end + 1]
+
+    def open_stream() -> Iterator[bytes]:
+        return (body[i : i + chunk] for i in range(0, len(body), chunk))
+
+    return RemoteZip("ams.zip", len(data), fetch_range, open_stream, sha256), ranges
+
+
+def _read_all(remote: RemoteZip, names: Optional[List[str]] = None) -> Dict[str, bytes]:
+    infos = remote.infolist()
+    if names is not None:
+        infos = [i for i in infos if i.filename in names]
+    return {info.filename: reader.read() for info, reader in remote.members(infos)}
+
+
+class TestInfolist:
+    def test_lists_members_from_the_tail(self) -> None:
+        data = _archive(FILES)
+        remote, ranges = _remote(data)
+        assert [i.filename for i in remote.infolist()] == ["atmosphere/", *FILES]
+        assert ranges == [(len(data) - 64 * 1024, len(data) - 1)]
+
+    def test_fetches_further_back_for_a_large_directory(self) -> None:
+        data = _archive(FILES)
+        with patch("switch_up.zipstream.TAIL_SIZE", 100):
+            remote, ranges = _remote(data)
+            infos = remote.infolist()
+        assert len(infos) == 4
+        assert len(ranges) == 2
+        assert ranges[1][1] == len(data) - 101
+
+
+class TestMembers:
+    def test_inflates_members_as_they_arrive(self) -> None:
+        remote, _ = _remote(_archive(FILES))
+        assert _read_all(remote, list(FILES)) == FILES
+
+    def test_skips_unwanted_members(self) -> None:
+        remote, _ = _remote(_archive(FILES))
+        assert _read_all(remote, ["bootloader/hekate_ipl.ini"]) == {
+            "bootloader/hekate_ipl.ini": FILES["bootloader/hekate_ipl.ini"]
+        }
+
+    def test_members_with_data_descriptors(self) -> None:
+        remote, _ = _remote(_archive(FILES, descriptors=True))
+        assert _read_all(remote, list(FILES)) == FILES
+
+    def test_checks_the_sha256(self) -> None:
+        data = _archive(FILES)
+        remote, _ = _remote(data, sha256=hashlib.sha256(data).hexdigest())
+        assert _read_all(remote, list(FILES)) == FILES
+
+        remote, _ = _remote(data, sha256="0" * 64)
+        with pytest.raises(ValueError, match="Checksum mismatch"):
+            _read_all(remote, list(FILES))
+
+    def test_corrupt_member_raises(self) -> None:
+        data = _archive(FILES)
+        offset = data.index(FILES["atmosphere/package3"]) + 10
+        corrupt = data[:offset] + b"\xff" + data[offset + 1 :]
+        remote, _ = _remote(data, body=corrupt)
+        with pytest.raises(zipfile.BadZipFile, match="Bad CRC-32"):
+            _read_all(remote)
+
+    def test_truncated_download_raises(self) -> None:
+        data = _archive(FILES)
+        remote, _ = _remote(data, body=data[: len(data) // 2])
+        with pytest.raises(zipfile.BadZipFile, match="truncated"):
+            _read_all(remote)
+
+    def test_changed_central_directory_raises(self) -> None:
+        data = _archive(FILES, comment=b"1.8.0")
+        other = _archive(FILES, comment=b"1.9.0")
+        remote, _ = _remote(data, body=other)
+        with pytest.raises(zipfile.BadZipFile, match="changed during the download"):
+            _read_all(remote, list(FILES))
+
+    def test_size_mismatch_raises(self) -> None:
+        data = _archive(FILES)
+        remote, _ = _remote(data, body=data + b"\0")
+        with pytest.raises(ValueError, match="Size mismatch"):
+            _read_all(remote, list(FILES))